@@ -14,4 +14,5 @@ DIR_INTERFACE = f"{DIR_BASE}/interface"
 DIR_TESTCASE = f"{DIR_BASE}/assets/testcase"
 
 CONFIG_SCENE = f"{DIR_INTERFACE}/ui/scene.yaml"
+CONFIG_SCENE_DEFINITION = f"{DIR_INTERFACE}/ui/scene_definition.yaml"
 CONFIG_DELEGATION = f"{DIR_INTERFACE}/ui/delegation.yaml"
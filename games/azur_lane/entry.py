@@ -1,8 +1,18 @@
+import argparse
+
 from games.azur_lane import logger_azurlane
-from util.controller.simulator import Bluestack
 
 if __name__ == '__main__':
-    bs = Bluestack("BS_AzurLane")
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--adb", nargs="?", const="", default=None, metavar="SERIAL", help="run via adb instead of win32")
+    args = parser.parse_args()
+
+    if args.adb is not None:
+        from util.controller.adb import AdbEmulator
+        bs = AdbEmulator(args.adb or None)
+    else:
+        from util.controller.simulator import Bluestack
+        bs = Bluestack("BS_AzurLane")
     bs.gateway.start()
     task_available = {"1": "FarmChapter", "2": "FarmSubmarineSOS", "3": "TaskFarmCampaignSpecial"}
     logger_azurlane.info(f"Available tasks: {task_available}")
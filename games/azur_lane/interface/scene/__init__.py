@@ -1,10 +1,11 @@
 from .asset_manager import am
 from .base import Scene, SceneUnknown
 from .campaign import *
+from .definition import apply_definitions, load_definitions
 from .delegation import *
 from .main import *
 from .name import Namespace
 
-SCENES_REGISTERED = {
+SCENES_REGISTERED = apply_definitions({
     x.name: x for x in globals().values() if type(x) is Scene.__class__ and issubclass(x, Scene)
-}
+}, load_definitions())
@@ -0,0 +1,151 @@
+import hashlib
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from games.azur_lane import logger_azurlane
+from util.io import load_yaml
+
+ARRAY_TYPES = {"__Eigen", "__Rect", "__ImageRect", "__RelImageRect", "__Region", "__RelPos"}
+
+
+def _walk(tree: dict, prefix="") -> Iterator[Tuple[str, str, Any]]:
+    for key, value in tree.items():
+        if key.startswith("__"):
+            yield prefix, key, value
+        elif isinstance(value, dict):
+            yield from _walk(value, f"{prefix}.{key}" if prefix else key)
+
+
+def _read_only(value):
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+    return value
+
+
+def _compile(asset_type: str, value):
+    if asset_type not in ARRAY_TYPES:
+        return value
+    try:
+        array = np.asarray(value, dtype=np.int64)
+    except (TypeError, ValueError):  # ragged, kept as it is
+        return value
+    return array.reshape(-1, 3) if asset_type == "__Eigen" else array
+
+
+class AssetBundle:
+    """
+    Assets of a YAML compiled into a flat index, from (asset name, asset type) to the asset, so that a lookup is one
+    dict hit instead of walking the tree. Coordinates are read-only int64 arrays, eigens are stacked into (N, 3) arrays
+    of each asset, and the (x, y, width, height) of every `__ImageRect` is derived ahead.
+
+    A bundle is cached in a file, which is reused as long as the YAML is of the same mtime and size, or the same hash.
+
+    Examples:
+        >>> bundle = AssetBundle.load("scene.yaml", "scene.bundle.pkl")
+        >>> bundle.index[("Main.Button_AnchorAweigh", "__Rect")]
+        array([[   1514,     435, 4568300],
+               [   1730,     648, 5416670]])
+    """
+    VERSION = 1  # of the format, bundles of other versions are compiled again
+    logger = logger_azurlane
+
+    def __init__(self, tree: dict, source: dict = None):
+        """
+
+        Args:
+            tree: dict
+                nested assets, as in the YAML
+            source: dict, optional
+                mtime, size and hash of the YAML
+        """
+        self.tree = tree
+        self.source = source or {}
+        self.index: Dict[Tuple[str, str], Any] = {
+            (name, asset_type): _read_only(_compile(asset_type, value)) for name, asset_type, value in _walk(tree)
+        }
+        self.xywh: Dict[str, Tuple[int, int, int, int]] = {}
+        for (name, asset_type), value in self.index.items():
+            if asset_type == "__ImageRect":
+                (x0, y0), (x1, y1) = (point[:2] for point in value[:2])
+                self.xywh[name] = int(x0), int(y0), int(x1 - x0), int(y1 - y0)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        for value in self.index.values():
+            _read_only(value)  # arrays unpickled are writable
+
+    @staticmethod
+    def stat(file: str) -> dict:
+        st = os.stat(file)
+        return {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+    @staticmethod
+    def hash(file: str) -> str:
+        return hashlib.sha1(Path(file).read_bytes()).hexdigest()
+
+    @classmethod
+    def compile(cls, file: str) -> "AssetBundle":
+        return cls(load_yaml(file), {**cls.stat(file), "hash": cls.hash(file), "version": cls.VERSION})
+
+    def is_fresh(self, file: str) -> bool:
+        """whether the bundle is of the YAML as it's now, hashed only if its mtime or size has changed"""
+        if self.source.get("version") != self.VERSION:
+            return False
+        if all(self.source.get(key) == value for key, value in self.stat(file).items()):
+            return True
+        return self.source.get("hash") == self.hash(file)
+
+    def save(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)  # never leave a partial bundle to load
+
+    @classmethod
+    def load(cls, file: str, cache: str = None) -> "AssetBundle":
+        """
+        Args:
+            file: str
+                YAML of assets
+            cache: str, optional
+                file of the bundle cached, default not to cache
+
+        Returns:
+            AssetBundle
+        """
+        bundle = cls._load_cached(file, cache) if cache is not None and Path(cache).exists() else None
+        if bundle is not None and bundle.source.items() >= cls.stat(file).items():
+            return bundle
+
+        if bundle is None:
+            bundle = cls.compile(file)
+        else:  # touched but not changed, saved again not to hash it next time
+            bundle.source.update(cls.stat(file))
+        if cache is not None:
+            try:
+                bundle.save(cache)
+            except OSError as e:
+                cls.logger.warning(f"failed to cache assets in {cache}: {e}")
+        return bundle
+
+    @classmethod
+    def _load_cached(cls, file: str, cache: str) -> Optional["AssetBundle"]:
+        """the bundle cached, or None if it's stale or broken"""
+        try:
+            with open(cache, "rb") as f:
+                bundle = pickle.load(f)
+        except Exception as e:
+            cls.logger.warning(f"failed to load assets cached in {cache}: {e}")
+            return None
+        return bundle if isinstance(bundle, cls) and bundle.is_fresh(file) else None
+
+    def __repr__(self):
+        return f"AssetBundle[{len(self)} asset(s), {self.source.get('hash', '')[:8]}]"
@@ -1,16 +1,20 @@
-import itertools
-from functools import lru_cache
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 
-import cv2
 import numpy as np
 
-from games.azur_lane.config import CONFIG_SCENE, DIR_BASE
-from util.io import load_yaml
+from games.azur_lane.config import CONFIG_SCENE, DIR_BASE, DIR_USR_AUTO_GAME_AZURLANE
+from games.azur_lane.interface.scene.asset_bundle import AssetBundle
+from games.azur_lane.interface.scene.template_store import TemplateStore
+from util.game_cv.matching import TemplateSpec
 
 
 class AssetManager:
-    ASSETS = load_yaml(CONFIG_SCENE)
+    FILE_BUNDLE = f"{DIR_USR_AUTO_GAME_AZURLANE}/cache/scene.bundle.pkl"
+    BUNDLE = AssetBundle.load(CONFIG_SCENE, FILE_BUNDLE)
+    ASSETS = BUNDLE.tree
+    INDEX = BUNDLE.index
+    _stacked: Dict[Tuple[str, ...], np.ndarray] = {}  # eigens of several assets stacked
+    TEMPLATES = TemplateStore(DIR_BASE, dir_cache=f"{DIR_USR_AUTO_GAME_AZURLANE}/cache/templates")
 
     @staticmethod
     def recur_resolve(dict_, keys):
@@ -30,13 +34,11 @@ class AssetManager:
         Returns:
 
         """
-        res = cls.recur_resolve(cls.ASSETS, asset_name.split("."))
         if asset_type is None:
-            return res
-        return res[f"__{asset_type}"]
+            return cls.recur_resolve(cls.ASSETS, asset_name.split("."))
+        return cls.INDEX[(asset_name, f"__{asset_type}")]
 
     @classmethod
-    @lru_cache(maxsize=10)
     def rel_image_rect(cls, asset_name: str):
         return cls.resolve(asset_name, "RelImageRect")
 
@@ -49,39 +51,131 @@ class AssetManager:
         return cls.resolve(asset_name, "ImageRect")
 
     @classmethod
-    def get_image_xywh(cls, asset_name):
-        lt, rb = (point[:2] for point in cls.image_rect(asset_name))
-        return lt[0], lt[1], rb[0] - lt[0], rb[1] - lt[1]
+    def get_image_xywh(cls, asset_name) -> Tuple[int, int, int, int]:
+        return cls.BUNDLE.xywh[asset_name]
 
     @classmethod
-    def rect(cls, asset_name: str) -> List:
-        return cls.resolve(asset_name, "Rect")[:2]
+    def search_region(cls, asset_name: str) -> Optional[Tuple[int, int, int, int]]:
+        """(x, y, width, height) of the `__Region` of the asset, or of the nearest parent which has one, or None"""
+        keys = asset_name.split(".")
+        for i in range(len(keys), 0, -1):
+            if (region := cls.INDEX.get((".".join(keys[:i]), "__Region"))) is not None:
+                (x0, y0), (x1, y1) = (point[:2] for point in region[:2])
+                return int(x0), int(y0), int(x1 - x0), int(y1 - y0)
+        return None
 
     @classmethod
-    def eigen(cls, asset_name: str) -> Tuple[int, int, int]:
-        return cls.resolve(asset_name, "Eigen")
+    def rect(cls, asset_name: str) -> np.ndarray:
+        return cls.INDEX[(asset_name, "__Rect")][:2]
 
     @classmethod
-    def eigens(cls, *objects):
-        if isinstance(objects, str):
-            objects = [objects]
-        it = itertools.chain.from_iterable((cls.eigen(xy_rgb) for xy_rgb in objects))
-        return np.asarray(list(it), dtype=np.int32)
+    def eigen(cls, asset_name: str) -> np.ndarray:
+        return cls.INDEX[(asset_name, "__Eigen")]
 
     @classmethod
-    @lru_cache(maxsize=10)
-    def template(cls, asset_name: str):
+    def eigens(cls, *objects) -> np.ndarray:
+        """
+        Args:
+            *objects: str
+                asset names
+
+        Returns:
+            np.ndarray, read-only, eigens of all the assets stacked in shape of (N, 3)
+        """
+        if len(objects) == 1:
+            return cls.INDEX[(objects[0], "__Eigen")]
+        if (res := cls._stacked.get(objects)) is None:
+            stacked = [cls.INDEX[(name, "__Eigen")] for name in objects]
+            res = np.vstack(stacked) if stacked else np.empty((0, 3), dtype=np.int64)
+            res.setflags(write=False)
+            cls._stacked[objects] = res
+        return res
+
+    @classmethod
+    def iter_assets(cls, asset_type: str, dict_=None, prefix=""):
+        """
+        Walk the asset tree, and yield every asset of the type.
+
+        Args:
+            asset_type: str {"Eigen", "Image", "Rect", "ImageRect", "RelImageRect",}
+            dict_: dict, optional
+                sub-tree to walk, default all assets
+            prefix: str
+                asset name of the sub-tree
+
+        Yields:
+            Tuple[str, object], asset name and the asset
+        """
+        if dict_ is None:
+            yield from ((name, value) for (name, type_), value in cls.INDEX.items() if type_ == f"__{asset_type}")
+            return
+        for key, value in dict_.items():
+            if key == f"__{asset_type}":
+                yield prefix, value
+            elif isinstance(value, dict):
+                yield from cls.iter_assets(asset_type, value, f"{prefix}.{key}" if prefix else key)
+
+    @classmethod
+    def probe_boxes(cls) -> np.ndarray:
+        """
+        Areas read by recognizers: a pixel for each point of eigens, and rects of images, texts, etc.
+
+        Returns:
+            np.ndarray, in shape of (N, 4), each row is (x, y, width, height)
+        """
+        boxes = [[x, y, 1, 1] for _, eigen in cls.iter_assets("Eigen") for x, y, *_ in eigen]
+        for asset_type in ("Rect", "ImageRect"):
+            for _, (lt, rb, *_) in cls.iter_assets(asset_type):
+                boxes.append([lt[0], lt[1], rb[0] - lt[0] + 1, rb[1] - lt[1] + 1])
+        return np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+
+    @classmethod
+    def template(cls, asset_name: str, variant="bgr") -> Optional[np.ndarray]:
         """
 
         Args:
             asset_name: str
                 "/a/b/c", or "a.b.c"
+            variant: str, default "bgr"
+                "bgr", or one of `TemplateStore.VARIANTS`, e.g. "gray"
 
         Returns:
-
+            np.ndarray, read-only, BGR image of the same layout as frames (or the variant of it)
         """
         file_path_relative = cls.image(asset_name) if not asset_name.startswith("/") else asset_name
-        return cv2.imread(f"{DIR_BASE}{file_path_relative}")[:, :, ::-1]
+        return cls.TEMPLATES.get(file_path_relative, variant)
+
+    @classmethod
+    def template_specs(cls, asset_name: str, threshold=.8, variant="bgr") -> List[TemplateSpec]:
+        """
+        Templates of the `__Images` of an asset, each searched for in its `search_region`, see `MatchEngine`.
+
+        Args:
+            asset_name: str
+                e.g. "Campaign.Enemy.Scale.Small"
+            threshold: float, default .8
+            variant: str, default "bgr"
+
+        Returns:
+            List[TemplateSpec], named "<asset_name>.<image name>", missing templates left out
+        """
+        region = cls.search_region(asset_name)
+        return [
+            TemplateSpec(f"{asset_name}.{name}", template, region, threshold)
+            for name, file in cls.resolve(asset_name, "Images").items()
+            if (template := cls.template(file, variant)) is not None
+        ]
+
+    @classmethod
+    def template_files(cls) -> List[str]:
+        """files of all `__Image` and `__Images` assets"""
+        files = [file for _, file in cls.iter_assets("Image")]
+        files.extend(file for _, images in cls.iter_assets("Images") for file in images.values())
+        return list(dict.fromkeys(files))
+
+    @classmethod
+    def preload_templates(cls) -> int:
+        return cls.TEMPLATES.preload(cls.template_files())
 
 
 am = AssetManager
@@ -1,21 +1,19 @@
 import time
+from typing import NamedTuple, Tuple, Union
 
-import numpy as np
+import cv2
 
 from games.azur_lane import logger_azurlane
 from games.azur_lane.interface.scene.asset_manager import am
 from lib.dummy_paddleocr import load_recognizer
 from util import game_cv
+from util.frame import record_reads
+from util.game_cv.probe import probe
 from util.proto import TwoDimArrayLike
-from util.win32.window import parse_int_bgr2rgb
 
 ocr_paddle = load_recognizer()
 
 
-def goto_scene_main(window):
-    window.left_click(am.rect("AnchorAweigh.Button_BackToMain"), sleep=1)
-
-
 def auto_retry(max_retry, retry_interval=.1):
     def _auto_retry(f):
         def wrapper(*args, **kwargs):
@@ -40,7 +38,55 @@ class SceneMeta(type):
         return f"{cls.__name__}"
 
 
+class Signature(NamedTuple):
+    """
+    Probes telling a scene from others: all eigens of the positive assets match, and none of the negative assets has
+    all of its eigens matched.
+
+    Examples:
+        >>> Signature(positive=("CampaignChapter.Label_WeighAnchor",), negative=("CampaignChapter.Button_RescueSOS",))
+    """
+    positive: Tuple[str, ...]
+    negative: Tuple[str, ...] = ()
+
+
+class Template(NamedTuple):
+    """
+    Image of an asset which has to match somewhere in the `__ImageRect` of it, on top of signatures.
+
+    Examples:
+        >>> Template("Main.Button_LivingArea.State_HasNewNotice", threshold=.8)
+    """
+    asset: str
+    threshold: float = .9
+
+
 class SceneRecognizer:
+    # a signature, or a tuple of alternatives which any of them matches
+    signature: Union[Signature, Tuple[Signature, ...]] = None
+    templates: Tuple[Template, ...] = ()
+
+    @classmethod
+    def signatures(cls) -> Tuple[Signature, ...]:
+        if cls.signature is None:
+            return ()
+        return (cls.signature,) if isinstance(cls.signature, Signature) else tuple(cls.signature)
+
+    @classmethod
+    def has_custom_recognition(cls) -> bool:
+        """whether `at_this_scene_impl` is overridden, e.g. to recognize by templates or OCR"""
+        return cls.at_this_scene_impl.__func__ is not SceneRecognizer.at_this_scene_impl.__func__
+
+    @classmethod
+    def recognized_by_signature(cls) -> bool:
+        """whether the scene is told by its signatures only, so that it can be compiled with others"""
+        return bool(cls.signatures()) and not cls.templates and not cls.has_custom_recognition()
+
+    @classmethod
+    def recognizable(cls) -> bool:
+        """whether the scene can be recognized at all, by signatures or custom logic"""
+        return bool(cls.signatures() or cls.templates) or cls.has_custom_recognition()
+
     @classmethod
     def at(cls, scene) -> bool:
         """
@@ -54,13 +100,45 @@ class SceneRecognizer:
         return cls is scene
 
     @classmethod
-    def at_this_scene(cls, window):
-        return cls.at_this_scene_impl(window)
+    def at_this_scene(cls, window, frame=None) -> bool:
+        """
+        Check if the frame is at this scene, the result is memoized per frame. With a change detector on the window,
+        the result is reused across frames as long as none of the areas it read has changed.
+
+        Args:
+            window:
+            frame: Frame, optional
+                frame to check, default the snapshot of window
+
+        Returns:
+
+        """
+        frame = window.snapshot() if frame is None else frame
+        if (key := (cls, "at_this_scene")) in frame.memo:
+            return frame.memo[key]
+
+        if (detector := getattr(window, "change_detector", None)) is None:
+            with window.pin_frame(frame):
+                res = frame.memo[key] = cls.at_this_scene_impl(window)
+            return res
+
+        if (res := detector.reuse(key, frame)) is None:
+            with window.pin_frame(frame), record_reads() as reads:
+                res = cls.at_this_scene_impl(window)
+            detector.remember(key, frame, res, reads)
+        frame.memo[key] = res
+        return res
 
     @classmethod
     def at_this_scene_impl(cls, window) -> bool:
-        """Custom method to implement"""
-        pass
+        """Custom method to implement, default to check signatures, then templates of the scene"""
+        if not ((signatures := cls.signatures()) or cls.templates):
+            return False
+        return (not signatures or any(
+            cls.compare_with_pixels(window, am.eigens(*signature.positive))
+            and not any(cls.compare_with_pixels(window, am.eigens(name)) for name in signature.negative)
+            for signature in signatures
+        )) and all(cls.compare_with_image(window, template.asset, template.threshold) for template in cls.templates)
 
     @staticmethod
     def compare_with_pixels(window, pixels: TwoDimArrayLike, tolerance=0) -> bool:
@@ -70,19 +148,39 @@ class SceneRecognizer:
             window:
             pixels: 2-D array-like
                 e.g [[x1, y1, BGR_1], [x2, y2, BGR_2], ...]
-            tolerance: int, default 0
-                tolerance for R, G, B
+            tolerance: int, or array-like of (R, G, B), default 0
+                max absolute difference of each channel
+
+        Returns:
+
+        """
+        return probe(window.snapshot(), pixels, tolerance)
+
+    @staticmethod
+    def compare_with_image(window, asset_name: str, threshold=.9) -> bool:
+        """
+
+        Args:
+            window:
+            asset_name: str
+                asset of an `__Image`, searched for in its `__ImageRect`
+            threshold: float, default .9
+                min normalized correlation coefficient of the best match
 
         Returns:
 
         """
-        real = np.apply_along_axis(lambda xy: window.pixel_from_window(*xy, as_int=True), axis=1, arr=pixels[:, 0:2])
-        return (np.array(parse_int_bgr2rgb(real ^ pixels[:, 2])).T <= tolerance).all()
+        x, y, w, h = am.get_image_xywh(asset_name)
+        origin = window.snapshot().region(x, y, w, h)
+        _, max_value, _, _ = game_cv.match_single_template(
+            origin, am.template(asset_name), method=cv2.TM_CCOEFF_NORMED, debug=False
+        )
+        return max_value >= threshold
 
     @staticmethod
     def compare_with_template(window, rect: list, template, threshold=1.00) -> bool:
         lt, rb = rect
-        origin = window.screenshot(lt[0], lt[1], rb[0] - lt[0], rb[1] - lt[1])
+        origin = window.snapshot().region(lt[0], lt[1], rb[0] - lt[0], rb[1] - lt[1])
         min_value, max_value, min_loc, max_loc = game_cv.match_single_template(origin, template)
         print(min_value, max_value)
         return min_value >= threshold
@@ -118,19 +216,49 @@ class Scene(SceneRecognizer, SceneRouter, metaclass=SceneMeta):
         return f"{self.name} @ {self.window}"
 
     @classmethod
-    def goto(cls, window, next_scene, sleep=0, *args, **kwargs):
+    def goto(cls, window, next_scene, timeout=5., *args, **kwargs):
+        """
+        Take the way to the next scene, and wait until it's seen.
+
+        Args:
+            window:
+            next_scene: Type[Scene]
+            timeout: float, default 5.
+                seconds to wait for the next scene, see `GameWindow.wait_until_scene`
+            *args:
+            **kwargs:
+                arguments of the way
+
+        Returns:
+            bool, whether it has arrived, the scene state is switched to wherever it has landed either way
+        """
         if not cls.at_this_scene(window=window):
             cls.logger.warning(f"scene changed unexpectedly (expected->{cls}, cur->{window.scene_cur})")
             return False
 
+        start = time.perf_counter()
         cls.ways_to(next_scene.name)(window, *args, **kwargs)
 
-        if sleep > 0:
-            time.sleep(sleep)
+        # other scenes the way may lead to as well, e.g. the fixed fleet selection instead of the arbitrary one
+        landed = window.wait_until_scene(*cls.successors(next_scene), timeout=timeout)
+        if landed is None:  # stayed, or somewhere else
+            landed = window.wait_until_scene(cls, timeout=0) or SceneUnknown
+        window.observe_transition(cls, next_scene, landed, time.perf_counter() - start)
+        window.scene_state.switch(landed)
+        if landed is not next_scene:
+            cls.logger.info(f"expected {next_scene} after {cls}, landed at {landed}")
+        return landed is next_scene
 
-        if has_arrived := next_scene.at_this_scene_impl(window):
-            window.scene_prev, window.scene_cur = window.scene_cur, next_scene
-        return has_arrived
+    @classmethod
+    def successors(cls, next_scene) -> list:
+        """the next scene first, then other scenes the scene has ways to"""
+        by_name, pending = {}, [Scene]
+        while pending:  # breadth first, so that a parent wins over children inheriting its name
+            scene = pending.pop(0)
+            by_name.setdefault(scene.name, scene)
+            pending.extend(scene.__subclasses__())
+        others = (by_name.get(name) for name in cls.ways if name != next_scene.name)
+        return [next_scene, *(scene for scene in others if scene is not None and scene is not cls)]
 
 
 class SceneUnknown(Scene):
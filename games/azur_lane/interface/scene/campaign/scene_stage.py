@@ -4,7 +4,7 @@ from typing import Union
 import cv2
 
 from games.azur_lane.interface.scene.asset_manager import am
-from games.azur_lane.interface.scene.base import Scene, goto_scene_main, ocr_paddle, auto_retry
+from games.azur_lane.interface.scene.base import Scene, ocr_paddle, auto_retry
 from games.azur_lane.interface.scene.name import Namespace
 from util.game_cv import slice_image, binarize, find_most_match
 
@@ -39,18 +39,6 @@ class SceneCampaignChapter(Scene):
         unique_chars = "".join(sorted(set("".join(cls.map_chapter_names.keys()))))
         return unique_chars
 
-    @classmethod
-    def at_this_scene_impl(cls, window) -> bool:
-        points_to_check = am.eigens(
-            "CampaignChapter.Button_RescueSOS",
-            "CampaignChapter.Button_DailyTask",
-            "CampaignChapter.Label_WeighAnchor",
-            "Main.Icon_Resources.Icon_Oil",
-            "Main.Icon_Resources.Icon_Money",
-            "Main.Icon_Resources.Icon_Diamond",
-        )
-        return cls.compare_with_pixels(window, points_to_check)
-
     @classmethod
     def recognize_chapter_title(cls, window) -> Union[int, None]:
         chapter_title = cls._recognize_chapter_title(window)
@@ -61,7 +49,7 @@ class SceneCampaignChapter(Scene):
     @auto_retry(max_retry=20, retry_interval=.15)
     def _recognize_chapter_title(cls, window) -> Union[int, None]:
         x, y, w, h = am.get_image_xywh("CampaignChapter.Chapters.ChapterNo")
-        image_processed = slice_image(binarize(window.screenshot(x, y, w, h), thresh=128))
+        image_processed = slice_image(binarize(window.snapshot().region(x, y, w, h), thresh=128))
 
         ocr_paddle.set_valid_chars(cls._unique_chars())
         ocr_text = ocr_paddle(cv2.cvtColor(image_processed, cv2.COLOR_GRAY2RGB))[0][0]
@@ -79,9 +67,7 @@ class SceneCampaignChapter(Scene):
         window.left_click(am.rect("CampaignChapter.Chapters.Button_BackToAnchorAweigh"))
 
     ways = {
-        Namespace.scene_main: goto_scene_main,
-        Namespace.scene_anchor_aweigh: goto_scene_main,
-        Namespace.popup_stage_info: open_stage_popup
+        Namespace.popup_stage_info: open_stage_popup,
     }
 
 
@@ -92,20 +78,6 @@ class SceneCampaignSpecial(SceneCampaignChapter):
         "夜幕下的歸途": "夜幕下的歸途",
     }
 
-    @classmethod
-    def at_this_scene_impl(cls, window) -> bool:
-        points_to_check = am.eigens(
-            "CampaignChapter.Button_DailyTask",
-            "CampaignChapter.Label_WeighAnchor",
-            "Main.Icon_Resources.Icon_Oil",
-            "Main.Icon_Resources.Icon_Money",
-            "Main.Icon_Resources.Icon_Diamond",
-        )
-        points_to_check_false = am.eigens(
-            "CampaignChapter.Button_RescueSOS",
-        )
-        return cls.compare_with_pixels(window, points_to_check) and not cls.compare_with_pixels(window, points_to_check_false)
-
     @classmethod
     def open_stage_popup(cls, window, chapter_no=None):
         chapter_name, stage_no = chapter_no.split("-")
@@ -120,20 +92,6 @@ class SceneCampaignActivity(SceneCampaignChapter):
         "地秘密遺跡群島·採集地": "炼金术士与秘密遗迹群岛",
     }
 
-    @classmethod
-    def at_this_scene_impl(cls, window) -> bool:
-        points_to_check = am.eigens(
-            "CampaignChapter.Label_WeighAnchor",
-            "Main.Icon_Resources.Icon_Oil",
-            "Main.Icon_Resources.Icon_Money",
-            "Main.Icon_Resources.Icon_Diamond",
-            "CampaignActivity.Button_EXSP"
-        )
-        points_to_check_false = am.eigens(
-            "CampaignChapter.Button_RescueSOS",
-        )
-        return cls.compare_with_pixels(window, points_to_check) and not cls.compare_with_pixels(window, points_to_check_false)
-
     @classmethod
     def open_stage_popup(cls, window, chapter_no=None):
         chapter_name, stage_no = chapter_no.split("-")
@@ -143,27 +101,11 @@ class SceneCampaignActivity(SceneCampaignChapter):
 class PopupStageInfo(Scene):
     name = Namespace.popup_stage_info
 
-    @classmethod
-    def at_this_scene_impl(cls, window) -> bool:
-        points_to_check = am.eigens(
-            "PopupStageInfo.Label_WeighAnchor",
-            "PopupStageInfo.Button_ImmediateStart",
-        )
-        return cls.compare_with_pixels(window, points_to_check)
-
-    @classmethod
-    def goto_immediate_start(cls, window):
-        window.left_click(am.rect("PopupStageInfo.Button_ImmediateStart"), sleep=1)
-
-    @staticmethod
-    def close_popup(window):
-        window.left_click(am.rect("PopupStageInfo.Button_Close"), sleep=1)
-
     @classmethod
     def is_automation(cls, window) -> bool:
         lt, rb = am.rect("PopupStageInfo.Button_Automation")
         mid = tuple(int((lt[i] + rb[i]) / 2) for i in range(2))
-        rgb_tuple = window.pixel_from_window(*mid, as_int=False)
+        rgb_tuple = window.snapshot().pixel(*mid)
 
         return rgb_tuple[0] > 100
 
@@ -173,42 +115,12 @@ class PopupStageInfo(Scene):
             window.left_click(am.rect("PopupStageInfo.Button_Automation"), sleep=1)
         time.sleep(sleep)
 
-    ways = {
-        Namespace.scene_campaign: close_popup,
-        Namespace.popup_fleet_selection: goto_immediate_start,
-        Namespace.popup_fleet_selection_arbitrate: goto_immediate_start,
-        Namespace.popup_fleet_selection_fixed: goto_immediate_start,
-    }
-
 
 class PopupFleetSelection(Scene):
     name = Namespace.popup_fleet_selection
 
     is_fleet_fixed = None
 
-    @classmethod
-    def at_this_scene_impl(cls, window) -> bool:
-        points_to_check = am.eigens(
-            "PopupFleetSelect.Label_FleetSelect",
-            "PopupFleetSelect.Label_Marine",
-        )
-        points_to_check_false = am.eigens(
-            "PopupFleetSelect.Label_DutyTag",
-        )
-        return cls.compare_with_pixels(window, points_to_check) and not cls.compare_with_pixels(window, points_to_check_false)
-
-    @classmethod
-    def goto_immediate_start(cls, window):
-        window.left_click(am.rect("PopupFleetSelect.Button_ImmediateStart"), sleep=1)
-
-    @classmethod
-    def goto_fleet_duty(cls, window):
-        window.left_click(am.rect("PopupFleetSelect.Button_ChangeDuty"), sleep=1)
-
-    @classmethod
-    def close(cls, window):
-        window.left_click(am.rect("PopupFleetSelect.Button_Close"), sleep=1)
-
     @classmethod
     def _is_fixed_fleet(cls, window):
         points_to_check = am.eigens(
@@ -216,12 +128,6 @@ class PopupFleetSelection(Scene):
         )
         return cls.compare_with_pixels(window, points_to_check)
 
-    ways = {
-        Namespace.scene_campaign_chapter: close,
-        Namespace.scene_campaign: goto_immediate_start,
-        Namespace.popup_fleet_selection_duty: goto_fleet_duty,
-    }
-
 
 class PopupFleetSelectionArbitrate(PopupFleetSelection):
     name = Namespace.popup_fleet_selection_arbitrate
@@ -229,10 +135,6 @@ class PopupFleetSelectionArbitrate(PopupFleetSelection):
 
     is_fleet_fixed = False
 
-    @classmethod
-    def at_this_scene_impl(cls, window) -> bool:
-        return (not cls._is_fixed_fleet(window)) and super().at_this_scene_impl(window)
-
     @classmethod
     def choose_team(cls, window, team_one=None, team_two=None):
         btn = "PopupFleetSelect.Formation"
@@ -253,24 +155,10 @@ class PopupFleetSelectionFixed(PopupFleetSelection):
         super().__init__(*args, **kwargs)
         self.is_fleet_fixed = True
 
-    @classmethod
-    def at_this_scene_impl(cls, window) -> bool:
-        return cls._is_fixed_fleet(window) and super().at_this_scene_impl(window)
-
 
 class PopupFleetSelectionDuty(PopupFleetSelection):
     name = Namespace.popup_fleet_selection_duty
 
-    @classmethod
-    def at_this_scene_impl(cls, window) -> bool:
-        points_to_check = am.eigens(
-            "PopupFleetSelect.Label_FleetSelect",
-            "PopupFleetSelect.Label_Marine",
-            "PopupFleetSelect.Label_DutyTag",
-        )
-        # return cls.compare_with_pixels(window, points_to_check) and duties != 0b0
-        return cls.compare_with_pixels(window, points_to_check)
-
     @classmethod
     def show_duty(cls, window):
         btn = "PopupFleetSelect.Button_ChangeDuty"
@@ -330,30 +218,9 @@ class SceneCampaignChapter03(SceneCampaignChapter):
 class PopupRescueSOS(Scene):
     name = Namespace.popup_rescue_sos
 
-    @classmethod
-    def at_this_scene_impl(cls, window) -> bool:
-        points_to_check = am.eigens(
-            "AnchorAweigh.Button_RescueSOS.Popup_RescueSOS",
-        )
-        return cls.compare_with_pixels(window, points_to_check)
-
-    @classmethod
-    def goto_scene_anchor_aweigh(cls, window):
-        window.left_click(am.rect("AnchorAweigh.Button_RescueSOS.Popup_RescueSOS.Button_GoBack"), sleep=1)
-
     @classmethod
     def is_signal_found(cls, window):
         points_to_check = am.eigens(
             "AnchorAweigh.Button_RescueSOS.Popup_RescueSOS.Button_Chapter03.State_SignalFound",
         )
         return cls.compare_with_pixels(window, points_to_check)
-
-    @classmethod
-    def goto_scene_chapter03(cls, window):
-        window.left_click(am.rect("AnchorAweigh.Button_RescueSOS.Popup_RescueSOS.Button_Chapter03"), sleep=1.5)
-
-    ways = {
-        Namespace.scene_main: goto_scene_main,
-        Namespace.scene_anchor_aweigh: goto_scene_anchor_aweigh,
-        Namespace.scene_campaign_chapter: goto_scene_chapter03,
-    }
@@ -0,0 +1,298 @@
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Type
+
+import numpy as np
+
+from games.azur_lane.interface.scene.asset_manager import am
+from games.azur_lane.interface.scene.base import Scene, SceneUnknown
+from util.frame import Frame, record_reads
+from util.game_cv.probe import unpack_eigens
+
+
+class Classification(NamedTuple):
+    scene: Type[Scene]
+    matched: Tuple[Type[Scene], ...]  # every compiled scene matched, in order of registration
+    closest: Optional[Type[Scene]]  # compiled scene with most positive probes matched
+    score: float  # ratio of positive probes of the closest scene matched
+
+    @property
+    def ambiguous(self) -> bool:
+        return len(self.matched) > 1
+
+    def __repr__(self):
+        matched = ", ".join(f"{scene}" for scene in self.matched)
+        return f"Classification[{self.scene}, matched: ({matched}), closest: {self.closest} ({self.score:.0%})]"
+
+
+class ProbeNode:
+    """a node of `ProbeTree`, children are built on the first visit"""
+    __slots__ = ("candidates", "known", "asset", "row", "seen", "unseen")
+
+    def __init__(self, candidates: np.ndarray, known: np.ndarray, asset=-1, row=-1):
+        self.candidates = candidates  # signatures left, in order of priority
+        self.known = known  # state of each asset, -1 for not probed yet, 1 for seen, 0 for unseen
+        self.asset = asset  # asset to probe, -1 at a leaf
+        self.row = row  # signature matched at a leaf, -1 for none
+        self.seen: ProbeNode = None
+        self.unseen: ProbeNode = None
+
+    @property
+    def is_leaf(self) -> bool:
+        return self.asset < 0
+
+
+class ProbeTree:
+    """
+    A decision tree over probes of signatures, which probes one asset at a time, and stops as soon as the result is
+    decided, i.e. no signature is left, or the first one left in order of priority is fully verified.
+
+    Only assets of the first signature left are worth probing, since nothing is decided until it's verified or ruled
+    out. Among them, the one told by most signatures left is probed first, so that probes common to scenes (e.g.
+    resource icons) rule out many at once, and are done once; ties are broken by cost.
+
+    The tree is grown lazily along paths walked, and nodes of the same state are shared.
+    """
+
+    def __init__(self, positive: np.ndarray, negative: np.ndarray, costs: np.ndarray):
+        """
+
+        Args:
+            positive: np.ndarray
+                (R, A), assets each signature expects to see, in order of priority
+            negative: np.ndarray
+                (R, A), assets each signature expects not to see
+            costs: np.ndarray
+                (A,), cost to probe each asset, e.g. number of its points
+        """
+        self.positive, self.negative, self.costs = positive, negative, costs
+        self.nodes: Dict[tuple, ProbeNode] = {}
+        self.root = self._node(np.arange(len(positive)), np.full(positive.shape[1], -1, dtype=np.int8))
+
+    def _node(self, candidates: np.ndarray, known: np.ndarray) -> ProbeNode:
+        if (node := self.nodes.get(key := (candidates.tobytes(), known.tobytes()))) is not None:
+            return node
+        node = self.nodes[key] = ProbeNode(candidates, known)
+        if len(candidates) == 0:
+            return node
+        pos, neg = self.positive[candidates], self.negative[candidates]
+        if not (todo := (pos[0] | neg[0]) & (known < 0)).any():
+            node.row = int(candidates[0])
+            return node
+
+        told = pos.sum(axis=0) + neg.sum(axis=0)
+        order = np.lexsort((self.costs, -told))
+        node.asset = int(order[todo[order]][0])
+        return node
+
+    def _child(self, node: ProbeNode, seen: bool) -> ProbeNode:
+        known = node.known.copy()
+        known[node.asset] = seen
+        ruled_out = (self.negative if seen else self.positive)[node.candidates, node.asset]
+        return self._node(node.candidates[~ruled_out], known)
+
+    def walk(self, is_seen) -> Tuple[int, List[int]]:
+        """
+        Args:
+            is_seen: Callable[[int], bool]
+                probe an asset
+
+        Returns:
+            Tuple[int, List[int]], the first signature matched or -1, and assets probed
+        """
+        node, probed = self.root, []
+        while not node.is_leaf:
+            probed.append(node.asset)
+            if is_seen(node.asset):
+                node.seen = node.seen or self._child(node, True)
+                node = node.seen
+            else:
+                node.unseen = node.unseen or self._child(node, False)
+                node = node.unseen
+        return node.row, probed
+
+    def __repr__(self):
+        return f"ProbeTree[{len(self.nodes)} node(s) grown]"
+
+
+class SceneClassifier:
+    """
+    Signatures of scenes compiled into one probe matrix, so that all scenes are scored against a frame with one
+    gathering of pixels and a few boolean matrix products, instead of checking scenes one by one.
+
+    Probes are deduplicated, so eigens shared by scenes (e.g. resource icons) are gathered once. Scenes recognized by
+    custom logic (e.g. templates, OCR) are not compiled, and are checked by `at_this_scene` in order of registration,
+    only if no scene before them matched.
+
+    With `early_exit` on, probes are walked along a `ProbeTree` instead, which reads far fewer pixels, but tells only
+    the first scene matched, rather than all of them.
+
+    Examples:
+        >>> classifier = SceneClassifier(SCENES_REGISTERED.values())
+        >>> classifier.classify(window, frame)
+        Classification[Scene.Main, matched: (Scene.Main), closest: Scene.Main (100%)]
+    """
+    MEMO_KEY = "scene_classification"
+
+    def __init__(self, scenes: Iterable[Type[Scene]], early_exit=False):
+        """
+
+        Args:
+            scenes: Iterable[Type[Scene]]
+                scenes in order of priority, scenes without signatures and custom logic are ignored
+            early_exit: bool, default False
+                probe along a decision tree, and stop as soon as the scene is decided
+        """
+        self.early_exit = early_exit
+        self.scenes = [scene for scene in scenes if scene.recognizable()]
+        self.compiled = [scene for scene in self.scenes if scene.recognized_by_signature()]
+        self._index = {scene: idx for idx, scene in enumerate(self.compiled)}
+        self.stats = {"classified": 0, "reused": 0, "ambiguous": 0, "unknown": 0, "probes": 0, "points": 0}
+        self._compile()
+        self.tree = ProbeTree(self.positive, self.negative, self.asset_points.sum(axis=1)) if early_exit else None
+
+    def _compile(self):
+        assets, rows, row_scenes = {}, [], []  # a row for each signature
+        for idx, scene in enumerate(self.compiled):
+            for signature in scene.signatures():
+                rows.append((
+                    [assets.setdefault(name, len(assets)) for name in signature.positive],
+                    [assets.setdefault(name, len(assets)) for name in signature.negative],
+                ))
+                row_scenes.append(idx)
+
+        self.assets = list(assets)
+        eigens = [np.asarray(am.eigens(name), dtype=np.int64).reshape(-1, 3) for name in assets]
+        stacked = np.vstack(eigens) if eigens else np.empty((0, 3), dtype=np.int64)
+        points, inverse = np.unique(stacked, axis=0, return_inverse=True)
+        self.xy, self.bgr = unpack_eigens(points)
+
+        # (A, P), whether a point is an eigen of the asset
+        self.asset_points = np.zeros((len(assets), len(points)), dtype=bool)
+        self.asset_points[np.repeat(np.arange(len(assets)), [len(e) for e in eigens]), inverse.ravel()] = True
+
+        self.asset_point_indices = [np.flatnonzero(mask) for mask in self.asset_points]
+
+        # (R, A), assets a signature expects to see, or not to see
+        self.positive = np.zeros((len(rows), len(assets)), dtype=bool)
+        self.negative = np.zeros((len(rows), len(assets)), dtype=bool)
+        for row, (pos, neg) in enumerate(rows):
+            self.positive[row, pos] = True
+            self.negative[row, neg] = True
+
+        # (R, P), points a signature expects to match
+        self.positive_points = (self.positive.astype(np.int32) @ self.asset_points.astype(np.int32)) > 0
+        self.n_positive = np.maximum(self.positive_points.sum(axis=1), 1)
+        self.row_scenes = np.asarray(row_scenes, dtype=np.int64)
+        self.row_offsets = np.flatnonzero(np.r_[True, np.diff(self.row_scenes) != 0]) if rows else np.empty(0, np.int64)
+
+    def score(self, frame: Frame) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score compiled scenes against the frame, in one evaluation.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray], whether each compiled scene matches, and ratio of its positive probes matched
+        """
+        if len(self.compiled) == 0:
+            return np.zeros(0, dtype=bool), np.zeros(0)
+        ok = (frame.pixels_bgr(self.xy).astype(np.int16) == self.bgr).all(axis=1)
+        missed = ~ok
+        seen = ~(self.asset_points @ missed)  # an asset is seen if none of its points is missed
+        rows_ok = ~(self.positive_points @ missed) & ~(self.negative @ seen)
+        rows_score = (self.positive_points @ ok.astype(np.int32)) / self.n_positive
+        return np.logical_or.reduceat(rows_ok, self.row_offsets), np.maximum.reduceat(rows_score, self.row_offsets)
+
+    def walk(self, frame: Frame) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Probe compiled scenes along the tree, until the first scene matched is decided.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray], the same as `score`, but only the first scene matched is told, and scores are
+            of that scene only
+        """
+        def is_seen(asset):
+            idx = self.asset_point_indices[asset]
+            return bool((frame.pixels_bgr(self.xy[idx]) == self.bgr[idx]).all())
+
+        row, probed = self.tree.walk(is_seen)
+        matches, scores = np.zeros(len(self.compiled), dtype=bool), np.zeros(len(self.compiled))
+        if row >= 0:
+            matches[self.row_scenes[row]] = scores[self.row_scenes[row]] = 1
+        self.stats["probes"] += len(probed)
+        self.stats["points"] += sum(len(self.asset_point_indices[asset]) for asset in probed)
+        return matches, scores
+
+    def _evaluate(self, frame: Frame) -> Tuple[np.ndarray, np.ndarray]:
+        if self.early_exit:
+            return self.walk(frame)
+        self.stats["probes"] += len(self.assets)
+        self.stats["points"] += len(self.xy)
+        return self.score(frame)
+
+    def _score(self, window, frame: Frame) -> Tuple[np.ndarray, np.ndarray]:
+        """scores, reused while none of the probed areas changes, if the window has a change detector"""
+        if (detector := getattr(window, "change_detector", None)) is None:
+            return self._evaluate(frame)
+        if (res := detector.reuse(key := (self, "score"), frame)) is not None:
+            self.stats["reused"] += 1
+            return res
+        with record_reads() as reads:
+            res = self._evaluate(frame)
+        detector.remember(key, frame, res, reads)
+        return res
+
+    def classify(self, window, frame: Frame = None) -> Classification:
+        """
+        Classify the frame, the first scene matched in order of priority wins. The result is memoized per frame, and
+        results of compiled scenes are memoized as those of `at_this_scene` too.
+
+        Args:
+            window:
+            frame: Frame, optional
+                frame to classify, default the snapshot of window
+
+        Returns:
+            Classification
+        """
+        frame = window.snapshot() if frame is None else frame
+        if (res := frame.memo.get(self.MEMO_KEY)) is not None:
+            return res
+
+        matches, scores = self._score(window, frame)
+        if not self.early_exit:  # with early exit, scenes after the first matched are not decided
+            for scene, is_matched in zip(self.compiled, matches.tolist()):
+                frame.memo.setdefault((scene, "at_this_scene"), is_matched)
+
+        scene_cur = SceneUnknown
+        for scene in self.scenes:
+            idx = self._index.get(scene)
+            if matches[idx] if idx is not None else scene.at_this_scene(window, frame):
+                scene_cur = scene
+                break
+
+        closest = int(np.argmax(scores)) if len(scores) else None
+        res = frame.memo[self.MEMO_KEY] = Classification(
+            scene=scene_cur,
+            matched=tuple(scene for scene, is_matched in zip(self.compiled, matches.tolist()) if is_matched),
+            closest=None if closest is None else self.compiled[closest],
+            score=0. if closest is None else float(scores[closest]),
+        )
+        self.stats["classified"] += 1
+        self.stats["ambiguous"] += res.ambiguous
+        self.stats["unknown"] += scene_cur is SceneUnknown
+        return res
+
+    def metrics(self) -> Dict[str, float]:
+        n = max(self.stats["classified"], 1)
+        return {
+            "classified": self.stats["classified"],
+            "reuse_ratio": self.stats["reused"] / n,
+            "ambiguous_ratio": self.stats["ambiguous"] / n,
+            "unknown_ratio": self.stats["unknown"] / n,
+            "avg_probes": self.stats["probes"] / max(n - self.stats["reused"], 1),
+            "avg_points": self.stats["points"] / max(n - self.stats["reused"], 1),
+        }
+
+    def __repr__(self):
+        return (
+            f"SceneClassifier[{len(self.compiled)}/{len(self.scenes)} scene(s) compiled, "
+            f"{len(self.xy)} point(s), {len(self.assets)} asset(s), early exit: {self.early_exit}]"
+        )
@@ -0,0 +1,113 @@
+from typing import Dict, List, Mapping, NamedTuple, Optional, Tuple, Type, Union
+
+from games.azur_lane.config import CONFIG_SCENE_DEFINITION
+from games.azur_lane.interface.scene.asset_manager import am
+from games.azur_lane.interface.scene.base import Scene, Signature, Template
+from util.io import load_yaml
+
+
+class Click:
+    """A way to another scene by clicking on the `__Rect` of an asset, or a point."""
+
+    def __init__(self, target: Union[str, List[int]]):
+        self.target = target if isinstance(target, str) else tuple(target)
+
+    def __call__(self, window):
+        window.left_click(am.rect(self.target) if isinstance(self.target, str) else self.target)
+
+    def __repr__(self):
+        return f"Click[{self.target}]"
+
+
+class SceneDefinition(NamedTuple):
+    name: str
+    signature: Optional[Tuple[Signature, ...]]  # None to keep the one in python
+    templates: Optional[Tuple[Template, ...]]
+    ways: Dict[str, Click]
+
+
+def _parse_signature(definition: dict) -> Signature:
+    return Signature(positive=tuple(definition.get("__Positive", ())), negative=tuple(definition.get("__Negative", ())))
+
+
+def _check_assets(name: str, definition: SceneDefinition):
+    """fail at startup rather than at the first frame, if an asset is misspelled"""
+    required = []
+    for signature in definition.signature or ():
+        required.extend((asset, "Eigen") for asset in (*signature.positive, *signature.negative))
+    for template in definition.templates or ():
+        required.extend([(template.asset, "Image"), (template.asset, "ImageRect")])
+    required.extend((way.target, "Rect") for way in definition.ways.values() if isinstance(way.target, str))
+
+    for asset, asset_type in required:
+        try:
+            am.resolve(asset, asset_type)
+        except (KeyError, TypeError):
+            raise ValueError(f"scene {name}: no __{asset_type} of asset {asset}") from None
+
+
+def parse_definition(name: str, definition: dict) -> SceneDefinition:
+    """
+
+    Args:
+        name: str
+            name of the scene
+        definition: dict
+            e.g. {"__Positive": [...], "__Negative": [...], "__Ways": {"Scene.Main": "AnchorAweigh.Button_BackToMain"}}
+
+    Returns:
+        SceneDefinition
+    """
+    signature = None
+    if "__Signatures" in definition:
+        signature = tuple(_parse_signature(alternative) for alternative in definition["__Signatures"])
+    elif "__Positive" in definition:
+        signature = (_parse_signature(definition),)
+
+    templates = None
+    if "__Templates" in definition:
+        templates = tuple(
+            Template(template["__Asset"], template.get("__Threshold", Template._field_defaults["threshold"]))
+            for template in definition["__Templates"]
+        )
+
+    ways = {target: Click(way) for target, way in (definition.get("__Ways") or {}).items()}
+    res = SceneDefinition(name, signature, templates, ways)
+    _check_assets(name, res)
+    return res
+
+
+def load_definitions(file: str = CONFIG_SCENE_DEFINITION) -> Dict[str, SceneDefinition]:
+    return {name: parse_definition(name, definition) for name, definition in (load_yaml(file) or {}).items()}
+
+
+def apply_definitions(
+        scenes: Mapping[str, Type[Scene]], definitions: Mapping[str, SceneDefinition]
+) -> Dict[str, Type[Scene]]:
+    """
+    Complete scenes by their definitions: signatures and templates replace the ones in python, and ways are added to
+    the ones in python (inherited ones included). Scenes defined but not in python are created as plain `Scene`.
+
+    Args:
+        scenes: Mapping[str, Type[Scene]]
+            scenes registered, by name
+        definitions: Mapping[str, SceneDefinition]
+
+    Returns:
+        Dict[str, Type[Scene]], scenes registered, and the ones created, by name
+    """
+    res = dict(scenes)
+    for name, definition in definitions.items():
+        if name not in res:
+            res[name] = type(name.replace(".", ""), (Scene,), {"name": name, "__module__": __name__})
+
+    # parents first, so that ways of a parent are inherited by its children
+    for scene in sorted((res[name] for name in definitions), key=lambda x: len(x.__mro__)):
+        definition = definitions[scene.name]
+        if definition.signature is not None:
+            scene.signature = definition.signature[0] if len(definition.signature) == 1 else definition.signature
+        if definition.templates is not None:
+            scene.templates = definition.templates
+        if definition.ways:
+            scene.ways = {**scene.ways, **definition.ways}
+    return res
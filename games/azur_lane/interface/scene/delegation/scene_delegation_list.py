@@ -1,5 +1,4 @@
-from games.azur_lane.interface.scene.asset_manager import am
-from games.azur_lane.interface.scene.base import Scene, goto_scene_main
+from games.azur_lane.interface.scene.base import Scene
 from games.azur_lane.interface.scene.name import Namespace
 
 __all__ = ["PopupDelegationSuccess", "SceneDelegationList"]
@@ -8,36 +7,10 @@ __all__ = ["PopupDelegationSuccess", "SceneDelegationList"]
 class PopupDelegationSuccess(Scene):
     name = Namespace.popup_delegation_success
 
-    @classmethod
-    def at_this_scene_impl(cls, window) -> bool:
-        points_to_check = am.eigens(
-            "Main.Button_Commission.Popup_Commission.Popup_DelegationSuccess",
-        )
-        return cls.compare_with_pixels(window, points_to_check)
-
-    @classmethod
-    def goto_popup_get_items(cls, window):
-        window.left_click(
-            am.rect("Main.Button_Commission.Popup_Commission.Delegation.Popup_DelegationSuccess.Button_ExitScene"),
-            sleep=1
-        )
-
-    ways = {
-        Namespace.scene_get_items: goto_popup_get_items,
-    }
-
 
 class SceneDelegationList(Scene):
     name = Namespace.scene_delegation_list
 
-    @classmethod
-    def at_this_scene_impl(cls, window) -> bool:
-        points_to_check = am.eigens(
-            "Scene_DelegationList.Label_Delegation",
-            "Scene_DelegationList.Label_AvailableFleets",
-        )
-        return cls.compare_with_pixels(window, points_to_check)
-
     # def detect_delegations(self):
     #     ocr_paddle = load_recognizer()
     #     from matplotlib import pyplot as plt
@@ -90,7 +63,3 @@ class SceneDelegationList(Scene):
     #         # print(data)
     #
     #     pass
-
-    ways = {
-        Namespace.scene_main: goto_scene_main
-    }
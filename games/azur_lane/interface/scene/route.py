@@ -0,0 +1,193 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Mapping, Optional, Tuple, Type
+
+from games.azur_lane import logger_azurlane
+from games.azur_lane.interface.scene.base import Scene
+
+
+class RoutePlanner:
+    """
+    Routes between scenes over the graph of all `ways`, the shortest by time measured of each transition so far.
+
+    Routes to a destination are planned from every scene at once (Dijkstra over the reversed graph), and cached until
+    the cost of a transition drifts away from the one planned with, so that replanning from wherever a hop actually
+    lands is a lookup. Each hop is verified with a fresh frame before the next one is taken. Transitions are measured
+    by `observe`, which listens to transitions of windows, see `GameWindow.observe_transition`.
+
+    Examples:
+        >>> planner = RoutePlanner(SCENES_REGISTERED)
+        >>> window.transition_listeners.append(planner.observe)
+        >>> planner.route(SceneMain, PopupStageInfo)
+        [SceneAnchorAweigh, PopupRescueSOS, SceneCampaignChapter, PopupStageInfo]
+        >>> planner.goto(window, PopupStageInfo, recognize, hop_kwargs={PopupStageInfo.name: {"chapter_no": "3-5"}})
+        True
+    """
+    logger = logger_azurlane
+
+    def __init__(self, scenes: Mapping[str, Type[Scene]], default_cost=2., replan_ratio=.25):
+        """
+
+        Args:
+            scenes: Mapping[str, Type[Scene]]
+                scenes registered, by name
+            default_cost: float, default 2.
+                seconds a transition is supposed to take before it's measured
+            replan_ratio: float, default .25
+                routes are planned again once the cost of a transition changes by more than this ratio
+        """
+        self.default_cost = default_cost
+        self.replan_ratio = replan_ratio
+        self.graph: Dict[Type[Scene], List[Type[Scene]]] = {
+            scene: [scenes[name] for name in scene.ways if name in scenes and scenes[name] is not scene]
+            for scene in scenes.values()
+        }
+        self.reversed_graph: Dict[Type[Scene], List[Type[Scene]]] = defaultdict(list)
+        for scene, successors in self.graph.items():
+            for successor in successors:
+                self.reversed_graph[successor].append(scene)
+
+        self.costs: Dict[Tuple[Type[Scene], Type[Scene]], float] = {}  # cost planned with, of measured transitions
+        self.stats = defaultdict(lambda: {"hops": 0, "arrived": 0, "elapsed": 0.})
+        self.routes: Dict[Type[Scene], Dict[Type[Scene], Type[Scene]]] = {}  # destination -> scene -> next hop
+        self.lock = threading.Lock()
+
+    def cost(self, scene: Type[Scene], successor: Type[Scene]) -> float:
+        """expected seconds to arrive at the successor from the scene, retries of failed hops included"""
+        return self.costs.get((scene, successor), self.default_cost)
+
+    def _measured_cost(self, stats) -> float:
+        avg_elapsed = stats["elapsed"] / stats["hops"]
+        return avg_elapsed * (stats["hops"] + 1) / (stats["arrived"] + 1)  # smoothed, 1 / rate of arrival
+
+    def observe(self, scene: Type[Scene], successor: Type[Scene], landed: Type[Scene], elapsed: float):
+        """
+        Record a hop taken.
+
+        Args:
+            scene: Type[Scene]
+            successor: Type[Scene]
+                scene the hop was for
+            landed: Type[Scene]
+                scene actually landed at
+            elapsed: float
+                seconds from the input to landing
+        """
+        with self.lock:
+            stats = self.stats[(scene, successor)]
+            stats["hops"] += 1
+            stats["arrived"] += landed is successor
+            stats["elapsed"] += elapsed
+            cost, cost_planned = self._measured_cost(stats), self.cost(scene, successor)
+            if abs(cost - cost_planned) > cost_planned * self.replan_ratio:
+                self.costs[(scene, successor)] = cost
+                self.routes.clear()
+
+    def _plan(self, destination: Type[Scene]) -> Dict[Type[Scene], Type[Scene]]:
+        """next hop of every scene which can reach the destination, cached"""
+        with self.lock:
+            if (next_hops := self.routes.get(destination)) is not None:
+                return next_hops
+
+            distances, next_hops, tie = {destination: 0.}, {}, itertools.count()  # scenes are not comparable
+            heap = [(0., next(tie), destination)]
+            while heap:
+                distance, _, scene = heapq.heappop(heap)
+                if distance > distances[scene]:
+                    continue
+                for predecessor in self.reversed_graph.get(scene, ()):
+                    if (d := distance + self.cost(predecessor, scene)) < distances.get(predecessor, float("inf")):
+                        distances[predecessor], next_hops[predecessor] = d, scene
+                        heapq.heappush(heap, (d, next(tie), predecessor))
+            self.routes[destination] = next_hops
+            return next_hops
+
+    def next_hop(self, scene: Type[Scene], destination: Type[Scene]) -> Optional[Type[Scene]]:
+        return self._plan(destination).get(scene)
+
+    def route(self, scene: Type[Scene], destination: Type[Scene]) -> Optional[List[Type[Scene]]]:
+        """
+        Args:
+            scene: Type[Scene]
+            destination: Type[Scene]
+
+        Returns:
+            List[Type[Scene]], scenes to pass in order, the destination included, or None if it's unreachable
+        """
+        next_hops, res = self._plan(destination), []
+        while scene is not destination:
+            if (scene := next_hops.get(scene)) is None:
+                return None
+            res.append(scene)
+        return res
+
+    def goto(
+            self, window, destination: Type[Scene], recognize: Callable[..., Type[Scene]],
+            hop_kwargs: Mapping[str, dict] = None, hop_timeout=5., max_hops=None, **kwargs
+    ) -> bool:
+        """
+        Go to the destination hop by hop, and plan again from wherever a hop lands if it's not the one expected.
+
+        Args:
+            window:
+            destination: Type[Scene]
+            recognize: Callable[[window], Type[Scene]]
+                recognize the scene of a fresh frame among all scenes
+            hop_kwargs: Mapping[str, dict], optional
+                keyword arguments of the way to each scene by name, e.g. {"Popup.StageInfo": {"chapter_no": "3-5"}}
+            hop_timeout: float, default 5.
+                seconds to wait for a hop to arrive, see `GameWindow.wait_until_scene`
+            max_hops: int, optional
+                default twice the number of scenes
+            **kwargs:
+                keyword arguments of the way to the destination
+
+        Returns:
+            bool, whether it has arrived
+        """
+        hop_kwargs = {**(hop_kwargs or {}), destination.name: kwargs} if kwargs else hop_kwargs or {}
+        max_hops = 2 * len(self.graph) if max_hops is None else max_hops
+
+        scene = window.scene_cur
+        if not scene.at_this_scene(window, window.grab_frame()):
+            scene = recognize(window)
+        for _ in range(max_hops):
+            if scene is destination:
+                return True
+            if (successor := self.next_hop(scene, destination)) is None:
+                self.logger.warning(f"no route from {scene} to {destination}")
+                return False
+
+            start = time.perf_counter()
+            scene.ways_to(successor.name)(window, **hop_kwargs.get(successor.name, {}))
+            if (landed := window.wait_until_scene(successor, timeout=hop_timeout)) is None:
+                landed = recognize(window)
+            window.observe_transition(scene, successor, landed, time.perf_counter() - start)
+            if landed is not successor:
+                self.logger.info(f"expected {successor} after {scene}, landed at {landed}, replan")
+            window.scene_state.switch(landed)
+            scene = landed
+
+        self.logger.warning(f"gave up going to {destination} after {max_hops} hop(s), at {scene}")
+        return scene is destination
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        """hops taken, rate of arrival, latency and cost of each transition"""
+        with self.lock:
+            stats = {edge: dict(s) for edge, s in self.stats.items()}
+        return {
+            f"{scene} -> {successor}": {
+                "hops": s["hops"],
+                "arrival_rate": s["arrived"] / s["hops"],
+                "avg_ms": s["elapsed"] / s["hops"] * 1000,
+                "cost": self.cost(scene, successor),
+            }
+            for (scene, successor), s in stats.items()
+        }
+
+    def __repr__(self):
+        n_ways = sum(len(successors) for successors in self.graph.values())
+        return f"RoutePlanner[{len(self.graph)} scene(s), {n_ways} way(s), {len(self.costs)} measured]"
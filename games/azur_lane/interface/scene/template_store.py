@@ -0,0 +1,176 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from games.azur_lane import logger_azurlane
+from util.game_cv import binarize
+
+
+def _downscale(image: np.ndarray) -> np.ndarray:
+    return cv2.resize(image, None, fx=.5, fy=.5, interpolation=cv2.INTER_AREA)
+
+
+class TemplateStore:
+    """
+    Templates decoded once, and kept in a LRU bounded by bytes, with variants of them (gray, binarized, downscaled)
+    derived ahead.
+
+    Decoded templates and variants are saved as .npy files, which are memory-mapped on later loads (or runs) instead of
+    decoding PNGs again; they are named after the mtime and size of the PNG, so that a changed PNG is decoded again.
+    Templates returned are read-only.
+
+    Examples:
+        >>> store = TemplateStore(DIR_BASE, dir_cache=f"{DIR_USR_AUTO_GAME_AZURLANE}/cache/templates")
+        >>> store.preload(["/assets/campaign/Label_LevelSmall_R25.png"])
+        >>> store.get("/assets/campaign/Label_LevelSmall_R25.png", "gray").shape
+        (25, 40)
+    """
+    VARIANTS: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+        "gray": lambda bgr: cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY),
+        "binary": binarize,
+        "half": _downscale,
+    }
+    logger = logger_azurlane
+
+    def __init__(self, dir_base: str, dir_cache: str = None, max_bytes=64 << 20, precompute=("gray", "binary", "half")):
+        """
+
+        Args:
+            dir_base: str
+                directory which files of templates are relative to
+            dir_cache: str, optional
+                directory to save decoded templates to, default not to save
+            max_bytes: int, default 64 MiB
+                most bytes of templates kept
+            precompute: Tuple[str, ...], default ("gray", "binary", "half")
+                variants derived on preloading, see `VARIANTS`
+        """
+        self.dir_base = dir_base
+        self.dir_cache = dir_cache
+        self.max_bytes = max_bytes
+        self.precompute = precompute
+        self.cache: OrderedDict[Tuple[str, str], np.ndarray] = OrderedDict()  # (file, variant) -> template
+        self.n_bytes = 0
+        self.missing = set()
+        self.stats = {"hits": 0, "misses": 0, "decoded": 0, "mapped": 0, "evicted": 0}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.cache)
+
+    def get(self, file: str, variant="bgr") -> Optional[np.ndarray]:
+        """
+        Args:
+            file: str
+                file of the template, relative to `dir_base`, e.g. "/assets/campaign/Label_LevelSmall_R25.png"
+            variant: str, default "bgr"
+                "bgr" as decoded, or one of `VARIANTS`
+
+        Returns:
+            np.ndarray, read-only, or None if the file is missing
+        """
+        key = (file, variant)
+        with self.lock:
+            if (res := self.cache.get(key)) is not None:
+                self.cache.move_to_end(key)
+                self.stats["hits"] += 1
+                return res
+            self.stats["misses"] += 1
+
+        if (res := self._load(file, variant)) is not None:
+            self._put(key, res)
+        return res
+
+    def _put(self, key: Tuple[str, str], template: np.ndarray):
+        with self.lock:
+            if key in self.cache:
+                return
+            self.cache[key] = template
+            self.n_bytes += template.nbytes
+            while self.n_bytes > self.max_bytes and len(self.cache) > 1:
+                _, evicted = self.cache.popitem(last=False)
+                self.n_bytes -= evicted.nbytes
+                self.stats["evicted"] += 1
+
+    def _cache_file(self, file: str, variant: str) -> Optional[Path]:
+        if self.dir_cache is None or not (path := Path(f"{self.dir_base}{file}")).exists():
+            return None
+        st = path.stat()
+        digest = hashlib.sha1(file.encode("utf-8")).hexdigest()[:16]
+        return Path(self.dir_cache, f"{digest}_{variant}_{st.st_mtime_ns}_{st.st_size}.npy")
+
+    def _load(self, file: str, variant: str) -> Optional[np.ndarray]:
+        if file in self.missing:
+            return None
+        if (cache_file := self._cache_file(file, variant)) is not None and cache_file.exists():
+            try:
+                res = np.load(cache_file, mmap_mode="r")
+                self.stats["mapped"] += 1
+                return res
+            except (OSError, ValueError) as e:
+                self.logger.warning(f"failed to map {cache_file}: {e}")
+
+        if variant == "bgr":
+            if (res := cv2.imread(f"{self.dir_base}{file}")) is None:
+                self.missing.add(file)  # not to read it again
+                self.logger.warning(f"template {file} not found in {self.dir_base}")
+                return None
+            self.stats["decoded"] += 1
+        elif (bgr := self.get(file, "bgr")) is not None:
+            res = np.ascontiguousarray(self.VARIANTS[variant](bgr))
+        else:
+            return None
+
+        res.setflags(write=False)
+        if cache_file is not None:
+            self._save(cache_file, res)
+        return res
+
+    def _save(self, cache_file: Path, template: np.ndarray):
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            for stale in cache_file.parent.glob(f"{cache_file.name.rsplit('_', 2)[0]}_*.npy"):
+                stale.unlink()  # of a previous version of the PNG
+            tmp = cache_file.with_suffix(".tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, template)
+            os.replace(tmp, cache_file)
+        except OSError as e:
+            self.logger.warning(f"failed to save template to {cache_file}: {e}")
+
+    def preload(self, files: Iterable[str]) -> int:
+        """
+        Load templates, and derive variants of them in `precompute`.
+
+        Returns:
+            int, number of templates loaded
+        """
+        n = 0
+        for file in files:
+            if self.get(file) is None:
+                continue
+            n += 1
+            for variant in self.precompute:
+                self.get(file, variant)
+        self.logger.info(f"preload {n} template(s), {self}")
+        return n
+
+    def metrics(self) -> Dict[str, float]:
+        with self.lock:
+            stats, n_bytes, n = dict(self.stats), self.n_bytes, len(self.cache)
+        return {
+            **stats,
+            "hit_ratio": stats["hits"] / max(stats["hits"] + stats["misses"], 1),
+            "templates": n,
+            "bytes": n_bytes,
+            "missing": len(self.missing),
+        }
+
+    def __repr__(self):
+        return f"TemplateStore[{len(self)} template(s), {self.n_bytes / 2 ** 20:.1f}/{self.max_bytes / 2 ** 20:.0f} MiB]"
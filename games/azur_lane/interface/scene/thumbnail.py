@@ -0,0 +1,201 @@
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Mapping, NamedTuple, Optional, Type, Union
+
+import cv2
+import numpy as np
+
+from games.azur_lane import logger_azurlane
+from games.azur_lane.interface.scene.base import Scene, SceneUnknown
+from util.frame import Frame
+
+
+class Guess(NamedTuple):
+    scene: Type[Scene]
+    confidence: float  # 1 - distance to the nearest / distance to the nearest of other scenes
+    distance: float  # root mean square difference of thumbnails, in 0 ~ 255
+
+    def __repr__(self):
+        return f"Guess[{self.scene}, confidence: {self.confidence:.0%}, distance: {self.distance:.1f}]"
+
+
+class ThumbnailIndex:
+    """
+    Nearest neighbours of downsampled thumbnails of frames known, to guess the scene of frames which no signature
+    matches, e.g. a scene whose eigens are covered by an animation.
+
+    Thumbnails are kept in one array, at most `capacity` of each scene (the oldest is replaced), so that a query is
+    one matrix-vector product.
+
+    Examples:
+        >>> index = ThumbnailIndex()
+        >>> index.add(SceneMain, frame_main)
+        >>> index.nearest(frame)
+        Guess[Scene.Main, confidence: 87%, distance: 3.2]
+    """
+    logger = logger_azurlane
+    MEMO_KEY = "thumbnail_guess"
+
+    def __init__(
+            self, size=(32, 18), capacity=32, max_distance=24., min_confidence=.3, dir_unknown: str = None,
+            log_interval=5.
+    ):
+        """
+
+        Args:
+            size: Tuple[int, int], default (32, 18)
+                width and height of thumbnails
+            capacity: int, default 32
+                most thumbnails kept of each scene
+            max_distance: float, default 24.
+                frames farther than this from all thumbnails are unknown
+            min_confidence: float, default .3
+                guesses less confident than this are unknown
+            dir_unknown: str, optional
+                directory to save unknown frames to for labelling, default not to save
+            log_interval: float, default 5.
+                min seconds between two unknown frames saved
+        """
+        self.size = size
+        self.capacity = capacity
+        self.max_distance = max_distance
+        self.min_confidence = min_confidence
+        self.dir_unknown = dir_unknown
+        self.log_interval = log_interval
+        self.last_logged = 0.
+
+        n_dims = size[0] * size[1] * 3
+        self.scenes: Dict[Type[Scene], int] = {}  # scene -> label
+        self.vectors = np.empty((0, n_dims), dtype=np.float32)
+        self.norms = np.empty(0, dtype=np.float32)  # squared norms of vectors
+        self.labels = np.empty(0, dtype=np.int64)
+        self.added = np.empty(0, dtype=np.int64)  # order added, to replace the oldest
+        self._n_added = 0
+        self.stats = {"queries": 0, "guessed": 0, "unknown": 0, "logged": 0}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.labels)
+
+    def thumbnail(self, image: Union[Frame, np.ndarray]) -> np.ndarray:
+        """flattened thumbnail of a frame, or a BGR image"""
+        image = image.bgr if isinstance(image, Frame) else image
+        step = max(min(image.shape[1] // self.size[0], image.shape[0] // self.size[1]) // 4, 1)
+        image = image[::step, ::step]  # strided first, areas of 4*4 samples are enough to average over
+        return cv2.resize(image, self.size, interpolation=cv2.INTER_AREA).astype(np.float32).ravel()
+
+    def add(self, scene: Type[Scene], image: Union[Frame, np.ndarray]):
+        self._insert(scene, self.thumbnail(image))
+
+    def _insert(self, scene: Type[Scene], vector: np.ndarray):
+        with self.lock:
+            label = self.scenes.setdefault(scene, len(self.scenes))
+            self._n_added += 1
+            if (mask := self.labels == label).sum() < self.capacity:
+                self.vectors = np.vstack((self.vectors, vector))
+                self.norms = np.append(self.norms, vector @ vector)
+                self.labels = np.append(self.labels, label)
+                self.added = np.append(self.added, self._n_added)
+                return
+            # replaced on copies, as readers use the arrays out of the lock
+            oldest = np.flatnonzero(mask)[np.argmin(self.added[mask])]
+            vectors, norms, added = self.vectors.copy(), self.norms.copy(), self.added.copy()
+            vectors[oldest], norms[oldest], added[oldest] = vector, vector @ vector, self._n_added
+            self.vectors, self.norms, self.added = vectors, norms, added
+
+    def nearest(self, image: Union[Frame, np.ndarray]) -> Optional[Guess]:
+        """
+        Args:
+            image: Frame, or np.ndarray of BGR
+
+        Returns:
+            Guess, the scene of the nearest thumbnail, or None if the index is empty
+        """
+        vector = self.thumbnail(image)
+        with self.lock:
+            if len(self.labels) == 0:
+                return None
+            vectors, norms, labels, scenes = self.vectors, self.norms, self.labels, list(self.scenes)
+            self.stats["queries"] += 1
+
+        sq_distances = np.maximum(norms - 2 * (vectors @ vector) + vector @ vector, 0)
+        distances = np.sqrt(sq_distances / len(vector))
+        nearest = int(np.argmin(distances))
+        others = distances[labels != labels[nearest]]
+        d_other = float(others.min()) if len(others) else self.max_distance
+        confidence = max(1 - float(distances[nearest]) / max(d_other, 1e-6), 0.)
+        return Guess(scenes[labels[nearest]], confidence, float(distances[nearest]))
+
+    def guess(self, frame: Frame) -> Optional[Guess]:
+        """
+        Guess the scene of a frame no signature matches, and save the frame for labelling if it's still unknown. The
+        guess is kept in `memo` of the frame as well.
+
+        Returns:
+            Guess, or None if it's not close or confident enough
+        """
+        if (guess := self.nearest(frame)) is not None and guess.distance <= self.max_distance \
+                and guess.confidence >= self.min_confidence:
+            self._count("guessed")
+            self.logger.debug(f"unknown frame {frame.frame_id} resolved, {guess}")
+            frame.memo[self.MEMO_KEY] = guess
+            return guess
+        self._count("unknown")
+        self.log_unknown(frame, guess)
+        return None
+
+    def recognize(self, frame: Frame) -> Type[Scene]:
+        """
+        Returns:
+            Type[Scene], the scene guessed, or `SceneUnknown` if it's not close or confident enough, see `guess`
+        """
+        return SceneUnknown if (guess := self.guess(frame)) is None else guess.scene
+
+    def _count(self, key: str):
+        with self.lock:
+            self.stats[key] += 1
+
+    def log_unknown(self, frame: Frame, guess: Guess = None):
+        if self.dir_unknown is None:
+            return
+        with self.lock:
+            if time.time() - self.last_logged < self.log_interval:
+                return
+            self.last_logged = time.time()
+        Path(self.dir_unknown).mkdir(parents=True, exist_ok=True)
+        hint = "none" if guess is None else f"{guess.scene}_{guess.confidence:.2f}"
+        file = f"{self.dir_unknown}/{time.strftime('%Y%m%d_%H%M%S')}_{frame.frame_id}_{hint}.png"
+        cv2.imwrite(file, frame.bgr)
+        self._count("logged")
+        self.logger.debug(f"unknown frame saved to {file}, {guess}")
+
+    def save(self, path: str):
+        with self.lock:
+            names = np.array([scene.name for scene in self.scenes])
+            np.savez_compressed(path, vectors=self.vectors, labels=self.labels, names=names, size=np.array(self.size))
+
+    def load(self, path: str, scenes: Mapping[str, Type[Scene]]) -> "ThumbnailIndex":
+        """Add thumbnails saved of scenes registered, those of another size are skipped."""
+        with np.load(path) as data:
+            if tuple(data["size"].tolist()) != tuple(self.size):
+                self.logger.warning(f"skip thumbnails of {path}, size {tuple(data['size'])} is not {self.size}")
+                return self
+            names, vectors, labels = data["names"].tolist(), data["vectors"], data["labels"]
+        for vector, label in zip(vectors, labels):
+            if (scene := scenes.get(names[label])) is not None:
+                self._insert(scene, vector.astype(np.float32))
+        return self
+
+    def metrics(self) -> Dict[str, float]:
+        with self.lock:
+            stats = dict(self.stats)
+        return {
+            "thumbnails": len(self),
+            "queries": stats["queries"],
+            "guessed_ratio": stats["guessed"] / max(stats["queries"], 1),
+            "unknown_logged": stats["logged"],
+        }
+
+    def __repr__(self):
+        return f"ThumbnailIndex[{len(self)} thumbnail(s) of {len(self.scenes)} scene(s), {self.size[0]}*{self.size[1]}]"
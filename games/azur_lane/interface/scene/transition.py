@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Callable, Dict, List, Mapping, Type
+
+from games.azur_lane.interface.scene.base import Scene
+from util.frame import Frame
+
+
+class TransitionPrior:
+    """
+    Which scenes are likely to come after a scene, from the `ways` of it, and transitions observed so far.
+
+    Likely successors of the current scene (including staying at it) are checked first, and all scenes are checked by
+    `fallback` only if none of them matches. Hit-rate and latency are kept per source scene.
+
+    Examples:
+        >>> prior = TransitionPrior(SCENES_REGISTERED)
+        >>> prior.recognize(window, frame, window.scene_cur, fallback=lambda: classifier.classify(window, frame).scene)
+    """
+
+    def __init__(self, scenes: Mapping[str, Type[Scene]], weight_ways=1., max_candidates=4):
+        """
+
+        Args:
+            scenes: Mapping[str, Type[Scene]]
+                scenes registered, by name
+            weight_ways: float, default 1.
+                weight of a way of the scene, as if the transition was observed that many times
+            max_candidates: int, default 4
+                most successors to check before falling back
+        """
+        self.weight_ways = weight_ways
+        self.max_candidates = max_candidates
+        self.graph: Dict[Type[Scene], List[Type[Scene]]] = {
+            scene: [
+                successor for successor in (scene, *(scenes[name] for name in scene.ways if name in scenes))
+                if successor.recognizable()
+            ]
+            for scene in scenes.values()
+        }
+        self.counts: Dict[Type[Scene], Counter] = defaultdict(Counter)  # source -> successor -> times observed
+        self.stats = defaultdict(lambda: {"hits": 0, "misses": 0, "checked": 0, "elapsed_hit": 0., "elapsed_miss": 0.})
+        self.lock = threading.Lock()
+
+    def successors(self, scene: Type[Scene]) -> List[Type[Scene]]:
+        """likely successors of the scene, the most likely first"""
+        with self.lock:
+            scores = Counter(self.counts[scene])
+        for successor in self.graph.get(scene, ()):
+            scores[successor] += self.weight_ways
+        return [successor for successor, _ in scores.most_common(self.max_candidates)]
+
+    def observe(self, source: Type[Scene], successor: Type[Scene]):
+        with self.lock:
+            self.counts[source][successor] += 1
+
+    def recognize(self, window, frame: Frame, source: Type[Scene], fallback: Callable[[], Type[Scene]]) -> Type[Scene]:
+        """
+        Args:
+            window:
+            frame: Frame
+            source: Type[Scene]
+                scene recognized last time
+            fallback: Callable[[], Type[Scene]]
+                recognize among all scenes
+
+        Returns:
+            Type[Scene]
+        """
+        start, checked, res = time.perf_counter(), 0, None
+        for scene in self.successors(source):
+            checked += 1
+            if scene.at_this_scene(window, frame):
+                res = scene
+                break
+        if not (is_hit := res is not None):
+            res = fallback()
+        if res.recognizable():  # e.g. not `SceneUnknown`, which is never worth checking
+            self.observe(source, res)
+
+        with self.lock:
+            stats = self.stats[source]
+            stats["hits" if is_hit else "misses"] += 1
+            stats["checked"] += checked
+            stats["elapsed_hit" if is_hit else "elapsed_miss"] += time.perf_counter() - start
+        return res
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        """hit-rate, successors checked, and latency of recognition, per source scene"""
+        with self.lock:
+            stats = {source: dict(s) for source, s in self.stats.items()}
+        return {
+            f"{source}": {
+                "recognized": (n := s["hits"] + s["misses"]),
+                "hit_rate": s["hits"] / max(n, 1),
+                "avg_checked": s["checked"] / max(n, 1),
+                "avg_hit_ms": s["elapsed_hit"] / max(s["hits"], 1) * 1000,
+                "avg_miss_ms": s["elapsed_miss"] / max(s["misses"], 1) * 1000,
+            }
+            for source, s in stats.items()
+        }
+
+    def __repr__(self):
+        n_ways = sum(successor is not scene for scene, successors in self.graph.items() for successor in successors)
+        return f"TransitionPrior[{len(self.graph)} scene(s), {n_ways} way(s), max candidates: {self.max_candidates}]"
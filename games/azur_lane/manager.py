@@ -1,32 +1,126 @@
 import signal
+import threading
 import time
+from pathlib import Path
 from multiprocessing import SimpleQueue
-
-from pynput import keyboard
+from typing import NamedTuple, Optional, Tuple, Type
 
 from games.azur_lane import logger_azurlane
-from games.azur_lane.interface.scene import SCENES_REGISTERED, SceneUnknown
+from games.azur_lane.config import DIR_USR_AUTO_GAME_AZURLANE
+from games.azur_lane.interface.scene import SCENES_REGISTERED, Scene, SceneUnknown
+from games.azur_lane.interface.scene.asset_manager import am
+from games.azur_lane.interface.scene.classifier import SceneClassifier
+from games.azur_lane.interface.scene.route import RoutePlanner
+from games.azur_lane.interface.scene.thumbnail import Guess, ThumbnailIndex
+from games.azur_lane.interface.scene.transition import TransitionPrior
 from games.azur_lane.task import TASKS_REGISTERED
-from util.concurrent import KillableThread
+from util.concurrent import AdaptiveInterval, KillableThread, Publisher
+from util.frame import Frame
+from util.screen.change import ChangeDetector
+from util.screen.planner import CapturePlanner
 from util.window import GameWindow
 
 
+class SceneChange(NamedTuple):
+    prev: Type[Scene]
+    cur: Type[Scene]
+    timestamp: float
+    frame_id: int
+    confidence: float = 1.  # 1 if told by signatures, or that of the thumbnail guess, see `ThumbnailIndex`
+
+
 class SceneManager:
+    """
+    Keep recognizing the scene of the window, and publish changes of it to subscribers.
+
+    The screen is polled fast right after an input or a scene change, and less and less often while the scene stays
+    the same, see `AdaptiveInterval`. Refreshing is suspended while no subscriber is active, e.g. all tasks are paused.
+    """
     SCENES_REGISTERED = SCENES_REGISTERED
     logger = logger_azurlane
+    FILE_THUMBNAILS = f"{DIR_USR_AUTO_GAME_AZURLANE}/thumbnails.npz"
+    DIR_UNKNOWN = f"{DIR_USR_AUTO_GAME_AZURLANE}/unknown"
 
     def __init__(self, game_window: GameWindow):
         self.window = game_window
-        self.config = {"interval": 1}
+        self.config = {
+            "interval_min": .1, "interval_max": 2., "backoff": 1.5, "suspend_when_idle": True,
+            "early_exit": False, "transition_prior": True, "thumbnail_fallback": True, "preload_templates": True,
+            "trust_thumbnails": False, "thumbnail_interval": 1.,
+        }
+        self.interval = self._adaptive_interval()
+        self.classifier: SceneClassifier = None
+        self.prior: TransitionPrior = None
+        self.planner: RoutePlanner = None
+        self.thumbnails: ThumbnailIndex = None
+        self.compiled_with: tuple = None  # settings which scenes were compiled with
+        self.last_guess: Tuple[float, Optional[Guess]] = (0., None)  # time and result of the last thumbnail query
+        self.publisher = Publisher()
+        self.scene_published: Type[Scene] = None
+        self.wake = threading.Event()
         self.refresher = KillableThread(target=self.refresh_scene)
+        self.window.transition_listeners.append(self._observe_transition)
 
     def set_config(self, attribute: str, value):
         self.config[attribute] = value
 
+    def _adaptive_interval(self) -> AdaptiveInterval:
+        return AdaptiveInterval(self.config["interval_min"], self.config["interval_max"], self.config["backoff"])
+
+    def subscribe(self, subscriber, is_active=None) -> int:
+        """
+        Get `SceneChange` of every scene change from now on, see `Publisher.subscribe`.
+
+        Args:
+            subscriber: Callable[[SceneChange], None], or queue
+            is_active: Callable[[], bool], optional
+                whether the subscriber is listening, default always
+
+        Returns:
+            int, token to unsubscribe with
+        """
+        token = self.publisher.subscribe(subscriber, is_active)
+        self.wake_up()
+        return token
+
+    def unsubscribe(self, token: int):
+        self.publisher.unsubscribe(token)
+
+    def wake_up(self):
+        """Refresh right away, e.g. a subscriber becomes active."""
+        self.interval.reset()
+        if (producer := self.window.producer) is not None:
+            producer.set_interval(self.interval.value)
+        self.publisher.notify()
+        self.wake.set()
+
     def refresh_scene(self):
+        frame_id = 0
         while True:
-            self._refresh_scene()
-            time.sleep(self.config["interval"])
+            if self.config["suspend_when_idle"] and not self.publisher.has_active():
+                self._suspend()
+                continue
+
+            if (producer := self.window.producer) is None:
+                self._refresh_scene()
+                if self.wake.wait(self.interval.value):
+                    self.wake.clear()
+                continue
+
+            # recognize every frame the producer captured, at most once, the producer follows the interval
+            producer.set_interval(self.interval.value)
+            if (frame := producer.wait_newer(frame_id, timeout=self.interval.maximum)) is not None:
+                self._refresh_scene(frame)
+                frame_id = frame.frame_id
+
+    def _suspend(self):
+        self.logger.debug("suspend refreshing scenes, no subscriber is active")
+        if (producer := self.window.producer) is not None:
+            producer.set_interval(None)  # capture on demand only
+        while not self.publisher.wait_active(timeout=self.interval.maximum):  # `is_active` may change silently
+            pass
+        self.interval.reset()
+        self.logger.debug("resume refreshing scenes")
 
     @property
     def scene_cur(self):
@@ -39,40 +133,173 @@ class SceneManager:
     def at(self, scene_name: str):
         return self.scene_cur.at(self.SCENES_REGISTERED[scene_name])
 
-    def goto(self, scene_name: str, sleep=1, *args, **kws):
-        has_arrived = self.scene_cur.goto(self.window, dest := self.SCENES_REGISTERED[scene_name], sleep, *args, **kws)
-        return has_arrived
-
-    def _refresh_scene(self):
-        self._update_scene(scene_cur=self._recognize_scene(self.window))
+    def goto(self, scene_name: str, hop_kwargs=None, **kws):
+        """
+        Go to the scene from wherever it is, over as many scenes as it takes, see `RoutePlanner.goto`.
+
+        Args:
+            scene_name: str
+            hop_kwargs: Mapping[str, dict], optional
+                keyword arguments of the way to each scene on the route, by name
+            **kws:
+                keyword arguments of the way to the scene
+
+        Returns:
+            bool, whether it has arrived
+        """
+        self.compile_scenes()
+        return self.planner.goto(
+            self.window, self.SCENES_REGISTERED[scene_name],
+            lambda window: self._recognize_scene(window.grab_frame()), hop_kwargs=hop_kwargs, **kws
+        )
+
+    def _observe_transition(self, scene, expected, landed, elapsed):
+        if self.planner is not None:  # routes are weighted by transitions measured
+            self.planner.observe(scene, expected, landed, elapsed)
+
+    def _refresh_scene(self, frame=None):
+        frame = self.window.grab_frame() if frame is None else frame  # one capture per tick, shared by recognizers
+        scene_cur = self._recognize_scene(frame)
+        if self._update_scene(scene_cur) and self.thumbnails is not None:
+            if scene_cur.at_this_scene(self.window, frame):  # frames of scenes as they're entered, told by signatures
+                self.thumbnails.add(scene_cur, frame)
+        if (report := frame.memo.get(ChangeDetector.MEMO_KEY)) is not None:
+            self.logger.debug(f"{report}")
+
+        # the scene may have been switched by `Scene.goto` too, so changes are told from what was published
+        if (scene_cur := self.window.scene_cur) is not self.scene_published:
+            scene_prev, self.scene_published = self.scene_published, scene_cur
+            self.interval.reset()
+            guess = frame.memo.get(ThumbnailIndex.MEMO_KEY)
+            confidence = guess.confidence if guess is not None and guess.scene is scene_cur else 1.
+            self.publisher.publish(SceneChange(scene_prev, scene_cur, frame.timestamp, frame.frame_id, confidence))
+        else:
+            self.interval.backoff()
         return self.window.scene_cur
 
-    def _update_scene(self, scene_cur, scene_prev=None):
-        if self.window.scene_cur.at(scene_cur):
-            return
-        self.window.scene_prev, self.window.scene_cur = scene_prev or self.window.scene_cur, scene_cur
-        self.logger.debug(f"switch scene ({self.window.scene_prev} --> {self.window.scene_cur})")
+    def metrics(self):
+        """metrics of screen changes, how often recognition is skipped for the screen is unchanged, and of scenes"""
+        metrics = {} if (detector := self.window.change_detector) is None else detector.metrics()
+        if self.classifier is not None:
+            metrics.update({f"scene_{k}": v for k, v in self.classifier.metrics().items()})
+        if self.prior is not None:
+            metrics["scene_transitions"] = self.prior.metrics()
+        if self.planner is not None:
+            metrics["scene_routes"] = self.planner.metrics()
+        if self.thumbnails is not None:
+            metrics.update({f"scene_{k}": v for k, v in self.thumbnails.metrics().items()})
+        metrics.update({f"template_{k}": v for k, v in am.TEMPLATES.metrics().items()})
+        return metrics
+
+    def _update_scene(self, scene_cur, scene_prev=None) -> bool:
+        if self.window.scene_state.switch(scene_cur, scene_prev) is None:
+            return False
+        _, scenes = self.window.scene_state.get()
+        self.window.record_event("scene", prev=f"{scenes.prev}", cur=f"{scenes.cur}")
+        self.logger.debug(f"switch scene ({scenes.prev} --> {scenes.cur})")
+        return True
 
-    @classmethod
-    def _recognize_scene(cls, window):
-        for scene in cls.SCENES_REGISTERED.values():
-            if hasattr(scene, "at_this_scene") and scene.at_this_scene(window):
-                return scene
-        return SceneUnknown
+    def compile_scenes(self) -> SceneClassifier:
+        """
+        Compile signatures of scenes registered into one classifier, and the graph of their ways into routes, by the
+        settings in `config`, once, or again after these settings changed:
+
+            early_exit: bool
+                see `SceneClassifier`
+            transition_prior: bool
+                check likely successors of the current scene first, see `TransitionPrior`
+            thumbnail_fallback: bool
+                guess the scene of frames no signature matches by thumbnails of frames known, see `ThumbnailIndex`
+        """
+        settings = (self.config["early_exit"], self.config["transition_prior"], self.config["thumbnail_fallback"])
+        if self.compiled_with != settings:
+            early_exit, transition_prior, thumbnail_fallback = self.compiled_with = settings
+            self.classifier = SceneClassifier(self.SCENES_REGISTERED.values(), early_exit=early_exit)
+            self.prior = TransitionPrior(self.SCENES_REGISTERED) if transition_prior else None
+            self.planner = RoutePlanner(self.SCENES_REGISTERED)
+            self.thumbnails = ThumbnailIndex(dir_unknown=self.DIR_UNKNOWN) if thumbnail_fallback else None
+            if self.thumbnails is not None and Path(self.FILE_THUMBNAILS).exists():
+                self.thumbnails.load(self.FILE_THUMBNAILS, self.SCENES_REGISTERED)
+            self.logger.info(f"compile {self.classifier}, {self.prior}, {self.planner}, {self.thumbnails}")
+        return self.classifier
+
+    def _classify_scene(self, frame=None):
+        frame = self.window.snapshot() if frame is None else frame
+        res = self.compile_scenes().classify(self.window, frame)
+        if res.ambiguous:
+            self.logger.debug(f"ambiguous scene, {res}")
+        if res.scene is SceneUnknown and self.thumbnails is not None:
+            if (guess := self._guess_scene(frame)) is not None and self.config["trust_thumbnails"]:
+                return guess.scene
+        return res.scene
+
+    def _guess_scene(self, frame: Frame) -> Optional[Guess]:
+        """
+        Guess of thumbnails for a frame no signature matches. A thumbnail takes the whole window, so on frames of only
+        some regions, the last guess is reused unless the screen has changed and `thumbnail_interval` has passed.
+        """
+        queried_at, guess = self.last_guess
+        if not frame.is_full:
+            is_unchanged = (report := frame.memo.get(ChangeDetector.MEMO_KEY)) is not None and report.n_changed == 0
+            if is_unchanged or time.time() - queried_at < self.config["thumbnail_interval"]:
+                if guess is not None:
+                    frame.memo[ThumbnailIndex.MEMO_KEY] = guess
+                return guess
+        guess = self.thumbnails.guess(frame)
+        self.last_guess = (time.time(), guess)
+        return guess
+
+    def _recognize_scene(self, frame=None):
+        frame = self.window.snapshot() if frame is None else frame
+        self.compile_scenes()
+        if self.prior is None:
+            scene = self._classify_scene(frame)
+        else:
+            scene = self.prior.recognize(self.window, frame, self.window.scene_cur, lambda: self._classify_scene(frame))
+        if scene is not SceneUnknown and ThumbnailIndex.MEMO_KEY not in frame.memo:
+            self.last_guess = (0., None)  # told by signatures, so it's guessed again once the scene is unknown again
+        return scene
+
+    def install_capture_planner(self, calibrate=True):
+        """Capture only areas read by the recognizers, if it's cheaper than capturing the whole window."""
+        planner = CapturePlanner(am.probe_boxes())
+        if calibrate:
+            planner.calibrate(self.window.source)
+        self.window.capture_planner = planner
+        self.logger.info(f"install {planner}")
+        return planner
 
     def start(self):
+        self.compile_scenes()
+        if self.config["preload_templates"]:
+            am.preload_templates()
+        self.interval = self._adaptive_interval()
+        self.window.change_detector = ChangeDetector()
+        self.window.start_producer(interval=self.interval.value)
+        self.window.input_listeners.append(self.wake_up)
+        self.install_capture_planner()
         self.refresher.start()
 
     def close(self):
         self.refresher.terminate()
+        if self.wake_up in self.window.input_listeners:
+            self.window.input_listeners.remove(self.wake_up)
+        if self._observe_transition in self.window.transition_listeners:
+            self.window.transition_listeners.remove(self._observe_transition)
+        if self.thumbnails is not None and len(self.thumbnails) > 0:
+            Path(self.FILE_THUMBNAILS).parent.mkdir(parents=True, exist_ok=True)
+            self.thumbnails.save(self.FILE_THUMBNAILS)
+        self.window.stop_producer()
 
 
 class TaskManager:
     TASKS_REGISTERED = TASKS_REGISTERED
 
-    def __init__(self, game_window: GameWindow):
+    def __init__(self, game_window: GameWindow, scene_manager: SceneManager = None):
         self.game_window = game_window
+        self.scene_manager = scene_manager
         self.executors = {}
+        self.subscriptions = {}
 
     # should provide task manage api here.
     def start_task(self, task_name):
@@ -83,6 +310,9 @@ class TaskManager:
         task = self.TASKS_REGISTERED[task_name](self.game_window)
         executor = KillableThread(target=task.run, name=f"AutoGame[TaskManager]-{task_name}")
         self.executors[task.name] = (task, executor)
+        if self.scene_manager is not None:
+            task.scene_manager = self.scene_manager
+            self.subscriptions[task.name] = self.scene_manager.subscribe(task.scene_changes, is_active=task.is_running)
         executor.start()
         task.start()
         return True
@@ -100,8 +330,13 @@ class TaskManager:
 
         task_instance, task_executor = self.executors.pop(task_name)
         task_executor.terminate()
+        self._unsubscribe(task_name)
         return True
 
+    def _unsubscribe(self, task_name):
+        if (token := self.subscriptions.pop(task_name, None)) is not None:
+            self.scene_manager.unsubscribe(token)
+
     def list_task(self):
         for task_name, (task_instance, task_executor) in self.executors.items():
             logger_azurlane.info(f"{task_name} [{'Alive' if task_executor.is_alive() else 'Unknown'}]")
@@ -118,6 +353,7 @@ class TaskManager:
             _, task_executor = self.executors[k]
             task_executor.terminate()
             self.executors.pop(k)
+            self._unsubscribe(k)
 
 
 class InputAdapter:
@@ -127,13 +363,16 @@ class InputAdapter:
     MSG_CAN_RUN = 2
 
     def __init__(self, queue):
+        from pynput import keyboard  # imported here, so that the managers can be imported without a desktop session
+
         self.queue = queue
+        self.keys = keyboard.Key
         self.keyboard_listener = keyboard.Listener(on_release=self._on_keyboard_release)
 
     def _on_keyboard_release(self, key):
-        if key is keyboard.Key.f9:
+        if key is self.keys.f9:
             self._put_message(self.MSG_CAN_RUN_AFTER_BATTLE)
-        elif key is keyboard.Key.f10:
+        elif key is self.keys.f10:
             self._put_message(self.MSG_CAN_RUN)
 
     def _put_message(self, message):
@@ -153,8 +392,8 @@ class Gateway:
 
         self.window = game_window
         self.input_adapter = InputAdapter(self.message_queue)
-        self.task_manager = TaskManager(self.window)
         self.scene_manager = SceneManager(self.window)
+        self.task_manager = TaskManager(self.window, self.scene_manager)
         self.message_handler = KillableThread(target=self.handle_message)
         self.signal_handler = signal.signal(signal.SIGINT, self.handle_signal)
 
@@ -176,6 +415,7 @@ class Gateway:
                     logger_azurlane.info("No task is running currently.")
                     continue
                 task_instance.reverse(msg_trans)
+                self.scene_manager.wake_up()  # the task may be resumed
 
     def start(self):
         self.input_adapter.start()
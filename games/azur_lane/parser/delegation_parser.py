@@ -9,7 +9,7 @@ from games.azur_lane.config import CONFIG_DELEGATION
 from games.azur_lane.interface.scene.asset_manager import am
 from lib.dummy_paddleocr import load_recognizer
 from util import gen_key
-from util.game_cv import match_multi_template, debug_show
+from util.game_cv import binarize, match_multi_template, debug_show
 from util.io import load_yaml
 
 re.search(r".*?(\D+)", "123:A").group(1)
@@ -151,10 +151,7 @@ class Parser:
                 continue
 
             # preprocess
-            _, sub_image_processed = cv2.threshold(
-                cv2.cvtColor(sub_image, cv2.COLOR_RGB2GRAY),
-                thresh=210, maxval=255, type=cv2.THRESH_BINARY_INV
-            )
+            sub_image_processed = binarize(sub_image, thresh=210, maxval=255, type=cv2.THRESH_BINARY_INV)
             sub_image_processed = cv2.cvtColor(sub_image_processed, cv2.COLOR_GRAY2RGB)
             text, confidence = cls.ocr_paddle.ocr(sub_image_processed, det=False, cls=False)[0]
             text_rectified = f"{text[:2]}:{text[2:4]}:{text[4:6]}" if len(text := re.sub(r"\D", "", text)) == 6 else ""
@@ -201,7 +198,7 @@ if __name__ == '__main__':
     dir_test = Path(f"{DIR_TESTCASE}/commission/delegation_list/label_time_limit")
     test_values = load_yaml(dir_test / "test_values.yaml")
     for file_name, values in test_values.items():
-        img = cv2.imread(f"{dir_test}/{file_name}")[:, :, ::-1]
+        img = cv2.imread(f"{dir_test}/{file_name}")
         parsed_values = Parser.parse_time_limit(img)
         Parser.parse_label_level_locs(img)
         Parser.parse_status(img)
@@ -1,3 +1,4 @@
+import queue
 from pathlib import Path
 
 from games.azur_lane import logger_azurlane
@@ -76,6 +77,10 @@ class BaseTask:
     def __init__(self, window: GameWindow = None):
         self.event_handler = PauseEventHandler(*self.pause_events)
         self.window = window
+        # every change published by the scene manager, the oldest dropped if not read, see `SceneManager.subscribe`
+        self.scene_changes = queue.Queue(maxsize=16)
+        self.scene_manager = None  # set by the task manager, whose routes `goto` takes
+
 
         self.base_dir = f"{DIR_USR_AUTO_GAME_AZURLANE}/{self.name}"
         if self.mkdir:
@@ -87,6 +92,57 @@ class BaseTask:
     def reverse(self, event_names):
         self.event_handler.reverse(event_names)
 
+    def is_running(self) -> bool:
+        return self.event_handler.is_set("can_run")
+
+    def wait_scene_change(self, version: int = None, timeout=None):
+        """
+        Wait for the scene to change after `version`, instead of polling `scene_cur`. Take the version before checking
+        the scene, so that a change in between isn't missed.
+
+        Examples:
+            >>> version, scenes = self.scene_state.get()
+            >>> if scenes.cur.at(scene.SceneBattle):
+            ...     self.wait_scene_change(version, timeout=5)
+
+        Args:
+            version: int, optional
+                version of `scene_state` seen last time, default the current one
+            timeout: float, optional
+                seconds to wait, default forever
+
+        Returns:
+            Scenes, or None if timed out
+        """
+        if version is None:
+            version = self.scene_state.version
+        res = self.scene_state.wait_for_change(version, timeout)
+        return None if res is None else res[1]
+
+    def goto(self, destination, hop_kwargs=None, **kwargs) -> bool:
+        """
+        Go to the scene from wherever it is, over as many scenes as it takes, see `SceneManager.goto`. Without a scene
+        manager, e.g. the task is run alone, one is made only for routing.
+
+        Args:
+            destination: Type[Scene]
+            hop_kwargs: Mapping[str, dict], optional
+                keyword arguments of the way to each scene on the route, by name
+            **kwargs:
+                keyword arguments of the way to the destination
+
+        Returns:
+            bool, whether it has arrived
+        """
+        if self.scene_manager is None:
+            from games.azur_lane.manager import SceneManager  # which imports tasks
+            self.scene_manager = SceneManager(self.window)
+        return self.scene_manager.goto(destination.name, hop_kwargs=hop_kwargs, **kwargs)
+
+    @property
+    def scene_state(self):
+        return self.window.scene_state
+
     @property
     def scene_cur(self):
         return self.window.scene_cur
@@ -51,12 +51,9 @@ class TaskFarmCampaignSpecial(BaseTask):
         return save_dir
 
     @wait("can_run")
-    def scene_main_to_scene_anchor_aweigh(self):
-        switch_scene(self.window, scene.SceneMain, scene.SceneAnchorAweigh)
-
-    @wait("can_run")
-    def from_anchor_aweigh_to_special_campaign(self):
-        switch_scene(self.window, scene.SceneAnchorAweigh, scene.SceneCampaignSpecial)
+    def from_main_to_special_campaign(self):
+        if self.scene_cur.at(scene.SceneMain) or self.scene_cur.at(scene.SceneAnchorAweigh):
+            self.goto(scene.SceneCampaignSpecial)
 
     @wait("can_run")
     def from_campaign_chapter_to_stage_info(self):
@@ -65,7 +62,7 @@ class TaskFarmCampaignSpecial(BaseTask):
 
             self.cur_target_stage = self.state['target_stage'].next()
             self.scene_cur.goto(
-                self.window, scene.PopupStageInfo, sleep=1,
+                self.window, scene.PopupStageInfo,
                 chapter_no=f"{chapter_name}-{self.cur_target_stage}"
             )
 
@@ -94,10 +91,9 @@ class TaskFarmCampaignSpecial(BaseTask):
 
     @wait("can_run")
     def wait_for_farming(self):
-        if self.scene_cur.at(scene.SceneBattle):
-            time.sleep(5)
-        elif self.scene_cur.at(scene.SceneCampaign):
-            time.sleep(5)
+        version, scenes = self.scene_state.get()
+        if scenes.cur.at(scene.SceneBattle) or scenes.cur.at(scene.SceneCampaign):
+            self.wait_scene_change(version, timeout=5)
 
     @wait("can_run")
     def from_campaign_info_to_campaign(self):
@@ -116,14 +112,13 @@ class TaskFarmCampaignSpecial(BaseTask):
         file = f"{self.save_dir}/{dt.datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
         self.window.screenshot(x, y, w, h, save_path=file)
         self.state["cur_farm_time"] += 1
-        self.scene_cur.goto(self.window, scene.SceneCampaign, sleep=1)
+        self.scene_cur.goto(self.window, scene.SceneCampaign)
         self.logger.info(f"💡Current Farm Times: {self.state['cur_farm_time']}")
         self.event_handler.wait("can_run_after_battle")
         self.logger.info(f"💡Sleep for a while ~")
 
     def execute(self):
-        self.scene_main_to_scene_anchor_aweigh()
-        self.from_anchor_aweigh_to_special_campaign()
+        self.from_main_to_special_campaign()
         self.from_campaign_chapter_to_stage_info()
         self.from_stage_info_to_fleet_selection()
         self.from_fleet_selection_to_duty_selection()
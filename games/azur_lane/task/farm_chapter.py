@@ -52,12 +52,9 @@ class TaskFarmChapter(BaseTask):
                 self.window.left_click([(46, 512), (122, 663)], sleep=.3)
 
     @wait("can_run")
-    def scene_main_to_scene_anchor_aweigh(self):
-        switch_scene(self.window, scene.SceneMain, scene.SceneAnchorAweigh)
-
-    @wait("can_run")
-    def from_anchor_aweigh_to_campaign_chapter(self, target_chapter_no=13):
-        switch_scene(self.window, scene.SceneAnchorAweigh, scene.SceneCampaignChapter)
+    def from_main_to_campaign_chapter(self, target_chapter_no=13):
+        if self.scene_cur.at(scene.SceneMain) or self.scene_cur.at(scene.SceneAnchorAweigh):
+            self.goto(scene.SceneCampaignChapter)
         if self.scene_cur.at(scene.SceneCampaignChapter):
             self.switch_to_chapter(target_chapter_no)
 
@@ -65,7 +62,7 @@ class TaskFarmChapter(BaseTask):
     def from_campaign_chapter_to_stage_info(self):
         chapter_no, stage_no = (int(x) for x in self.config["target_stage"].split("-"))
         if self.scene_cur.at(scene.SceneCampaignChapter) and self.state["cur_chapter"] == chapter_no:
-            self.scene_cur.goto(self.window, scene.PopupStageInfo, sleep=1, chapter_no=self.config["target_stage"])
+            self.scene_cur.goto(self.window, scene.PopupStageInfo, chapter_no=self.config["target_stage"])
 
     @wait("can_run")
     def from_stage_info_to_fleet_selection(self):
@@ -91,10 +88,9 @@ class TaskFarmChapter(BaseTask):
 
     @wait("can_run")
     def wait_for_farming(self):
-        if self.scene_cur.at(scene.SceneBattle):
-            time.sleep(5)
-        elif self.scene_cur.at(scene.SceneCampaign):
-            time.sleep(5)
+        version, scenes = self.scene_state.get()
+        if scenes.cur.at(scene.SceneBattle) or scenes.cur.at(scene.SceneCampaign):
+            self.wait_scene_change(version, timeout=5)
 
     @wait("can_run")
     def from_campaign_info_to_campaign(self):
@@ -113,12 +109,11 @@ class TaskFarmChapter(BaseTask):
         file = f"{self.save_dir}/{dt.datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
         self.window.screenshot(x, y, w, h, save_path=file)
         self.state["cur_farm_time"] += 1
-        self.scene_cur.goto(self.window, scene.SceneCampaign, sleep=1)
+        self.scene_cur.goto(self.window, scene.SceneCampaign)
         self.event_handler.wait("can_run_after_battle")
 
     def execute(self):
-        self.scene_main_to_scene_anchor_aweigh()
-        self.from_anchor_aweigh_to_campaign_chapter(target_chapter_no=int(self.config["target_stage"].split("-")[0]))
+        self.from_main_to_campaign_chapter(target_chapter_no=int(self.config["target_stage"].split("-")[0]))
         self.from_campaign_chapter_to_stage_info()
         self.from_stage_info_to_fleet_selection()
         self.from_fleet_selection_to_duty_selection()
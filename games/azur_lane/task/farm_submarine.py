@@ -33,12 +33,12 @@ class TaskFarmSubmarineSOS(BaseTask):
                 print("signal found")
             else:
                 print("signal not found")
-            self.scene_cur.goto(self.window, scene.SceneCampaignChapter, sleep=1)
+            self.scene_cur.goto(self.window, scene.SceneCampaignChapter)
 
     @wait("can_run")
     def scene_campaign_chapter_to_popup_stage_info(self):
         if self.scene_cur.at(scene.SceneCampaignChapter):
-            if not self.scene_cur.goto(self.window, scene.PopupStageInfo, sleep=1, chapter_no="3-5"):
+            if not self.scene_cur.goto(self.window, scene.PopupStageInfo, chapter_no="3-5"):
                 print("not arrived")
                 self.scene_cur.goto(self.window, scene.SceneAnchorAweigh)
 
@@ -88,8 +88,11 @@ class TaskFarmSubmarineSOS(BaseTask):
         self.from_checkpoint_to_campaign()
         self.from_campaign_info_to_campaign()
 
-        while self.scene_cur.at(scene.SceneBattle):
-            time.sleep(2)
+        while True:
+            version, scenes = self.scene_state.get()
+            if not scenes.cur.at(scene.SceneBattle):
+                break
+            self.wait_scene_change(version, timeout=2)
 
     def run(self) -> None:
         while True:
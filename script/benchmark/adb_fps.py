@@ -0,0 +1,32 @@
+import argparse
+import subprocess
+
+from script.benchmark.common import measure_fps
+from util.adb import AdbScreenSource, FakeAdbServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture throughput, per-command adb vs. persistent adb session")
+    parser.add_argument("--serial", default=None, help="serial of the device, default the only one connected")
+    parser.add_argument("--fake", default=None, metavar="FRAMES", help="serve frames from files by a stand-in server")
+    parser.add_argument("--duration", type=float, default=5., help="seconds to run each method")
+    args = parser.parse_args()
+
+    server = FakeAdbServer(args.fake).start() if args.fake else None
+    source = AdbScreenSource(args.serial, port=server.port if server else 5037)
+
+    methods = {"session": lambda: source.capture()}
+    if server is None:
+        command = ["adb"] + (["-s", args.serial] if args.serial else []) + ["exec-out", "screencap"]
+        methods["per-command"] = lambda: subprocess.run(command, capture_output=True, check=True)
+
+    print(f"{source}")
+    for name, capture in methods.items():
+        print(f"{name:<16}: {measure_fps(capture, args.duration):>8.2f} fps")
+    source.close()
+    if server is not None:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
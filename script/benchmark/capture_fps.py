@@ -0,0 +1,33 @@
+import argparse
+
+from script.benchmark.common import measure_fps
+from util.win32.monitor import set_process_dpi_awareness
+from util.win32.window import Window, screenshot_by_hwnd
+
+set_process_dpi_awareness(2, silent=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture throughput, per-call DC/bitmap vs. persistent session")
+    parser.add_argument("window_name", help="title of the window to capture, e.g. BS_AzurLane")
+    parser.add_argument("--duration", type=float, default=5., help="seconds to run each method")
+    args = parser.parse_args()
+
+    window = Window(window_name=args.window_name)
+    width, height = window.rect.width, window.rect.height
+
+    methods = {
+        "per-call": lambda: screenshot_by_hwnd(window.hwnd, 0, 0, width, height),
+        "session": lambda: window.screenshot(),
+        "session(region)": lambda: window.screenshot(800, 30, 320, 60),
+        "pooled frame": lambda: window.grab_frame(full=True),
+    }
+    print(f"{window}")
+    for name, capture in methods.items():
+        print(f"{name:<16}: {measure_fps(capture, args.duration):>8.2f} fps")
+    print(f"{window.source.pool}")
+    window.close_session()
+
+
+if __name__ == '__main__':
+    main()
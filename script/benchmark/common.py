@@ -0,0 +1,21 @@
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50, p90, p99 and max of samples in seconds, in milliseconds"""
+    if not samples:
+        return {}
+    p50, p90, p99 = np.percentile(np.asarray(samples) * 1000, [50, 90, 99])
+    return {"p50": float(p50), "p90": float(p90), "p99": float(p99), "max": float(max(samples) * 1000)}
+
+
+def measure_fps(capture: Callable[[], object], duration=5.) -> float:
+    """times the capture is called per second, called over and over for `duration` seconds"""
+    frames, time_start = 0, time.perf_counter()
+    while (time_elapsed := time.perf_counter() - time_start) < duration:
+        capture()
+        frames += 1
+    return frames / time_elapsed
@@ -0,0 +1,181 @@
+import argparse
+import json
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Iterable, List, Tuple
+
+import cv2
+import numpy as np
+
+from games.azur_lane.config import DIR_TESTCASE
+from games.azur_lane.interface.scene import SCENES_REGISTERED, SceneUnknown
+from games.azur_lane.manager import SceneManager
+from script.benchmark.common import percentiles
+from util.frame import Frame
+from util.screen import ReplayScreenSource, SessionReader
+from util.window import GameWindow
+
+SCENES = {**{scene.__name__: scene for scene in SCENES_REGISTERED.values()}, **SCENES_REGISTERED}
+
+
+def load_labelled(path: Path) -> Iterable[Tuple[str, np.ndarray]]:
+    """
+    Frames in directories named after scenes, e.g. "path/Scene.Main/001.png", or "path/SceneMain/001.npy".
+
+    Yields:
+        Tuple[str, np.ndarray], name of the scene, and BGR image
+    """
+    for directory in sorted(p for p in path.iterdir() if p.is_dir()):
+        if (scene := SCENES.get(directory.name)) is None:
+            print(f"skip {directory}, no scene named so")
+            continue
+        for file in sorted(directory.iterdir()):
+            if file.suffix == ".npy":
+                yield scene.name, np.load(file)
+            elif file.suffix in (".png", ".jpg", ".bmp"):
+                yield scene.name, cv2.imread(file.as_posix())
+
+
+def load_session(path: Path) -> Iterable[Tuple[str, np.ndarray]]:
+    """Frames of a recorded session, labelled by the last "scene" event before each of them."""
+    reader = SessionReader(path)
+    events = list(reader.iter_events(types=["scene"]))
+    event_times = np.array([event["t"] for event in events])
+    for idx, timestamp in enumerate(reader.timestamps):
+        if (n := int(np.searchsorted(event_times, timestamp, side="right"))) == 0:
+            continue
+        if (scene := SCENES.get(events[n - 1]["cur"])) is not None:
+            yield scene.name, reader[idx]
+
+
+def load(paths: List[Path]) -> List[Tuple[str, np.ndarray]]:
+    frames = []
+    for path in paths:
+        frames.extend(load_session(path) if (path / "meta.json").exists() else load_labelled(path))
+    return frames
+
+
+def benchmark(frames: List[Tuple[str, np.ndarray]], repeat=1, **config) -> dict:
+    window = GameWindow(ReplayScreenSource([image for _, image in frames]))
+    manager = SceneManager(window)
+    for attribute, value in config.items():
+        manager.set_config(attribute, value)
+    manager.compile_scenes()
+    recognizers = [scene for scene in SCENES_REGISTERED.values() if scene.recognizable()]
+    labels = [scene.name for scene in recognizers] + [SceneUnknown.name]
+    label_idx = {name: idx for idx, name in enumerate(labels)}
+
+    latency, latency_recognize = defaultdict(list), []
+    positives = defaultdict(lambda: [0, 0])  # scene -> [true positive, false positive]
+    n_labelled = defaultdict(int)
+    confusion = np.zeros((len(labels), len(labels)), dtype=np.int64)
+
+    for label, image in frames:
+        frame = Frame(image)
+        n_labelled[label] += 1
+        for scene in recognizers:
+            for _ in range(repeat):
+                frame.memo.clear()
+                start = time.perf_counter()
+                is_matched = scene.at_this_scene(window, frame)
+                latency[scene.name].append(time.perf_counter() - start)
+            if is_matched:
+                positives[scene.name][label != scene.name] += 1
+
+        for _ in range(repeat):
+            frame.memo.clear()
+            start = time.perf_counter()
+            predicted = manager._recognize_scene(frame)
+            latency_recognize.append(time.perf_counter() - start)
+        window.scene_state.switch(predicted)
+        confusion[label_idx.get(label, label_idx[SceneUnknown.name]), label_idx[predicted.name]] += 1
+
+    n_frames = len(frames)
+    scenes = {}
+    for scene in recognizers:
+        n_pos = n_labelled[scene.name]
+        tp, fp = positives[scene.name]
+        scenes[scene.name] = {
+            "frames": n_pos,
+            "latency_ms": percentiles(latency[scene.name]),
+            "true_positive_rate": tp / n_pos if n_pos else None,
+            "false_positive_rate": fp / max(n_frames - n_pos, 1),
+        }
+    return {
+        "frames": n_frames,
+        "repeat": repeat,
+        "scenes": scenes,
+        "recognize": {
+            "latency_ms": percentiles(latency_recognize),
+            "accuracy": float(np.trace(confusion) / max(n_frames, 1)),
+            "metrics": manager.classifier.metrics(),
+        },
+        "confusion": {"labels": labels, "matrix": confusion.tolist()},  # row: labelled, column: recognized
+    }
+
+
+def regressions(result: dict, baseline: dict, max_slowdown: float, max_accuracy_drop: float) -> List[str]:
+    found = []
+    acc, acc_base = result["recognize"]["accuracy"], baseline["recognize"]["accuracy"]
+    if acc < acc_base - max_accuracy_drop:
+        found.append(f"accuracy dropped from {acc_base:.2%} to {acc:.2%}")
+
+    pairs = [("recognize", result["recognize"], baseline["recognize"])]
+    pairs += [(name, s, baseline["scenes"][name]) for name, s in result["scenes"].items() if name in baseline["scenes"]]
+    for name, stats, stats_base in pairs:
+        p50, p50_base = stats["latency_ms"].get("p50"), stats_base["latency_ms"].get("p50")
+        if p50 is not None and p50_base and p50 > p50_base * max_slowdown:
+            found.append(f"{name} slowed down from {p50_base:.3f}ms to {p50:.3f}ms (p50)")
+        fpr, fpr_base = stats.get("false_positive_rate"), stats_base.get("false_positive_rate")
+        if fpr is not None and fpr_base is not None and fpr > fpr_base:
+            found.append(f"{name} false positive rate rose from {fpr_base:.2%} to {fpr:.2%}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency and accuracy of scene recognizers over labelled frames")
+    parser.add_argument(
+        "paths", nargs="*", default=[f"{DIR_TESTCASE}/scene"],
+        help="directories of frames named after scenes, or recorded sessions, default testcases of scenes"
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="times to run each recognizer on each frame")
+    parser.add_argument("--early-exit", action="store_true", help="classify along a decision tree")
+    parser.add_argument("--no-prior", action="store_true", help="classify without the transition prior")
+    parser.add_argument("--thumbnails", action="store_true", help="guess unknown frames by thumbnails saved")
+    parser.add_argument("--output", default=None, help="file to write results to, in JSON")
+    parser.add_argument("--baseline", default=None, help="results to compare with, exit with 1 on regressions")
+    parser.add_argument("--max-slowdown", type=float, default=1.5, help="max ratio of p50 latency to the baseline")
+    parser.add_argument("--max-accuracy-drop", type=float, default=0., help="max drop of accuracy from the baseline")
+    args = parser.parse_args()
+
+    if not (frames := load([Path(path) for path in args.paths])):
+        parser.error("no labelled frame found")
+    result = benchmark(
+        frames, repeat=args.repeat,
+        early_exit=args.early_exit, transition_prior=not args.no_prior, thumbnail_fallback=args.thumbnails,
+        trust_thumbnails=args.thumbnails,
+    )
+
+    print(f"{result['frames']} frame(s), accuracy: {result['recognize']['accuracy']:.2%}")
+    print(f"{'scene':<36}{'frames':>8}{'p50 ms':>10}{'p99 ms':>10}{'TPR':>8}{'FPR':>8}")
+    rows = [("<recognize>", {**result["recognize"], "frames": result["frames"]}), *result["scenes"].items()]
+    for name, stats in rows:
+        tpr, fpr = stats.get("true_positive_rate"), stats.get("false_positive_rate")
+        print(
+            f"{name:<36}{stats['frames']:>8}{stats['latency_ms']['p50']:>10.3f}{stats['latency_ms']['p99']:>10.3f}"
+            f"{'-' if tpr is None else f'{tpr:.0%}':>8}{'-' if fpr is None else f'{fpr:.0%}':>8}"
+        )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2), encoding="utf-8")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        if found := regressions(result, baseline, args.max_slowdown, args.max_accuracy_drop):
+            print("\n".join(["regressions:", *found]))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
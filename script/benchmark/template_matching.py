@@ -0,0 +1,142 @@
+import argparse
+import json
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import cv2
+import numpy as np
+from cv2 import TM_CCOEFF_NORMED, TM_SQDIFF_NORMED
+
+from games.azur_lane.config import DIR_TESTCASE
+from games.azur_lane.interface.scene.asset_manager import am
+from games.azur_lane.interface.scene.campaign.scene_campaign import SceneCampaign
+from script.benchmark.common import percentiles
+from util.frame import Frame
+from util.game_cv.matching import Detection, MatchEngine, TemplateSpec
+from util.screen import SessionReader
+
+# templates matched by the game, and the method of each set
+SUITES: Dict[str, Tuple[Callable[[], List[TemplateSpec]], int]] = {
+    "enemy": (
+        lambda: [
+            spec for scale in SceneCampaign.ENEMY_SCALES
+            for spec in am.template_specs(f"Campaign.Enemy.Scale.{scale}", threshold=.1)
+        ],
+        TM_SQDIFF_NORMED,
+    ),
+    "delegation": (
+        lambda: [
+            TemplateSpec(name, template, threshold=.85)
+            for name in ["Popup_Commission.Scene_DelegationList.Label_Level"]
+            if (template := am.template(name)) is not None
+        ],
+        TM_CCOEFF_NORMED,
+    ),
+}
+
+
+def load(paths: List[Path]) -> Iterable[np.ndarray]:
+    """BGR images of files (.png, .jpg, .bmp, .npy) under the paths, or frames of recorded sessions"""
+    for path in paths:
+        if (path / "meta.json").exists():
+            reader = SessionReader(path)
+            yield from (reader[idx] for idx in range(len(reader)))
+            continue
+        for file in sorted(path.rglob("*") if path.is_dir() else [path]):
+            if file.suffix == ".npy":
+                yield np.load(file)
+            elif file.suffix in (".png", ".jpg", ".bmp"):
+                yield cv2.imread(file.as_posix())
+
+
+def recall(found: List[Detection], expected: List[Detection], tolerance=2) -> Tuple[int, int]:
+    """numbers of expected detections found, and of the ones found but not expected"""
+    hits = 0
+    for e in expected:
+        hits += any(f.name == e.name and abs(f.x - e.x) <= tolerance and abs(f.y - e.y) <= tolerance for f in found)
+    return hits, len(found) - hits
+
+
+def benchmark(images: List[np.ndarray], levels: List[int], margin=4, repeat=1, workers=1) -> dict:
+    """
+    Time and recall of each suite, matched coarse-to-fine at each of the levels, against exhaustively (level 0).
+
+    Returns:
+        dict, e.g. {"enemy": {"templates": 8, "modes": {"levels=0": {...}, "levels=1": {...}}}}
+    """
+    res = {}
+    for suite, (specs, method) in SUITES.items():
+        if not (templates := specs()):
+            print(f"skip {suite}, no template found")
+            continue
+        engines = {
+            level: MatchEngine(templates, method=method, workers=workers, levels=level, margin=margin)
+            for level in [0, *levels]
+        }
+        latency, expected_all = defaultdict(list), 0
+        hits, extras = defaultdict(int), defaultdict(int)
+        for image in images:
+            found = {}
+            for level, engine in engines.items():
+                for _ in range(repeat):
+                    frame = Frame(image)  # nothing derived from a previous run
+                    start = time.perf_counter()
+                    found[level] = engine.match(frame)
+                    latency[level].append(time.perf_counter() - start)
+            expected_all += len(found[0])
+            for level in levels:
+                n_hits, n_extras = recall(found[level], found[0])
+                hits[level] += n_hits
+                extras[level] += n_extras
+
+        p50_exhaustive = percentiles(latency[0])["p50"]
+        modes = {}
+        for level, engine in engines.items():
+            stats = percentiles(latency[level])
+            modes[f"levels={level}"] = {
+                "latency_ms": stats,
+                "speedup": p50_exhaustive / stats["p50"] if stats["p50"] else None,
+                "recall": hits[level] / expected_all if level and expected_all else None,  # of exhaustive ones
+                "extra": extras[level],
+                "templates": engine.metrics(),
+            }
+            engine.close()
+        res[suite] = {"templates": len(templates), "detections": expected_all, "modes": modes}
+    return res
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Speedup and recall of coarse-to-fine template matching")
+    parser.add_argument(
+        "paths", nargs="*", default=[DIR_TESTCASE],
+        help="files or directories of saved frames, or recorded sessions, default testcases"
+    )
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2], help="levels of the pyramid to compare")
+    parser.add_argument("--margin", type=int, default=4, help="pixels around each candidate to refine")
+    parser.add_argument("--repeat", type=int, default=3, help="times to match each frame in each mode")
+    parser.add_argument("--workers", type=int, default=1, help="threads of each engine")
+    parser.add_argument("--output", default=None, help="file to write results to, in JSON")
+    args = parser.parse_args()
+
+    if not (images := [image for image in load([Path(path) for path in args.paths]) if image is not None]):
+        parser.error("no frame found")
+    result = benchmark(images, args.levels, margin=args.margin, repeat=args.repeat, workers=args.workers)
+
+    print(f"{len(images)} frame(s), margin: {args.margin}")
+    print(f"{'suite':<12}{'mode':<10}{'p50 ms':>10}{'p99 ms':>10}{'speedup':>9}{'recall':>8}{'extra':>7}")
+    for suite, stats in result.items():
+        for mode, s in stats["modes"].items():
+            rate = "-" if s["recall"] is None else f"{s['recall']:.1%}"
+            print(
+                f"{suite:<12}{mode:<10}{s['latency_ms']['p50']:>10.3f}{s['latency_ms']['p99']:>10.3f}"
+                f"{s['speedup']:>8.2f}x{rate:>8}{s['extra']:>7}"
+            )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2), encoding="utf-8")
+
+
+if __name__ == '__main__':
+    main()
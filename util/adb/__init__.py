@@ -0,0 +1,3 @@
+from .device import AdbScreenSource
+from .protocol import AdbConnection, AdbError, AdbShell
+from .server import FakeAdbServer
@@ -0,0 +1,139 @@
+import re
+import threading
+from typing import Tuple
+
+import cv2
+import numpy as np
+
+from util.adb.protocol import AdbConnection, AdbError, AdbShell
+from util.datatypes import Rect
+from util.frame import Frame, FramePool
+from util.screen.source import ScreenSource
+
+
+class AdbScreenSource(ScreenSource):
+    """
+    Capture from, and send inputs to an android device (or emulator) via adb, over one long-lived `sh` session.
+
+    The framebuffer is always captured whole, so capturing regions costs the same as capturing the whole screen.
+    """
+    QUIET = ">/dev/null 2>&1"  # output of inputs, if any, would be read as the header of the next screencap
+
+    def __init__(self, serial: str = None, host="127.0.0.1", port=5037, timeout=10.):
+        """
+
+        Args:
+            serial: str, optional
+                serial of the device, e.g. "emulator-5554", default the only device connected
+            host: str
+                host of the adb server
+            port: int
+                port of the adb server
+            timeout: float
+                seconds to wait for the adb server
+        """
+        self.serial = serial
+        self.address = (host, port)
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.pool = FramePool()
+        self.shell: AdbShell = None
+        self.sdk = None
+        self.header_size = None
+        self.rect: Rect = None
+        self.connect()
+
+    @classmethod
+    def devices(cls, host="127.0.0.1", port=5037):
+        """serials of devices connected to the adb server"""
+        conn = AdbConnection(host, port)
+        try:
+            text = conn.query("host:devices")
+        finally:
+            conn.close()
+        return [line.split("\t")[0] for line in text.splitlines() if line.endswith("\tdevice")]
+
+    def connect(self):
+        with self.lock:
+            self.close_shell()
+            self.shell = AdbShell(self.serial, *self.address, timeout=self.timeout)
+            self.sdk = int(self.shell.run("getprop ro.build.version.sdk").strip() or 0)
+            self.header_size = 16 if self.sdk >= 28 else 12
+            width, height = self._screen_size()
+            self.rect = Rect(0, 0, width, height)
+
+    def _screen_size(self) -> Tuple[int, int]:
+        """width and height of the screen as it's rotated now, asked without capturing a frame"""
+        sizes = dict(re.findall(r"(\w+) size: (\d+x\d+)", self.shell.run("wm size")))
+        if (size := sizes.get("Override", sizes.get("Physical"))) is None:
+            raise AdbError("failed to get the screen size by `wm size`")
+        width, height = (int(v) for v in size.split("x"))
+        orientation = re.search(r"SurfaceOrientation: (\d)", self.shell.run("dumpsys input | grep SurfaceOrientation"))
+        if orientation is not None and int(orientation.group(1)) in (1, 3):  # landscape of a portrait screen
+            width, height = height, width
+        return width, height
+
+    def close_shell(self):
+        if self.shell is not None:
+            self.shell.close()
+            self.shell = None
+
+    def _screencap(self) -> np.ndarray:
+        """the framebuffer, which tells the size of the screen as well, e.g. after it's rotated"""
+        rgba = self.shell.screencap(self.header_size, self.pool)
+        if (size := rgba.shape[1::-1]) != (self.rect.width, self.rect.height):
+            self.rect = Rect(0, 0, *size)
+        return rgba
+
+    def _call(self, func, retry=False):
+        """
+        Call with the shell, and reconnect if the connection is broken.
+
+        Args:
+            func: Callable[[], Any]
+            retry: bool, default False
+                call once more after reconnecting, for idempotent calls only, e.g. not inputs, which may have reached
+                the device before the connection broke; otherwise the error is raised after reconnecting
+        """
+        with self.lock:
+            try:
+                return func()
+            except (OSError, AdbError) as e:
+                error = e
+        self.connect()
+        if not retry:
+            raise error
+        with self.lock:
+            return func()
+
+    def grab(self, x, y, width, height) -> np.ndarray:
+        rgba = self._call(self._screencap, retry=True)
+        return cv2.cvtColor(rgba[y: y + height, x: x + width], cv2.COLOR_RGBA2BGR)
+
+    def screenshot(self, x, y, width, height) -> np.ndarray:
+        rgba = self._call(self._screencap, retry=True)
+        return cv2.cvtColor(rgba[y: y + height, x: x + width], cv2.COLOR_RGBA2RGB)
+
+    def capture(self, regions=None) -> Frame:
+        rgba = self._call(self._screencap, retry=True)
+        return Frame(cv2.cvtColor(rgba, cv2.COLOR_RGBA2BGR), source=self)
+
+    def pixel(self, x, y) -> Tuple[int, int, int]:
+        return tuple(self.screenshot(x, y, 1, 1)[0, 0])
+
+    def left_click(self, coordinate: Tuple[int, int]):
+        x, y = coordinate
+        self._call(lambda: self.shell.write(f"input tap {int(x)} {int(y)} {self.QUIET}"))
+
+    def left_drag(self, start, end, duration, interval=.05):
+        (x1, y1), (x2, y2) = start, end
+        command = f"input swipe {int(x1)} {int(y1)} {int(x2)} {int(y2)} {int(duration * 1000)} {self.QUIET}"
+        self._call(lambda: self.shell.write(command))
+
+    def close(self):
+        with self.lock:
+            self.close_shell()
+
+    def __repr__(self):
+        host, port = self.address
+        return f"Adb[{self.serial or 'any'}@{host}:{port}, {self.rect.width:<4}*{self.rect.height:<4}]"
@@ -0,0 +1,119 @@
+import socket
+
+import numpy as np
+
+
+class AdbError(Exception):
+    pass
+
+
+class AdbConnection:
+    """
+    A socket to the adb server, speaking its smart socket protocol: every request is a 4-digit hex length followed by
+    the payload, answered by "OKAY", or "FAIL" with a hex-length-prefixed message.
+
+    Once a device service is opened (e.g. "exec:sh"), the socket becomes a raw stream to the service.
+    """
+
+    def __init__(self, host="127.0.0.1", port=5037, timeout=10.):
+        self.host = host
+        self.port = port
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def send(self, data: bytes):
+        self.sock.sendall(data)
+
+    def recv_exactly(self, size: int) -> bytes:
+        buffer = bytearray(size)
+        self.recv_into(memoryview(buffer))
+        return bytes(buffer)
+
+    def recv_into(self, buffer):
+        """Fill the whole buffer, e.g. a numpy array or a memoryview of it, without intermediate copies."""
+        view = memoryview(buffer).cast("B")
+        received = 0
+        while received < len(view):
+            if (n := self.sock.recv_into(view[received:])) == 0:
+                raise AdbError(f"connection closed after {received}/{len(view)} bytes")
+            received += n
+        return buffer
+
+    def recv_line(self, max_size=4096) -> bytes:
+        line = bytearray()
+        while not line.endswith(b"\n"):
+            if (byte := self.sock.recv(1)) == b"":
+                raise AdbError("connection closed")
+            line += byte
+            if len(line) > max_size:
+                raise AdbError("line too long")
+        return bytes(line).rstrip(b"\r\n")
+
+    def request(self, payload: str):
+        """Send a request and check the status."""
+        data = payload.encode("utf-8")
+        self.send(b"%04x" % len(data) + data)
+        if (status := self.recv_exactly(4)) == b"OKAY":
+            return
+        if status == b"FAIL":
+            message = self.recv_exactly(int(self.recv_exactly(4), 16)).decode("utf-8", "replace")
+            raise AdbError(f"{payload}: {message}")
+        raise AdbError(f"{payload}: unexpected status {status!r}")
+
+    def query(self, payload: str) -> str:
+        """Send a host request answered with a hex-length-prefixed string, e.g. "host:version"."""
+        self.request(payload)
+        return self.recv_exactly(int(self.recv_exactly(4), 16)).decode("utf-8")
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class AdbShell:
+    """
+    A long-lived `sh` on the device, over one connection. Commands are written to its stdin, so there is no adb
+    handshake, process spawning on the host, or pty mangling of binary output per command.
+    """
+
+    def __init__(self, serial: str = None, host="127.0.0.1", port=5037, timeout=10.):
+        self.serial = serial
+        self.conn = AdbConnection(host, port, timeout=timeout)
+        self.conn.request(f"host:transport:{serial}" if serial else "host:transport-any")
+        self.conn.request("exec:sh")
+
+    def write(self, command: str):
+        """Run a command without waiting for it."""
+        self.conn.send(f"{command}\n".encode("utf-8"))
+
+    def run(self, command: str, marker="__AUTOGAME_EOC__") -> str:
+        """Run a command and wait for its text output."""
+        self.write(f"{command}; echo {marker}")
+        lines = []
+        while (line := self.conn.recv_line().decode("utf-8", "replace")) != marker:
+            lines.append(line)
+        return "\n".join(lines)
+
+    def screencap(self, header_size: int, pool=None) -> np.ndarray:
+        """
+        Capture the framebuffer, read straight into a numpy array.
+
+        Args:
+            header_size: int
+                12 bytes (width, height, format), or 16 bytes with a colour space since Android 9
+            pool: FramePool, optional
+                buffers to read into
+
+        Returns:
+            np.ndarray, RGBA image in shape of (height, width, 4)
+        """
+        self.write("screencap")
+        header = np.frombuffer(self.conn.recv_exactly(header_size), dtype="<u4")
+        width, height = int(header[0]), int(header[1])
+        image = np.empty((height, width, 4), np.uint8) if pool is None else pool.acquire(height, width, 4)
+        return self.conn.recv_into(image)
+
+    def close(self):
+        self.conn.close()
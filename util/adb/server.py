@@ -0,0 +1,138 @@
+import socketserver
+import threading
+
+import cv2
+import numpy as np
+
+from util.screen.replay import ReplayScreenSource
+
+
+class FakeAdbServer(socketserver.ThreadingTCPServer):
+    """
+    A stand-in adb server with one device, which serves canned frames to `screencap`, and keeps inputs instead of
+    sending them anywhere, so that the adb backend can be run without a device or even the adb binary.
+
+    Only what `util.adb` uses is served: "host:version", "host:devices", "host:transport*", and "exec:sh" with
+    `getprop ro.build.version.sdk`, `wm size`, `echo`, `screencap`, `input tap` and `input swipe`, redirections of
+    their output are ignored.
+
+    Examples:
+        >>> with FakeAdbServer("path/to/frames") as server:
+        ...     source = AdbScreenSource(port=server.port)
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, frames, host="127.0.0.1", port=0, serial="emulator-5554", sdk=30, advance_on="capture"):
+        """
+
+        Args:
+            frames: str, Path, or list
+                see `ReplayScreenSource`
+            host: str
+            port: int, default 0
+                port to listen, default any free port
+            serial: str
+            sdk: int, default 30
+                android sdk version, it decides the size of screencap header
+            advance_on: str, optional {None, "capture", "input"}, default "capture"
+                see `ReplayScreenSource`
+        """
+        super().__init__((host, port), FakeAdbHandler)
+        self.replay = ReplayScreenSource(frames, advance_on=advance_on)
+        self.serial = serial
+        self.sdk = sdk
+        self.lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    @property
+    def inputs(self):
+        return self.replay.inputs
+
+    def screencap(self) -> bytes:
+        with self.lock:
+            image = cv2.cvtColor(self.replay.capture().bgr, cv2.COLOR_BGR2RGBA)
+        header = [image.shape[1], image.shape[0], 1] + ([0] if self.sdk >= 28 else [])  # format 1: RGBA_8888
+        return np.array(header, dtype="<u4").tobytes() + image.tobytes()
+
+    def input(self, args):
+        with self.lock:
+            if args[0] == "tap":
+                self.replay.left_click((int(args[1]), int(args[2])))
+            elif args[0] == "swipe":
+                x1, y1, x2, y2 = (int(v) for v in args[1:5])
+                duration = int(args[5]) / 1000 if len(args) > 5 else .3
+                self.replay.left_drag((x1, y1), (x2, y2), duration)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, name="AutoGame[FakeAdbServer]", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+class FakeAdbHandler(socketserver.StreamRequestHandler):
+    server: FakeAdbServer
+
+    def _recv_request(self):
+        if len(length := self.rfile.read(4)) < 4:
+            return None
+        return self.rfile.read(int(length, 16)).decode("utf-8")
+
+    def _okay(self, text: str = None):
+        self.wfile.write(b"OKAY")
+        if text is not None:
+            self.wfile.write(b"%04x" % len(data := text.encode("utf-8")) + data)
+
+    def _fail(self, message: str):
+        self.wfile.write(b"FAIL" + b"%04x" % len(data := message.encode("utf-8")) + data)
+
+    def handle(self):
+        while (request := self._recv_request()) is not None:
+            if request == "host:version":
+                self._okay("0029")
+                return
+            elif request == "host:devices":
+                self._okay(f"{self.server.serial}\tdevice\n")
+                return
+            elif request in ("host:transport-any", f"host:transport:{self.server.serial}"):
+                self._okay()
+            elif request == "exec:sh":
+                self._okay()
+                return self._shell()
+            else:
+                self._fail(f"unsupported request: {request}")
+                return
+
+    def _shell(self):
+        while line := self.rfile.readline():
+            for command in line.decode("utf-8").strip().split(";"):
+                if not (args := [arg for arg in command.split() if not arg.startswith((">", "2>"))]):
+                    continue
+                if args[0] == "screencap":
+                    self.wfile.write(self.server.screencap())
+                elif args[0] == "input":
+                    self.server.input(args[1:])
+                elif args[0] == "echo":
+                    self.wfile.write(f"{' '.join(args[1:])}\n".encode("utf-8"))
+                elif args[:2] == ["wm", "size"]:
+                    rect = self.server.replay.rect
+                    self.wfile.write(f"Physical size: {rect.width}x{rect.height}\n".encode("utf-8"))
+                elif args[:2] == ["getprop", "ro.build.version.sdk"]:
+                    self.wfile.write(f"{self.server.sdk}\n".encode("utf-8"))
+                else:
+                    self.wfile.write(f"sh: {args[0]}: not found\n".encode("utf-8"))
+            self.wfile.flush()
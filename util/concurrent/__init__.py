@@ -1,7 +1,9 @@
 import ctypes
 import inspect
+import itertools
+import queue
 import threading
-from typing import Iterable, Union, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, Union, Optional, Tuple
 
 
 class KillableThread(threading.Thread):
@@ -86,3 +88,209 @@ class PauseEventHandler:
     def wait(self, names=None, timeout: Optional[float] = None):
         for _, event in self._iter(names):
             event.wait(timeout=timeout)
+
+    def is_set(self, names=None) -> bool:
+        """whether all the events are set, i.e. nothing is paused"""
+        return all(event.is_set() for _, event in self._iter(names))
+
+
+class Publisher:
+    """
+    Publish events to subscribers, which are callbacks, or queues (anything with `put`). A subscriber can be inactive
+    for a while (e.g. a paused task), so that the publisher tells whether anyone is listening at all. The publisher
+    never blocks on a full queue, the oldest event in it is dropped instead.
+
+    Examples:
+        >>> publisher = Publisher()
+        >>> token = publisher.subscribe(queue.Queue(), is_active=lambda: not paused)
+        >>> publisher.publish("event")
+        >>> publisher.unsubscribe(token)
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.subscribers: Dict[int, Tuple[Any, Optional[Callable[[], bool]]]] = {}
+        self._tokens = itertools.count(1)
+
+    def subscribe(self, subscriber, is_active: Callable[[], bool] = None) -> int:
+        """
+        Args:
+            subscriber: Callable[[Any], None], or object with `put`, e.g. queue.Queue
+            is_active: Callable[[], bool], optional
+                whether the subscriber is listening, default always
+
+        Returns:
+            int, token to unsubscribe with
+        """
+        with self.cond:
+            self.subscribers[token := next(self._tokens)] = (subscriber, is_active)
+            self.cond.notify_all()
+        return token
+
+    def unsubscribe(self, token: int):
+        with self.cond:
+            self.subscribers.pop(token, None)
+            self.cond.notify_all()
+
+    def _active(self):
+        return [subscriber for subscriber, is_active in self.subscribers.values() if is_active is None or is_active()]
+
+    def has_active(self) -> bool:
+        with self.cond:
+            return len(self._active()) > 0
+
+    def wait_active(self, timeout: float = None) -> bool:
+        """Wait until any subscriber is active, `is_active` of subscribers are checked again on subscribing, or
+        `notify`, or timed out."""
+        with self.cond:
+            return self.cond.wait_for(lambda: len(self._active()) > 0, timeout)
+
+    def notify(self):
+        """Wake up waiters, e.g. a subscriber becomes active."""
+        with self.cond:
+            self.cond.notify_all()
+
+    @staticmethod
+    def _put(queue_, event):
+        if not hasattr(queue_, "put_nowait"):
+            return queue_.put(event)
+        while True:
+            try:
+                return queue_.put_nowait(event)
+            except queue.Full:
+                try:
+                    queue_.get_nowait()
+                except queue.Empty:  # drained by the reader meanwhile
+                    pass
+
+    def publish(self, event):
+        with self.cond:
+            subscribers = self._active()
+        for subscriber in subscribers:
+            try:
+                self._put(subscriber, event) if hasattr(subscriber, "put") else subscriber(event)
+            except Exception as e:  # a broken subscriber shouldn't stop others
+                print(f"failed to publish to {subscriber}: {e}")
+
+    def __len__(self):
+        return len(self.subscribers)
+
+
+class VersionedState:
+    """
+    A value replaced atomically, with a version increased on every change, so that readers get consistent snapshots
+    and can sleep until it changes instead of polling.
+
+    Examples:
+        >>> state = VersionedState(0)
+        >>> version, value = state.get()
+        >>> state.update(lambda v: v + 1)  # e.g. on another thread
+        1
+        >>> state.wait_for_change(version, timeout=1.)
+        (1, 1)
+    """
+
+    def __init__(self, value=None):
+        self.cond = threading.Condition()
+        self._value = value
+        self._version = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def value(self):
+        return self._value
+
+    def get(self) -> Tuple[int, Any]:
+        """version and value, read together"""
+        with self.cond:
+            return self._version, self._value
+
+    def set(self, value) -> Optional[int]:
+        return self.update(lambda _: value)
+
+    def update(self, func: Callable[[Any], Any]) -> Optional[int]:
+        """
+        Replace the value with `func(value)` atomically.
+
+        Args:
+            func: Callable[[Any], Any]
+                given the current value, returns the new one
+
+        Returns:
+            int, the new version, or None if the value is unchanged
+        """
+        with self.cond:
+            if (value := func(self._value)) == self._value:
+                return None
+            self._value, self._version = value, self._version + 1
+            self.cond.notify_all()
+            return self._version
+
+    def wait_until(self, predicate: Callable[[Any], bool], timeout: float = None) -> Optional[Tuple[int, Any]]:
+        """
+        Args:
+            predicate: Callable[[Any], bool]
+                checked on the value now, and on every change
+            timeout: float, optional
+                seconds to wait, default forever
+
+        Returns:
+            Tuple[int, Any], version and value which the predicate holds for, or None if timed out
+        """
+        with self.cond:
+            if self.cond.wait_for(lambda: predicate(self._value), timeout):
+                return self._version, self._value
+            return None
+
+    def wait_for_change(self, since_version: int, timeout: float = None) -> Optional[Tuple[int, Any]]:
+        """
+        Args:
+            since_version: int
+                version seen last time
+            timeout: float, optional
+                seconds to wait, default forever
+
+        Returns:
+            Tuple[int, Any], version and value newer than `since_version`, or None if timed out
+        """
+        with self.cond:
+            if self.cond.wait_for(lambda: self._version > since_version, timeout):
+                return self._version, self._value
+            return None
+
+    def __repr__(self):
+        return f"{type(self).__name__}[v{self._version}: {self._value}]"
+
+
+class AdaptiveInterval:
+    """
+    An interval which is reset to the shortest on activity, and backs off geometrically while nothing happens.
+
+    Examples:
+        >>> interval = AdaptiveInterval(.125, 2., 2.)
+        >>> interval.backoff(), interval.backoff(), interval.reset()
+        (0.25, 0.5, 0.125)
+    """
+
+    def __init__(self, minimum=.1, maximum=2., factor=1.5):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.factor = factor
+        self.value = minimum
+
+    def reset(self) -> float:
+        self.value = self.minimum
+        return self.value
+
+    def backoff(self) -> float:
+        self.value = min(self.value * self.factor, self.maximum)
+        return self.value
+
+    def __float__(self):
+        return float(self.value)
+
+    def __repr__(self):
+        return f"AdaptiveInterval[{self.value:.3f}s in [{self.minimum}, {self.maximum}], x{self.factor}]"
@@ -0,0 +1,9 @@
+from games.azur_lane.manager import Gateway
+from util.adb import AdbScreenSource
+from util.window import GameWindow
+
+
+class AdbEmulator:
+    def __init__(self, serial: str = None, host="127.0.0.1", port=5037):
+        self.window = GameWindow(source=AdbScreenSource(serial, host, port))
+        self.gateway = Gateway(self.window)
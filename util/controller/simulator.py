@@ -9,5 +9,5 @@ set_process_dpi_awareness(2, silent=True)
 class Bluestack:
     def __init__(self, window_name: str):
         self.window_sim = GameWindow(window_name=window_name)
-        self.window_ctl = GameWindow(window_hwnd=win32gui.FindWindowEx(self.window_sim.hwnd, None, None, None))
+        self.window_ctl = GameWindow(window_hwnd=win32gui.FindWindowEx(self.window_sim.source.hwnd, None, None, None))
         self.gateway = Gateway(self.window_ctl)
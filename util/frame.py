@@ -0,0 +1,374 @@
+import itertools
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Callable, Hashable, List, Tuple
+
+import cv2
+import numpy as np
+
+from util.proto import TwoDimArrayLike
+
+
+_recorders = threading.local()
+
+
+@contextmanager
+def record_reads():
+    """
+    Record areas of frames read by current thread within the context, e.g. to know what a recognizer depends on.
+
+    Yields:
+        List[np.ndarray], rectangles read, each of shape (N, 4), row as (x, y, width, height)
+    """
+    stack = _recorders.__dict__.setdefault("stack", [])
+    stack.append(reads := [])
+    try:
+        yield reads
+    finally:
+        stack.pop()
+        if stack:  # reads of the inner context are reads of the outer one as well
+            stack[-1].extend(reads)
+
+
+def _record(rects: np.ndarray):
+    if stack := getattr(_recorders, "stack", None):
+        stack[-1].append(rects)
+
+
+class Frame:
+    """
+    A snapshot of the window taken at one tick. Everything that recognizes the screen within the tick should read from
+    the same frame, instead of capturing the window (or calling GetPixel) by itself.
+
+    A frame either holds the whole window, or only some regions of it (see `util.screen.planner`). Reading an area not
+    captured yet captures it from `source` on demand, and keeps it in the frame.
+
+    Images are kept in the native layout of the source, i.e. BGRX (or BGR), so that capturing costs no conversion.
+    `crop` returns zero-copy BGR views, and colour is converted only when `bgr` or `rgb` of the whole window is asked
+    for, once per frame.
+
+    Results derived from the frame, e.g. whether it is at some scene, can be memoized in `memo`, they are dropped
+    along with the frame. Images derived from areas of the frame (gray, thresholded, pyramid levels) are memoized the
+    same way through `region`, so that matchers and OCR preprocessors share them.
+    """
+    __slots__ = ("frame_id", "timestamp", "size", "layers", "source", "memo")
+
+    _ids = itertools.count(1)
+
+    def __init__(self, image: np.ndarray, timestamp=None, frame_id=None, source=None):
+        """
+
+        Args:
+            image: np.ndarray
+                BGRX or BGR image of the whole window
+            timestamp: float, optional
+                time the frame is captured, default now
+            frame_id: int, optional
+                monotonically increasing id, default next id
+            source: ScreenSource, optional
+                source to capture areas missing from the frame
+        """
+        height, width = image.shape[:2]
+        self._init((width, height), [(0, 0, width, height)], [image], timestamp, frame_id, source)
+
+    def _init(self, size, regions, images, timestamp, frame_id, source):
+        self.frame_id = next(self._ids) if frame_id is None else frame_id
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.size = size
+        self.layers = (np.asarray(regions, dtype=np.int32).reshape(-1, 4), list(images))
+        self.source = source
+        self.memo = {}
+
+    @classmethod
+    def from_regions(cls, size: Tuple[int, int], regions: TwoDimArrayLike, images: List[np.ndarray],
+                     timestamp=None, frame_id=None, source=None):
+        """
+
+        Args:
+            size: Tuple[int, int]
+                width and height of the whole window
+            regions: 2-D array-like
+                e.g. [[x1, y1, w1, h1], [x2, y2, w2, h2], ...]
+            images: List[np.ndarray]
+                BGRX or BGR image of each region
+            timestamp: float, optional
+            frame_id: int, optional
+            source: ScreenSource, optional
+
+        Returns:
+            Frame
+        """
+        frame = cls.__new__(cls)
+        frame._init(size, regions, images, timestamp, frame_id, source)
+        return frame
+
+    @property
+    def regions(self) -> np.ndarray:
+        """captured regions in shape of (N, 4), each row is (x, y, width, height)"""
+        return self.layers[0]
+
+    @property
+    def images(self) -> List[np.ndarray]:
+        """BGRX or BGR image of each captured region"""
+        return self.layers[1]
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.timestamp
+
+    @property
+    def width(self) -> int:
+        return self.size[0]
+
+    @property
+    def height(self) -> int:
+        return self.size[1]
+
+    @property
+    def is_full(self) -> bool:
+        return self.covers(0, 0, self.width, self.height)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(image.nbytes for image in self.images)
+
+    @property
+    def bgrx(self) -> np.ndarray:
+        """zero-copy view of the whole window in native layout"""
+        return self.raw(0, 0, self.width, self.height)
+
+    @property
+    def bgr(self) -> np.ndarray:
+        """contiguous BGR image of the whole window, same layout as templates"""
+        if (image := self.memo.get("bgr")) is None:
+            image = self.memo["bgr"] = np.ascontiguousarray(self.crop(0, 0, self.width, self.height))
+        return image
+
+    @property
+    def rgb(self) -> np.ndarray:
+        """RGB image of the whole window, e.g. to save or show"""
+        if (image := self.memo.get("rgb")) is None:
+            image = self.memo["rgb"] = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2RGB)
+        return image
+
+    @staticmethod
+    def _locate(regions, x, y, width, height) -> int:
+        """index of the region which covers the rectangle, -1 if not covered"""
+        lt_in = (regions[:, 0] <= x) & (regions[:, 1] <= y)
+        rb_in = (regions[:, 0] + regions[:, 2] >= x + width) & (regions[:, 1] + regions[:, 3] >= y + height)
+        return int(idx[0]) if len(idx := np.flatnonzero(lt_in & rb_in)) > 0 else -1
+
+    def _fill(self, x, y, width, height):
+        """Capture a missing area into the frame, layers are swapped at once as the frame may be shared by threads."""
+        if self.source is None:
+            raise ValueError(f"area {(x, y, width, height)} is not captured in {self}")
+        image, region = self.source.grab(x, y, width, height), np.array([[x, y, width, height]], dtype=np.int32)
+        if (x, y, width, height) == (0, 0, self.width, self.height):
+            self.layers = (region, [image])
+        else:
+            regions, images = self.layers
+            self.layers = (np.vstack((regions, region)), images + [image])
+
+    def covers(self, x, y, width=1, height=1) -> bool:
+        return self._locate(self.regions, x, y, width, height) >= 0
+
+    def raw(self, x, y, width, height, record=True) -> np.ndarray:
+        """zero-copy view of the rectangle in native layout"""
+        if record:
+            _record(np.array([[x, y, width, height]]))
+        if (idx := self._locate((layers := self.layers)[0], x, y, width, height)) < 0:
+            self._fill(x, y, width, height)
+            return self.raw(x, y, width, height, record=False)
+        regions, images = layers
+        rx, ry = regions[idx, :2]
+        return images[idx][y - ry: y - ry + height, x - rx: x - rx + width]
+
+    def crop(self, x, y, width, height) -> np.ndarray:
+        """zero-copy BGR view of the rectangle"""
+        return self.raw(x, y, width, height)[:, :, :3]
+
+    def region(self, x=0, y=0, width=None, height=None) -> "FrameRegion":
+        """area of the frame, default the whole window, whose derived images are memoized in the frame"""
+        width = self.width - x if width is None else width
+        height = self.height - y if height is None else height
+        return FrameRegion(self, (int(x), int(y), int(width), int(height)))
+
+    def crop_rgb(self, x, y, width, height) -> np.ndarray:
+        return cv2.cvtColor(np.ascontiguousarray(self.crop(x, y, width, height)), cv2.COLOR_BGR2RGB)
+
+    def pixel(self, x, y) -> np.ndarray:
+        return self.pixels([[x, y]])[0]
+
+    def pixels(self, xy: TwoDimArrayLike) -> np.ndarray:
+        """
+
+        Args:
+            xy: 2-D array-like
+                e.g [[x1, y1], [x2, y2], ...]
+
+        Returns:
+            np.ndarray, RGB of each point, in shape of (N, 3)
+        """
+        return self.pixels_bgr(xy)[:, ::-1]
+
+    def pixels_bgr(self, xy: TwoDimArrayLike) -> np.ndarray:
+        """Same as `pixels`, but BGR, gathered by one fancy indexing if the points lie in one region."""
+        xy = np.asarray(xy).reshape(-1, 2)
+        xs, ys = xy[:, 0], xy[:, 1]
+        _record(np.hstack((xy, np.ones_like(xy))))
+        regions, images = self.layers
+        if len(images) == 1 and (regions[0, :2] == 0).all():  # fast path for the whole window
+            try:
+                return images[0][ys, xs, :3]
+            except IndexError:
+                pass
+
+        covered = (
+            (xs[:, None] >= regions[:, 0]) & (xs[:, None] < regions[:, 0] + regions[:, 2]) &
+            (ys[:, None] >= regions[:, 1]) & (ys[:, None] < regions[:, 1] + regions[:, 3])
+        )
+        if not (is_covered := covered.any(axis=1)).all():  # capture the bounding box of missing points at once
+            lt, rb = xy[~is_covered].min(axis=0), xy[~is_covered].max(axis=0)
+            self._fill(int(lt[0]), int(lt[1]), int(rb[0] - lt[0]) + 1, int(rb[1] - lt[1]) + 1)
+            return self.pixels_bgr(xy)
+
+        owner = covered.argmax(axis=1)
+        if (owners := np.unique(owner)).size == 1:
+            rx, ry = regions[owners[0], :2]
+            return images[owners[0]][ys - ry, xs - rx, :3]
+        res = np.empty((len(xy), 3), dtype=np.uint8)
+        for idx in owners:
+            mask = owner == idx
+            rx, ry = regions[idx, :2]
+            res[mask] = images[idx][ys[mask] - ry, xs[mask] - rx, :3]
+        return res
+
+    def __repr__(self):
+        return f"Frame-{self.frame_id}[{self.width}*{self.height}, {len(self.images)} region(s) @{self.timestamp:.3f}]"
+
+
+class FrameRegion:
+    """
+    An area of a frame, with images derived from it computed lazily, and memoized in `memo` of the frame, keyed by the
+    area and the parameters. Reading any of them counts as reading the area, see `record_reads`.
+
+    Examples:
+        >>> region = frame.region(100, 200, 300, 40)
+        >>> region.threshold(155) is region.threshold(155)  # the gray image is shared by all thresholds as well
+        True
+        >>> region.pyramid(2).shape  # a quarter of the width and height
+        (10, 75, 3)
+    """
+    __slots__ = ("frame", "rect")
+
+    def __init__(self, frame: Frame, rect: Tuple[int, int, int, int]):
+        self.frame = frame
+        self.rect = rect
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        return self.rect[3], self.rect[2], 3
+
+    def derive(self, key: Hashable, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        """
+
+        Args:
+            key: Hashable
+                name and parameters of the image derived
+            compute: Callable[[], np.ndarray]
+                to compute it if it's not memoized yet
+
+        Returns:
+            np.ndarray
+        """
+        if getattr(_recorders, "stack", None):
+            _record(np.array([self.rect]))
+        if (image := self.frame.memo.get(memo_key := ("region", self.rect, key))) is None:
+            image = self.frame.memo[memo_key] = compute()
+            image.setflags(write=False)  # shared by all users of the frame
+        return image
+
+    @property
+    def bgr(self) -> np.ndarray:
+        """contiguous BGR image of the area"""
+        return self.derive("bgr", lambda: np.ascontiguousarray(self.frame.crop(*self.rect)))
+
+    @property
+    def gray(self) -> np.ndarray:
+        return self.derive("gray", lambda: cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY))
+
+    def threshold(self, thresh=127, maxval=255, type=cv2.THRESH_BINARY_INV) -> np.ndarray:
+        """the gray image thresholded, see `cv2.threshold`"""
+        key = ("threshold", thresh, maxval, type)
+        return self.derive(key, lambda: cv2.threshold(self.gray, thresh, maxval, type)[1])
+
+    def pyramid(self, level: int, gray=False) -> np.ndarray:
+        """
+
+        Args:
+            level: int
+                0 for the image itself, each level is half the width and height of the previous one
+            gray: bool, default False
+
+        Returns:
+            np.ndarray
+        """
+        if level == 0:
+            return self.gray if gray else self.bgr
+        return self.derive(("pyramid", level, gray), lambda: cv2.pyrDown(self.pyramid(level - 1, gray)))
+
+    def __repr__(self):
+        return f"FrameRegion[{self.rect} of {self.frame}]"
+
+
+class FramePool:
+    """
+    Preallocated buffers to capture frames into, grouped by shape. Each buffer is leased out as an array which every
+    view cropped from it (or any buffer exported from it) keeps alive; once the last of them is gone, the lease is
+    finalized and the buffer goes back to the pool, so frames never need to be released explicitly.
+
+    When all buffers of a shape are leased, a new one is allocated, and kept in the pool on return unless there are
+    `capacity` buffers of the shape free already.
+    """
+
+    def __init__(self, capacity=8):
+        self.capacity = capacity
+        self.buffers = {}  # shape -> buffers free
+        self.n_leased = 0
+        self.n_allocated = 0
+        self.n_reused = 0
+        self.lock = threading.Lock()
+
+    def acquire(self, height, width, channels=4) -> np.ndarray:
+        with self.lock:
+            if buffers := self.buffers.setdefault(shape := (height, width, channels), []):
+                buffer = buffers.pop()
+                self.n_reused += 1
+            else:
+                buffer = np.empty(shape, dtype=np.uint8)
+                self.n_allocated += 1
+            self.n_leased += 1
+
+        # numpy bases every view on the array wrapping a foreign buffer, i.e. the lease, not on the buffer itself
+        lease = np.frombuffer(memoryview(buffer), dtype=np.uint8)
+        weakref.finalize(lease, self._release, shape, buffer)
+        return lease.reshape(shape)
+
+    def _release(self, shape, buffer: np.ndarray):
+        with self.lock:
+            self.n_leased -= 1
+            if len(buffers := self.buffers.setdefault(shape, [])) < self.capacity:
+                buffers.append(buffer)
+
+    @property
+    def nbytes(self) -> int:
+        """bytes of buffers free in the pool"""
+        return sum(buffer.nbytes for buffers in self.buffers.values() for buffer in buffers)
+
+    def __repr__(self):
+        return (
+            f"FramePool[{self.nbytes / 2 ** 20:.1f}MB free, leased: {self.n_leased}, allocated: {self.n_allocated}, "
+            f"reused: {self.n_reused}]"
+        )
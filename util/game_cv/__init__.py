@@ -1,4 +1,4 @@
-from typing import Tuple, Any
+from typing import Tuple, Any, Union
 
 import cv2
 import numpy as np
@@ -7,9 +7,27 @@ from cv2 import TM_CCOEFF_NORMED, TM_SQDIFF, TM_SQDIFF_NORMED, TM_CCORR_NORMED
 from matplotlib import pyplot as plt
 from scipy.spatial import distance_matrix
 
+from util.frame import FrameRegion
 
-def binarize(image: np.ndarray, thresh=127, maxval=255, type=cv2.THRESH_BINARY_INV):
-    image_gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+T_Image = Union[np.ndarray, FrameRegion]
+
+
+def to_gray(image: T_Image) -> np.ndarray:
+    """gray image of a BGR image, or of a region of a frame, which is shared by all users of the frame"""
+    return image.gray if isinstance(image, FrameRegion) else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def _origin_of(image: T_Image, template: np.ndarray) -> np.ndarray:
+    """image to match a template against, gray if the template is"""
+    if isinstance(image, FrameRegion):
+        return image.gray if template.ndim == 2 else image.bgr
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if template.ndim == 2 and image.ndim == 3 else image
+
+
+def binarize(image: T_Image, thresh=127, maxval=255, type=cv2.THRESH_BINARY_INV):
+    if isinstance(image, FrameRegion):
+        return image.threshold(thresh, maxval, type)
+    image_gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
     _, image_bin = cv2.threshold(image_gray, thresh, maxval, type)
     return image_bin
 
@@ -26,12 +44,12 @@ def debug_show(f):
     def wrapper(img_ori, img_tem, *args, **kwargs):
         locs = f(img_ori, img_tem, *args, **kwargs)
 
-        img_cp = img_ori.copy()
+        img_cp = (img_ori.bgr if isinstance(img_ori, FrameRegion) else img_ori).copy()
         w, h = img_tem.shape[:2][::-1]
         for pt in locs:
             print(pt)
             cv2.rectangle(img_cp, tuple(pt), (pt[0] + w, pt[1] + h), (255, 0, 0), 5)
-        plt.imshow(img_cp)
+        plt.imshow(img_cp[:, :, ::-1])
         plt.show()
 
         return locs
@@ -56,8 +74,91 @@ def combine_similar_points(points, threshold=50):
     return points_sorted[np.unique((dm < threshold).argmax(axis=0))]
 
 
-def match_multi_template(img_ori: np.ndarray, img_tem: np.ndarray, method=TM_CCOEFF_NORMED, thresh=.8, thresh_dedup=0):
-    res = cv2.matchTemplate(img_ori, img_tem, method)
+# how much lower a match may score down the pyramid, e.g. shifted by half a pixel there; correlation coefficients
+# spread wider than the others, which are close to 1 for most of a frame
+PYRAMID_SLACK = {TM_SQDIFF_NORMED: .05, TM_CCORR_NORMED: .05, TM_CCOEFF_NORMED: .2}
+
+
+def _downscale(image: T_Image, template: np.ndarray, level: int) -> np.ndarray:
+    """the image down `level` levels of the pyramid, memoized if it's a region"""
+    if isinstance(image, FrameRegion):
+        return image.pyramid(level, gray=template.ndim == 2)
+    image = _origin_of(image, template)
+    for _ in range(level):
+        image = cv2.pyrDown(image)
+    return image
+
+
+def match_template(origin: T_Image, template: np.ndarray, method=TM_CCOEFF_NORMED, levels=0, margin=4, thresh=None,
+                   slack=None, min_size=8) -> np.ndarray:
+    """
+    `cv2.matchTemplate`, or coarse-to-fine if `levels` > 0: the frame and the template are matched `levels` levels down
+    the pyramid first, then only neighbourhoods of candidates found are matched at full resolution.
+
+    Positions not refined are filled with the worst value of the method, so that thresholds and `cv2.minMaxLoc` work on
+    the result as on an exhaustive one. It falls back to exhaustive if the template is too small to downscale, or if
+    candidates cover most of the frame.
+
+    Args:
+        origin: np.ndarray, or FrameRegion
+        template: np.ndarray
+            BGR, or gray to match in gray
+        method: int, default TM_CCOEFF_NORMED
+            one of the normed methods if `levels` > 0
+        levels: int, default 0
+            levels of the pyramid to go down, each halves width and height; 0 for exhaustive
+        margin: int, default 4
+            pixels of full resolution around each candidate to refine
+        thresh: float, optional
+            threshold of the method, candidates are the ones which pass it loosened by `slack`; default the ones within
+            `slack` of the best
+        slack: float, optional
+            default `PYRAMID_SLACK` of the method
+        min_size: int, default 8
+            least width and height of the template downscaled, levels are reduced to keep it
+
+    Returns:
+        np.ndarray, result of `cv2.matchTemplate` in float32
+    """
+    full = _origin_of(origin, template)
+    while levels > 0 and min(template.shape[:2]) >> levels < min_size:
+        levels -= 1
+    if levels == 0:
+        return cv2.matchTemplate(full, template, method)
+    if method not in PYRAMID_SLACK:
+        raise ValueError(f"coarse-to-fine matching needs a normed method, got {method}")
+    slack = PYRAMID_SLACK[method] if slack is None else slack
+
+    is_sqdiff = method == TM_SQDIFF_NORMED
+    tem_coarse = template
+    for _ in range(levels):
+        tem_coarse = cv2.pyrDown(tem_coarse)
+    scores = cv2.matchTemplate(_downscale(origin, template, levels), tem_coarse, method)
+    if is_sqdiff:
+        scores = 1 - scores
+    bound = (scores.max() if thresh is None else 1 - thresh if is_sqdiff else thresh) - slack
+    candidates = (scores >= bound).astype(np.uint8)
+    if candidates.mean() > .25:
+        return cv2.matchTemplate(full, template, method)
+
+    scale = 1 << levels
+    k = -(-margin // scale)
+    candidates = cv2.dilate(candidates, np.ones((2 * k + 1, 2 * k + 1), np.uint8))
+    th, tw = template.shape[:2]
+    result = np.full((full.shape[0] - th + 1, full.shape[1] - tw + 1), 1 if is_sqdiff else -1, dtype=np.float32)
+    n, _, stats, _ = cv2.connectedComponentsWithStats(candidates, connectivity=8)
+    for x, y, w, h, _ in stats[1:]:  # 0 is the background
+        x0, y0 = x * scale, y * scale
+        x1, y1 = min((x + w) * scale, result.shape[1]), min((y + h) * scale, result.shape[0])
+        if x0 < x1 and y0 < y1:
+            result[y0: y1, x0: x1] = cv2.matchTemplate(full[y0: y1 + th - 1, x0: x1 + tw - 1], template, method)
+    return result
+
+
+def match_multi_template(img_ori: T_Image, img_tem: np.ndarray, method=TM_CCOEFF_NORMED, thresh=.8, thresh_dedup=0,
+                         levels=0, margin=4):
+    """Top-left points of all matches, see `match_template` for `levels` and `margin`."""
+    res = match_template(img_ori, img_tem, method, levels, margin, thresh)
     if method in (TM_SQDIFF, TM_SQDIFF_NORMED):
         loc = np.where(res <= thresh)
     else:
@@ -70,8 +171,11 @@ def match_multi_template(img_ori: np.ndarray, img_tem: np.ndarray, method=TM_CCO
     return list(locs)
 
 
-def match_single_template(origin: np.ndarray, template: np.ndarray, method=TM_CCORR_NORMED, debug=True) -> Tuple[Any, Any, Any, Any]:
-    result = cv2.matchTemplate(origin, template, method)
+def match_single_template(origin: T_Image, template: np.ndarray, method=TM_CCORR_NORMED, debug=True, levels=0,
+                          margin=4) -> Tuple[Any, Any, Any, Any]:
+    """`cv2.minMaxLoc` of the best match, see `match_template` for `levels` and `margin`."""
+    result = match_template(origin, template, method, levels, margin)
+    origin = _origin_of(origin, template)
 
     min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
 
@@ -81,6 +185,6 @@ def match_single_template(origin: np.ndarray, template: np.ndarray, method=TM_CC
         top_left = max_loc
         bottom_right = (top_left[0] + width, top_left[1] + height)
         cv2.rectangle(origin_copy, top_left, bottom_right, (255, 255, 255), 2)
-        plt.imshow(origin_copy)
+        plt.imshow(origin_copy[:, :, ::-1])
         plt.show()
     return min_val, max_val, min_loc, max_loc
@@ -0,0 +1,197 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+from cv2 import TM_CCOEFF_NORMED, TM_SQDIFF, TM_SQDIFF_NORMED
+
+from util.frame import Frame, FrameRegion
+from util.game_cv import T_Image, match_template
+
+
+class TemplateSpec(NamedTuple):
+    """
+    A template to search for, and where.
+
+    Examples:
+        >>> TemplateSpec("Boss.RXX", am.template("Campaign.Enemy.Scale.Boss.RXX"), region=(0, 160, 1920, 820))
+    """
+    name: str
+    image: np.ndarray
+    region: Optional[Tuple[int, int, int, int]] = None  # (x, y, width, height) to search in, default everywhere
+    threshold: float = .8  # of the method, i.e. max difference for TM_SQDIFF(_NORMED), min correlation for others
+
+
+class Detection(NamedTuple):
+    name: str
+    x: int  # top-left, in the frame
+    y: int
+    width: int
+    height: int
+    score: float  # the higher the better, 1 - difference for TM_SQDIFF(_NORMED)
+
+    @property
+    def center(self) -> Tuple[int, int]:
+        return self.x + self.width // 2, self.y + self.height // 2
+
+
+def _iou(box: Detection, boxes: np.ndarray) -> np.ndarray:
+    """intersection over union of a box with boxes in shape of (N, 4), each row is (x, y, width, height)"""
+    w = np.minimum(box.x + box.width, boxes[:, 0] + boxes[:, 2]) - np.maximum(box.x, boxes[:, 0])
+    h = np.minimum(box.y + box.height, boxes[:, 1] + boxes[:, 3]) - np.maximum(box.y, boxes[:, 1])
+    intersection = np.clip(w, 0, None) * np.clip(h, 0, None)
+    return intersection / (box.width * box.height + boxes[:, 2] * boxes[:, 3] - intersection)
+
+
+def suppress(detections: Iterable[Detection], max_iou=.3) -> List[Detection]:
+    """Detections kept greedily from the best, dropping the ones overlapping more than `max_iou` with a kept one."""
+    kept, boxes = [], np.empty((0, 4), dtype=np.int64)
+    for detection in sorted(detections, key=lambda d: d.score, reverse=True):
+        if len(kept) == 0 or _iou(detection, boxes).max() <= max_iou:
+            kept.append(detection)
+            boxes = np.vstack((boxes, [detection[1:5]]))
+    return kept
+
+
+class MatchEngine:
+    """
+    Match a set of templates against a frame in one pass: the frame is converted (to BGR or gray) once, each template
+    is matched only in its search region, matches run across a thread pool (`cv2.matchTemplate` releases the GIL),
+    and detections of all templates are merged into one list by non-maximum suppression.
+
+    With `levels` > 0, each template is matched coarse-to-fine, see `match_template`; downscaled frames are shared by
+    templates of the same region.
+
+    Time taken by each template is kept, see `metrics`.
+
+    Examples:
+        >>> engine = MatchEngine([TemplateSpec("R25", template_r25, region=(0, 160, 1920, 820), threshold=.1)],
+        ...                      method=TM_SQDIFF_NORMED)
+        >>> engine.match(frame)
+        [Detection(name='R25', x=812, y=433, width=40, height=25, score=0.97)]
+    """
+
+    def __init__(self, templates: Iterable[TemplateSpec], method=TM_CCOEFF_NORMED, gray=False, max_iou=.3,
+                 workers: int = None, levels=0, margin=4):
+        """
+
+        Args:
+            templates: Iterable[TemplateSpec]
+            method: int, default TM_CCOEFF_NORMED
+                see `cv2.matchTemplate`
+            gray: bool, default False
+                match in gray, templates are converted ahead
+            max_iou: float, default .3
+                detections overlapping more than this with a better one are dropped
+            workers: int, optional
+                threads to match with, default one per template, up to the number of CPUs
+            levels: int, default 0
+                levels of the pyramid to match coarse-to-fine, 0 for exhaustive
+            margin: int, default 4
+                pixels around each coarse candidate to refine
+        """
+        self.method = method
+        self.levels = levels
+        self.margin = margin
+        self.gray = gray
+        self.max_iou = max_iou
+        self.templates = [
+            spec._replace(image=cv2.cvtColor(spec.image, cv2.COLOR_BGR2GRAY)) if gray and spec.image.ndim == 3 else spec
+            for spec in templates
+        ]
+        workers = min(len(self.templates), os.cpu_count() or 1) if workers is None else workers
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="match") if workers > 1 else None
+        self.stats = defaultdict(lambda: {"calls": 0, "elapsed": 0., "detections": 0})
+        self.lock = threading.Lock()
+
+    def _origin(self, image: Union[np.ndarray, Frame, FrameRegion]) -> Union[np.ndarray, Frame]:
+        """the whole image converted once, or the frame whose regions are memoized"""
+        if isinstance(image, FrameRegion):
+            image = image.frame
+        if isinstance(image, Frame):
+            return image
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if self.gray and image.ndim == 3 else image
+
+    @staticmethod
+    def _area(
+            origin: Union[np.ndarray, Frame], region: Optional[Tuple[int, int, int, int]]
+    ) -> Tuple[T_Image, int, int]:
+        """the search region clipped to the image, and its top-left"""
+        width, height = (origin.width, origin.height) if isinstance(origin, Frame) else origin.shape[1::-1]
+        x, y, w, h = (0, 0, width, height) if region is None else region
+        x0, y0 = max(x, 0), max(y, 0)
+        w, h = max(min(x + w, width) - x0, 0), max(min(y + h, height) - y0, 0)
+        if isinstance(origin, Frame):
+            return origin.region(x0, y0, w, h), x0, y0
+        return origin[y0: y0 + h, x0: x0 + w], x0, y0
+
+    def _score(self, value):
+        return 1 - value if self.method in (TM_SQDIFF, TM_SQDIFF_NORMED) else value
+
+    def _match_one(self, origin: Union[np.ndarray, Frame], spec: TemplateSpec) -> List[Detection]:
+        start = time.perf_counter()
+        height, width = spec.image.shape[:2]
+        area, x0, y0 = self._area(origin, spec.region)
+
+        res = []
+        if area.shape[0] >= height and area.shape[1] >= width:
+            matched = match_template(area, spec.image, self.method, self.levels, self.margin, spec.threshold)
+            scores = self._score(matched)
+            # local peaks only, not every pixel around a match
+            peaks = scores == cv2.dilate(scores, np.ones((max(height // 2, 1), max(width // 2, 1)), np.uint8))
+            ys, xs = np.nonzero(peaks & (scores >= self._score(spec.threshold)))
+            res = [
+                Detection(spec.name, int(x + x0), int(y + y0), width, height, float(scores[y, x]))
+                for y, x in zip(ys, xs)
+            ]
+
+        with self.lock:
+            stats = self.stats[spec.name]
+            stats["calls"] += 1
+            stats["elapsed"] += time.perf_counter() - start
+            stats["detections"] += len(res)
+        return res
+
+    def match(self, image: Union[np.ndarray, Frame, FrameRegion]) -> List[Detection]:
+        """
+        Args:
+            image: np.ndarray of BGR, Frame, or FrameRegion of the whole frame
+                regions of templates are relative to it
+
+        Returns:
+            List[Detection], of all templates, the best first
+        """
+        origin = self._origin(image)
+        if self.pool is None:
+            found = [self._match_one(origin, spec) for spec in self.templates]
+        else:
+            found = list(self.pool.map(lambda spec: self._match_one(origin, spec), self.templates))
+        return suppress((detection for detections in found for detection in detections), self.max_iou)
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        """calls, average time and detections of each template"""
+        with self.lock:
+            stats = {name: dict(s) for name, s in self.stats.items()}
+        return {
+            name: {
+                "calls": s["calls"],
+                "avg_ms": s["elapsed"] / max(s["calls"], 1) * 1000,
+                "avg_detections": s["detections"] / max(s["calls"], 1),
+            }
+            for name, s in stats.items()
+        }
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+
+    def __repr__(self):
+        workers = 1 if self.pool is None else self.pool._max_workers
+        return (
+            f"MatchEngine[{len(self.templates)} template(s), {workers} worker(s), gray: {self.gray}, "
+            f"levels: {self.levels}]"
+        )
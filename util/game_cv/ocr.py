@@ -1,9 +1,25 @@
 import cv2
 import pytesseract
 
+from util.frame import FrameRegion
+
 
 def ocr_preprocess(img, k_size=(3, 3)):
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    """
+
+    Args:
+        img: np.ndarray of BGR, or FrameRegion, whose result is memoized in the frame
+        k_size: Tuple[int, int], default (3, 3)
+
+    Returns:
+
+    """
+    if isinstance(img, FrameRegion):
+        return img.derive(("ocr_preprocess", k_size), lambda: _ocr_preprocess(img.gray, k_size))
+    return _ocr_preprocess(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY), k_size)
+
+
+def _ocr_preprocess(gray, k_size):
     blur = cv2.GaussianBlur(gray, k_size, 0)
     thresh = cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
 
@@ -17,5 +33,7 @@ def ocr_preprocess(img, k_size=(3, 3)):
 def ocr_int(img, config, lang="eng", preprocess=None):
     if preprocess is not None:
         img = ocr_preprocess(img)
+    elif isinstance(img, FrameRegion):
+        img = img.bgr
     data = pytesseract.image_to_string(img, lang=lang, config=config)
     return data
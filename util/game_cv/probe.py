@@ -0,0 +1,110 @@
+from typing import Dict, Hashable, Mapping, Sequence, Tuple, Union
+
+import numpy as np
+
+from util.frame import Frame
+from util.proto import TwoDimArrayLike
+
+T_Tolerance = Union[int, Sequence[int], np.ndarray]
+
+
+def unpack_eigens(eigens: TwoDimArrayLike) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Split eigens into coordinates and colours.
+
+    Args:
+        eigens: 2-D array-like
+            e.g [[x1, y1, BGR_1], [x2, y2, BGR_2], ...], colours are packed as 0x00BBGGRR, the same as `GetPixel`
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray], coordinates in shape of (N, 2), and BGR colours in shape of (N, 3)
+    """
+    eigens = np.asarray(eigens, dtype=np.int64).reshape(-1, 3)
+    packed = eigens[:, 2:3]
+    bgr = np.hstack(((packed >> 16) & 0xff, (packed >> 8) & 0xff, packed & 0xff)).astype(np.int16)
+    return eigens[:, :2], bgr
+
+
+def _tolerance_bgr(tolerance: T_Tolerance) -> np.ndarray:
+    """tolerance given for R, G, B (or one for all) in BGR order, broadcastable to (..., 3)"""
+    tolerance = np.asarray(tolerance, dtype=np.int16)
+    return tolerance[..., ::-1] if tolerance.ndim > 0 and tolerance.shape[-1] == 3 else tolerance[..., None]
+
+
+def probe(frame: Frame, eigens: TwoDimArrayLike, tolerance: T_Tolerance = 0) -> bool:
+    """
+    Check whether every point of the frame has the colour of the eigen, within tolerance of each channel.
+
+    Args:
+        frame: Frame
+        eigens: 2-D array-like
+            e.g [[x1, y1, BGR_1], [x2, y2, BGR_2], ...]
+        tolerance: int, or array-like of (R, G, B)
+            max absolute difference of each channel
+
+    Returns:
+        bool
+    """
+    xy, bgr = unpack_eigens(eigens)
+    diff = np.abs(frame.pixels_bgr(xy).astype(np.int16) - bgr)
+    return bool((diff <= _tolerance_bgr(tolerance)).all())
+
+
+class ProbeBatch:
+    """
+    Several probe sets (e.g. eigens of different scenes) compiled into one, so that all of them are checked against a
+    frame with one gathering and one comparison.
+
+    Examples:
+        >>> batch = ProbeBatch({"main": am.eigens("Main.Button_Build"), "campaign": am.eigens("Campaign.Label")})
+        >>> batch.match(frame)
+        {'main': True, 'campaign': False}
+    """
+
+    def __init__(self, probe_sets: Mapping[Hashable, TwoDimArrayLike], tolerance: Mapping[Hashable, T_Tolerance] = None):
+        """
+
+        Args:
+            probe_sets: Mapping[Hashable, 2-D array-like]
+                eigens of each set
+            tolerance: Mapping[Hashable, int or array-like of (R, G, B)], optional
+                tolerance of each set, default 0; it can also be given on matching for all sets
+        """
+        self.names = list(probe_sets)
+        unpacked = [unpack_eigens(probe_sets[name]) for name in self.names]
+        self.counts = np.array([len(xy) for xy, _ in unpacked], dtype=np.int64)
+        self.offsets = np.concatenate(([0], np.cumsum(self.counts)[:-1])).astype(np.int64)
+        self.xy = np.vstack([xy for xy, _ in unpacked]) if unpacked else np.empty((0, 2), dtype=np.int64)
+        self.bgr = np.vstack([bgr for _, bgr in unpacked]) if unpacked else np.empty((0, 3), dtype=np.int16)
+
+        tolerance = tolerance or {}
+        per_set = np.vstack([np.broadcast_to(_tolerance_bgr(tolerance.get(name, 0)), (1, 3)) for name in self.names])
+        self.tolerance = np.repeat(per_set, self.counts, axis=0) if len(self.names) else np.empty((0, 3), np.int16)
+
+    def __len__(self):
+        return len(self.names)
+
+    def match_array(self, frame: Frame, tolerance: T_Tolerance = None) -> np.ndarray:
+        """
+        Args:
+            frame: Frame
+            tolerance: int, or array-like of (R, G, B), optional
+                tolerance for all sets, default the tolerance of each set
+
+        Returns:
+            np.ndarray, whether each set matches, in order of `names`
+        """
+        if len(self.xy) == 0:
+            return np.ones(len(self.names), dtype=bool)
+        tolerance = self.tolerance if tolerance is None else _tolerance_bgr(tolerance)
+        ok = (np.abs(frame.pixels_bgr(self.xy).astype(np.int16) - self.bgr) <= tolerance).all(axis=1)
+        res = np.ones(len(self.names), dtype=bool)  # a set without points always matches
+        non_empty = self.counts > 0
+        res[non_empty] = np.logical_and.reduceat(ok, self.offsets[non_empty])
+        return res
+
+    def match(self, frame: Frame, tolerance: T_Tolerance = None) -> Dict[Hashable, bool]:
+        return dict(zip(self.names, self.match_array(frame, tolerance).tolist()))
+
+    def __repr__(self):
+        return f"ProbeBatch[{len(self.names)} set(s), {len(self.xy)} point(s)]"
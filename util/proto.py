@@ -1,8 +1,5 @@
 from numpy.typing import ArrayLike
 
-from util.win32 import T_PyCDC
-
-PyCDC = T_PyCDC
 Position = ArrayLike
 OneDimArrayLike = ArrayLike
 TwoDimArrayLike = ArrayLike
@@ -0,0 +1,7 @@
+from .change import ChangeDetector, ChangeReport
+from .planner import CapturePlanner, merge_boxes
+from .producer import FrameProducer, ProducerScreenSource
+from .recorder import SessionReader, SessionRecorder
+from .replay import ReplayScreenSource
+from .source import ScreenSource
+from .window import ScreenWindow, ScreenUtilityMixin, MouseMixin
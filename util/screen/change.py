@@ -0,0 +1,210 @@
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple
+
+import cv2
+import numpy as np
+
+from util.frame import Frame
+
+
+def tiles_max_diff(image_1: np.ndarray, image_2: np.ndarray, x, y, tile) -> np.ndarray:
+    """
+    Max difference of any channel per tile, between two images of the same region.
+
+    Args:
+        image_1: np.ndarray
+        image_2: np.ndarray
+        x: int
+            left-top x coordinate of the region, tiles are aligned to the whole window
+        y: int
+            left-top y coordinate of the region
+        tile: int
+            width and height of a tile
+
+    Returns:
+        np.ndarray, in shape of (tiles along y, tiles along x) of the region
+    """
+    diff = cv2.absdiff(image_1, image_2)
+    height, width = diff.shape[:2]
+    channels = diff.shape[2] if diff.ndim == 3 else 1
+    breaks_y = np.arange(y // tile, (y + height - 1) // tile + 1) * tile - y
+    breaks_x = np.arange(x // tile, (x + width - 1) // tile + 1) * tile - x
+    breaks_y[0] = breaks_x[0] = 0
+    # channels of a row lie side by side, so one reduce on the flattened row takes max of channels as well
+    diff = np.maximum.reduceat(diff.reshape(height, width * channels), breaks_y, axis=0)
+    return np.maximum.reduceat(diff, breaks_x * channels, axis=1)
+
+
+class ChangeReport(NamedTuple):
+    frame_id: int
+    frame_id_prev: int
+    epoch: int
+    regions: np.ndarray
+    changed: np.ndarray
+    elapsed: float
+
+    @property
+    def n_changed(self) -> int:
+        return int(self.changed.sum())
+
+    @property
+    def ratio(self) -> float:
+        """ratio of tiles changed"""
+        return self.n_changed / self.changed.size
+
+    def __repr__(self):
+        return (
+            f"ChangeReport[{self.frame_id_prev} --> {self.frame_id}, {self.n_changed}/{self.changed.size} tile(s) "
+            f"changed, {self.elapsed * 1000:.2f}ms]"
+        )
+
+
+class ChangeDetector:
+    """
+    Compare each new frame with the previous one on a coarse grid of tiles, and keep the id of the frame each tile
+    last changed at.
+
+    Results derived from some areas of a frame (e.g. whether it's at a scene) can be remembered along with the areas,
+    and reused on later frames as long as no tile of those areas has changed since. Only areas compared in both
+    frames count, so `epoch` is bumped whenever the compared regions change (e.g. the capture planner switches modes),
+    which invalidates everything remembered.
+    """
+    MEMO_KEY = "change"
+
+    def __init__(self, tile=64, threshold=8):
+        """
+
+        Args:
+            tile: int, default 64
+                width and height of a tile, in pixels
+            threshold: int, default 8
+                max difference of a channel seen as unchanged, to tolerate noise of the renderer
+        """
+        self.tile = tile
+        self.threshold = threshold
+        self.lock = threading.RLock()
+        self.size = None
+        self.frame_prev: Frame = None
+        self.regions_prev: np.ndarray = None
+        self.last_changed: np.ndarray = None
+        self.epoch = 0
+        self.report: ChangeReport = None
+        self.results: Dict[Any, tuple] = {}
+        self.stats = {"frames": 0, "tiles_changed": 0, "tiles": 0, "reused": 0, "evaluated": 0, "elapsed": 0.}
+
+    def _reset(self, size):
+        self.size = size
+        self.frame_prev = self.regions_prev = None
+        self.last_changed = np.zeros((-(-size[1] // self.tile), -(-size[0] // self.tile)), dtype=np.int64)
+        self.epoch += 1
+        self.results.clear()
+
+    def update(self, frame: Frame) -> ChangeReport:
+        """Compare the frame with the previous one, the report is kept in `memo` of the frame as well."""
+        start = time.perf_counter()
+        with self.lock:
+            if self.size != frame.size:
+                self._reset(frame.size)
+            frame_prev, tile = self.frame_prev, self.tile
+            changed = np.zeros_like(self.last_changed, dtype=bool)
+
+            compared = []
+            for x, y, width, height in frame.regions if frame_prev is not None else ():
+                if not frame_prev.covers(x, y, width, height):
+                    continue
+                compared.append((x, y, width, height))
+                diff = tiles_max_diff(
+                    frame_prev.raw(x, y, width, height, record=False), frame.raw(x, y, width, height, record=False),
+                    x, y, tile,
+                )
+                ty, tx = y // tile, x // tile
+                changed[ty: ty + diff.shape[0], tx: tx + diff.shape[1]] |= diff > self.threshold
+            compared = np.array(compared, dtype=np.int32).reshape(-1, 4)
+
+            if self.regions_prev is None or not np.array_equal(compared, self.regions_prev):
+                self.epoch += 1
+            self.last_changed[changed] = frame.frame_id
+            self.frame_prev, self.regions_prev = frame, compared
+
+            self.report = report = ChangeReport(
+                frame.frame_id, getattr(frame_prev, "frame_id", 0), self.epoch, compared, changed,
+                time.perf_counter() - start,
+            )
+            self.stats["frames"] += 1
+            self.stats["tiles_changed"] += report.n_changed
+            self.stats["tiles"] += changed.size
+            self.stats["elapsed"] += report.elapsed
+        frame.memo[self.MEMO_KEY] = report
+        return report
+
+    def tiles_of(self, rects: np.ndarray) -> np.ndarray:
+        """mask of tiles the rectangles overlap"""
+        mask, tile = np.zeros_like(self.last_changed, dtype=bool), self.tile
+        for x, y, width, height in rects:
+            mask[y // tile: (y + height - 1) // tile + 1, x // tile: (x + width - 1) // tile + 1] = True
+        return mask
+
+    @staticmethod
+    def _within(rects: np.ndarray, regions: np.ndarray) -> bool:
+        """whether every rectangle lies within one of the regions"""
+        if len(regions) == 0:
+            return len(rects) == 0
+        lt_in = (rects[:, None, :2] >= regions[None, :, :2]).all(axis=2)
+        rb_in = (rects[:, None, :2] + rects[:, None, 2:] <= regions[None, :, :2] + regions[None, :, 2:]).all(axis=2)
+        return bool((lt_in & rb_in).any(axis=1).all())
+
+    def remember(self, key, frame: Frame, result, reads: List[np.ndarray]):
+        """
+        Remember the result derived from areas of the frame, if the frame has been compared and all the areas were.
+
+        Args:
+            key: hashable
+            frame: Frame
+            result: object
+            reads: List[np.ndarray]
+                areas the result derived from, see `util.frame.record_reads`
+        """
+        if (report := frame.memo.get(self.MEMO_KEY)) is None or len(reads) == 0:
+            return
+        rects = np.unique(np.vstack(reads).astype(np.int64), axis=0)
+        if not self._within(rects, report.regions):
+            return
+        with self.lock:
+            if report.epoch == self.epoch:
+                self.results[key] = (frame.frame_id, report.epoch, self.tiles_of(rects), result)
+
+    def reuse(self, key, frame: Frame, default=None):
+        """
+        Get the result remembered, if none of its tiles has changed until the frame.
+
+        Returns:
+            the result remembered, or `default`
+        """
+        with self.lock:
+            if (report := frame.memo.get(self.MEMO_KEY)) is None or (entry := self.results.get(key)) is None:
+                self.stats["evaluated"] += 1
+                return default
+            frame_id, epoch, tiles, result = entry
+            if epoch != report.epoch or frame.frame_id < frame_id or (self.last_changed[tiles] > frame_id).any():
+                self.stats["evaluated"] += 1
+                return default
+            self.stats["reused"] += 1
+            return result
+
+    def metrics(self) -> Dict[str, float]:
+        n_frames, n_checks = self.stats["frames"], self.stats["reused"] + self.stats["evaluated"]
+        return {
+            "frames": n_frames,
+            "tiles_changed_ratio": self.stats["tiles_changed"] / max(self.stats["tiles"], 1),
+            "last_tiles_changed_ratio": self.report.ratio if self.report is not None else None,
+            "reuse_ratio": self.stats["reused"] / max(n_checks, 1),
+            "avg_elapsed_ms": self.stats["elapsed"] / max(n_frames, 1) * 1000,
+        }
+
+    def __repr__(self):
+        metrics = self.metrics()
+        return (
+            f"ChangeDetector[tile: {self.tile}, changed: {metrics['tiles_changed_ratio']:.1%}, "
+            f"reused: {metrics['reuse_ratio']:.1%}, {metrics['avg_elapsed_ms']:.2f}ms/frame]"
+        )
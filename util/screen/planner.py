@@ -0,0 +1,128 @@
+import time
+
+import numpy as np
+
+from util.frame import Frame
+from util.proto import TwoDimArrayLike
+
+
+def merge_boxes(boxes: TwoDimArrayLike, overhead_pixels=16384) -> np.ndarray:
+    """
+    Greedily merge boxes into fewer, larger regions. Two boxes are merged when the extra area their bounding box
+    brings in is less than `overhead_pixels`, i.e. what a capture call costs besides copying pixels.
+
+    Args:
+        boxes: 2-D array-like
+            e.g. [[x1, y1, w1, h1], [x2, y2, w2, h2], ...]
+        overhead_pixels: int, default 16384
+            fixed cost of one capture call, measured in pixels
+
+    Returns:
+        np.ndarray, merged regions in shape of (M, 4), each row is (x, y, width, height)
+    """
+    boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    if len(boxes) == 0:
+        return boxes.astype(np.int32)
+    lt, rb = boxes[:, :2].copy(), boxes[:, :2] + boxes[:, 2:]
+
+    while len(lt) > 1:
+        u_lt = np.minimum(lt[:, None], lt[None, :])
+        u_rb = np.maximum(rb[:, None], rb[None, :])
+        area = np.prod(rb - lt, axis=1)
+        waste = np.prod(u_rb - u_lt, axis=2) - area[:, None] - area[None, :]
+        np.fill_diagonal(waste, np.iinfo(np.int64).max)
+        i, j = np.unravel_index(waste.argmin(), waste.shape)
+        if waste[i, j] >= overhead_pixels:
+            break
+        lt[i], rb[i] = u_lt[i, j], u_rb[i, j]
+        lt, rb = np.delete(lt, j, axis=0), np.delete(rb, j, axis=0)
+
+    return np.hstack((lt, rb - lt)).astype(np.int32)
+
+
+class CapturePlanner:
+    """
+    Capture only the regions recognizers read (probe points of eigens, rects of templates and OCR), instead of the
+    whole window.
+
+    Which way is cheaper depends on the backend, so both are timed by `calibrate`, and kept measured while capturing:
+    the cost of each mode is an exponential moving average, and the mode not in use is re-tried every `explore_every`
+    captures, in case the cost drifts (e.g. the window is resized or moved to another monitor).
+    """
+    MODES = ("regions", "full")
+
+    def __init__(self, boxes: TwoDimArrayLike, overhead_pixels=16384, padding=1, explore_every=200, smoothing=.1):
+        """
+
+        Args:
+            boxes: 2-D array-like
+                e.g. [[x1, y1, w1, h1], [x2, y2, w2, h2], ...], areas to read
+            overhead_pixels: int, default 16384
+                see `merge_boxes`
+            padding: int, default 1
+                pixels padded around each box
+            explore_every: int, default 200
+                re-try the mode not in use every n captures, 0 to disable
+            smoothing: float, default .1
+                weight of the latest cost in the moving average
+        """
+        boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+        boxes = np.hstack((np.maximum(boxes[:, :2] - padding, 0), boxes[:, 2:] + 2 * padding))
+        self.regions = merge_boxes(boxes, overhead_pixels)
+        self.explore_every = explore_every
+        self.smoothing = smoothing
+        self.costs = {mode: None for mode in self.MODES}
+        self.mode = "regions"
+        self.n_captures = 0
+
+    def clip(self, width, height) -> np.ndarray:
+        """regions clipped to the window"""
+        lt = np.minimum(self.regions[:, :2], (width - 1, height - 1))
+        rb = np.minimum(self.regions[:, :2] + self.regions[:, 2:], (width, height))
+        return np.hstack((lt, rb - lt))
+
+    def _update(self, mode, cost):
+        prev = self.costs[mode]
+        self.costs[mode] = cost if prev is None else prev + self.smoothing * (cost - prev)
+
+    def _capture(self, source, mode) -> Frame:
+        start = time.perf_counter()
+        if mode == "full":
+            frame = source.capture()
+        else:
+            frame = source.capture(self.clip(source.rect.width, source.rect.height))
+        self._update(mode, time.perf_counter() - start)
+        return frame
+
+    def _choose(self):
+        if all(cost is not None for cost in self.costs.values()):
+            self.mode = min(self.MODES, key=self.costs.get)
+
+    def calibrate(self, source, rounds=5):
+        """Time both modes on the source, and choose the cheaper one. Only grabs are taken, no tick is consumed."""
+        width, height = source.rect.width, source.rect.height
+        regions = self.clip(width, height)
+        for _ in range(rounds):
+            start = time.perf_counter()
+            source.grab(0, 0, width, height)
+            self._update("full", time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for region in regions:
+                source.grab(*region)
+            self._update("regions", time.perf_counter() - start)
+        self._choose()
+        return self
+
+    def capture(self, source) -> Frame:
+        self.n_captures += 1
+        mode = self.mode
+        if self.explore_every and self.n_captures % self.explore_every == 0:
+            mode = self.MODES[1 - self.MODES.index(self.mode)]
+        frame = self._capture(source, mode)
+        self._choose()
+        return frame
+
+    def __repr__(self):
+        costs = ", ".join(f"{m}: {c * 1000:.2f}ms" if c is not None else f"{m}: -" for m, c in self.costs.items())
+        return f"CapturePlanner[{len(self.regions)} region(s), mode: {self.mode}, {costs}]"
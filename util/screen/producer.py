@@ -0,0 +1,191 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from util.frame import Frame
+from util.screen.source import ScreenSource
+
+
+class FrameProducer:
+    """
+    Capture frames on a dedicated thread at a fixed interval, into a ring buffer of the latest frames. Consumers take
+    the newest frame without blocking (`latest`), or wait for one newer than what they have seen (`wait_newer`), so the
+    window is captured once per interval, no matter how many consumers there are.
+
+    Everything touching the capture backend (e.g. the DC of a win32 window) should be run on the producer thread, see
+    `submit` and `ProducerScreenSource`.
+    """
+
+    def __init__(self, capture: Callable[..., Frame], interval=.5, capacity=4, name="AutoGame[FrameProducer]"):
+        """
+
+        Args:
+            capture: Callable[..., Frame]
+                function to capture a frame, called with keyword `full`, on the producer thread only
+            interval: float, optional, default .5
+                seconds between two captures, None to capture on demand only
+            capacity: int, default 4
+                number of latest frames kept
+            name: str
+                name of the thread
+        """
+        self.capture = capture
+        self.interval = interval
+        self.frames = deque(maxlen=capacity)
+        self.cond = threading.Condition()
+        self.requests = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.running = False
+        self.last_tick = 0.
+        self.n_captures = 0
+
+    @property
+    def is_producer_thread(self) -> bool:
+        return threading.current_thread() is self.thread
+
+    def start(self):
+        self.running = True
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self.running = False
+        self.requests.put(None)  # wake the thread up
+        if self.thread.is_alive() and not self.is_producer_thread:
+            self.thread.join(timeout)
+
+    def set_interval(self, interval: Optional[float]):
+        """Change the interval, effective right away rather than after the pending tick."""
+        if interval != self.interval:
+            self.interval = interval
+            self.requests.put(None)  # wake the thread up
+
+    def _run(self):
+        while self.running:
+            timeout = None if self.interval is None else max(self.last_tick + self.interval - time.time(), 0)
+            try:
+                request = self.requests.get(timeout=timeout)
+            except queue.Empty:
+                self._tick()
+                continue
+            if request is not None:
+                self._execute(*request)
+
+    @staticmethod
+    def _execute(future: Future, func, args, kwargs):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(func(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+    def _tick(self, full=False) -> Optional[Frame]:
+        self.last_tick = time.time()
+        try:
+            frame = self.capture(full=full)
+        except Exception as e:  # keep producing, e.g. the window is minimized for a moment
+            print(f"failed to capture: {e}")
+            return None
+
+        with self.cond:
+            self.frames.append(frame)
+            self.n_captures += 1
+            self.cond.notify_all()
+        return frame
+
+    def submit(self, func, *args, **kwargs) -> Future:
+        """Run the function on the producer thread, between two ticks."""
+        future = Future()
+        if self.is_producer_thread or not self.running:
+            self._execute(future, func, args, kwargs)
+        else:
+            self.requests.put((future, func, args, kwargs))
+        return future
+
+    def call(self, func, *args, **kwargs):
+        """Run the function on the producer thread, and wait for the result."""
+        return self.submit(func, *args, **kwargs).result()
+
+    def capture_now(self, full=False) -> Frame:
+        """Capture a frame right now instead of waiting for the next tick, the frame is shared with other consumers."""
+        if (frame := self.call(self._tick, full=full)) is None:
+            raise RuntimeError("failed to capture a frame")
+        return frame
+
+    def latest(self) -> Optional[Frame]:
+        with self.cond:
+            return self.frames[-1] if self.frames else None
+
+    def wait_newer(self, frame_id=0, timeout=None) -> Optional[Frame]:
+        """
+        Wait for a frame newer than the given one.
+
+        Args:
+            frame_id: int, default 0
+                id of the latest frame seen by the consumer
+            timeout: float, optional
+                seconds to wait, default forever
+
+        Returns:
+            Frame, or None if timed out
+        """
+        with self.cond:
+            if self.cond.wait_for(lambda: self.frames and self.frames[-1].frame_id > frame_id, timeout):
+                return self.frames[-1]
+        return None
+
+    def history(self) -> List[Frame]:
+        """frames in the ring buffer, from the oldest to the newest"""
+        with self.cond:
+            return list(self.frames)
+
+    def __repr__(self):
+        return f"FrameProducer[interval: {self.interval}s, captured: {self.n_captures}]"
+
+
+class ProducerScreenSource(ScreenSource):
+    """
+    Route capturing calls of a source to the thread of a `FrameProducer`, so that the backend is accessed by one
+    thread only. Inputs are sent from the calling thread directly.
+    """
+
+    def __init__(self, source: ScreenSource, producer: FrameProducer):
+        self.source = source
+        self.producer = producer
+
+    @property
+    def rect(self):
+        return self.source.rect
+
+    def grab(self, x, y, width, height) -> np.ndarray:
+        return self.producer.call(self.source.grab, x, y, width, height)
+
+    def screenshot(self, x, y, width, height) -> np.ndarray:
+        return self.producer.call(self.source.screenshot, x, y, width, height)
+
+    def capture(self, regions=None) -> Frame:
+        return self.producer.call(self.source.capture, regions)
+
+    def pixel(self, x, y) -> Tuple[int, int, int]:
+        return self.producer.call(self.source.pixel, x, y)
+
+    def left_click(self, coordinate: Tuple[int, int]):
+        self.source.left_click(coordinate)
+
+    def left_drag(self, start, end, duration, interval=.05):
+        self.source.left_drag(start, end, duration, interval=interval)
+
+    def close(self):
+        self.producer.call(self.source.close)
+
+    def __getattr__(self, item):  # e.g. hwnd of win32 sources
+        return getattr(self.source, item)
+
+    def __repr__(self):
+        return f"{self.source}"
@@ -0,0 +1,250 @@
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from util.frame import Frame
+from util.screen.change import tiles_max_diff
+
+
+class SessionRecorder:
+    """
+    Record frames a window saw, and actions taken on it, into a directory:
+
+        meta.json           size of frames, and how they are stored
+        index.jsonl         one line per frame or event, in order of time
+        frames_00000.npy    chunks of frames, memory-mapped, in shape of (chunk_size, height, width, 3), BGR
+        patches_00000.npy   chunks of changed tiles, in shape of (chunk_size, tile, tile, 3), delta mode only
+
+    Frames holding some regions only are pasted onto the last frame recorded, so every recorded frame is complete.
+    With `delta` on, only every `keyframe_interval`-th frame is stored whole, others store the tiles changed since
+    the previous frame. Frames and events written after closing are dropped.
+    """
+    VERSION = 1
+
+    def __init__(self, path, chunk_size=64, delta=False, tile=64, threshold=0, keyframe_interval=60):
+        """
+
+        Args:
+            path: str, or Path
+                directory to record into, created if not exists, a session recorded there before is overwritten
+            chunk_size: int, default 64
+                frames (or patches) per chunk file
+            delta: bool, default False
+                store changed tiles instead of whole frames, except keyframes
+            tile: int, default 64
+                width and height of a tile, delta mode only
+            threshold: int, default 0
+                max difference of a channel seen as unchanged, delta mode only
+            keyframe_interval: int, default 60
+                store a whole frame every n frames, delta mode only
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.chunk_size = chunk_size
+        self.delta = delta
+        self.tile = tile
+        self.threshold = threshold
+        self.keyframe_interval = keyframe_interval
+
+        self.lock = threading.Lock()
+        self.size = None
+        self.canvas: np.ndarray = None
+        self.chunks: Dict[str, tuple] = {}  # kind -> (chunk no, memmap)
+        self.counts = {"frames": 0, "patches": 0}
+        self.n_frames = 0
+        self.closed = False
+        self.index_file = open(self.path / "index.jsonl", "w", encoding="utf-8")
+
+    def _write_meta(self):
+        meta = {
+            "version": self.VERSION, "size": self.size, "chunk_size": self.chunk_size, "delta": self.delta,
+            "tile": self.tile,
+        }
+        (self.path / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+
+    def _slot(self, kind, shape):
+        """next free slot of the kind, as (chunk no, memmap, index in chunk)"""
+        chunk_no, idx = divmod(self.counts[kind], self.chunk_size)
+        if (chunk := self.chunks.get(kind)) is None or chunk[0] != chunk_no:
+            if chunk is not None:
+                chunk[1].flush()
+            file = self.path / f"{kind}_{chunk_no:05d}.npy"
+            chunk = self.chunks[kind] = (
+                chunk_no, np.lib.format.open_memmap(file, mode="w+", dtype=np.uint8, shape=(self.chunk_size, *shape))
+            )
+        self.counts[kind] += 1
+        return chunk_no, chunk[1], idx
+
+    def _write_index(self, record: dict):
+        self.index_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.index_file.flush()
+
+    def _paste(self, frame: Frame) -> np.ndarray:
+        """paste regions of the frame onto the canvas, return the boxes pasted"""
+        regions = frame.regions
+        for (x, y, width, height), image in zip(regions, frame.images):
+            self.canvas[y: y + height, x: x + width] = image[:, :, :3]
+        return regions
+
+    def _changed_tiles(self, canvas_prev: np.ndarray, regions: np.ndarray) -> np.ndarray:
+        """tiles changed within the regions, in shape of (N, 2), row as (tile y, tile x)"""
+        tile, (width, height) = self.tile, self.size
+        changed = np.zeros((-(-height // tile), -(-width // tile)), dtype=bool)
+        for x, y, w, h in regions:
+            diff = tiles_max_diff(canvas_prev[y: y + h, x: x + w], self.canvas[y: y + h, x: x + w], x, y, tile)
+            ty, tx = y // tile, x // tile
+            changed[ty: ty + diff.shape[0], tx: tx + diff.shape[1]] |= diff > self.threshold
+        return np.argwhere(changed)
+
+    def write_frame(self, frame: Frame):
+        with self.lock:
+            if self.closed:
+                return
+            if self.size is None:
+                self.size = list(frame.size)
+                self.canvas = np.zeros((frame.height, frame.width, 3), dtype=np.uint8)
+                self._write_meta()
+            elif list(frame.size) != self.size:
+                raise ValueError(f"frame size changed from {self.size} to {frame.size}")
+
+            is_key = not self.delta or self.n_frames % self.keyframe_interval == 0
+            canvas_prev = None if is_key else self.canvas.copy()
+            regions = self._paste(frame)
+            record = {"type": "frame", "frame_id": frame.frame_id, "t": frame.timestamp, "key": is_key}
+
+            if is_key:
+                chunk_no, chunk, idx = self._slot("frames", self.canvas.shape)
+                chunk[idx] = self.canvas
+                record["slot"] = [chunk_no, idx]
+            else:
+                tile, patches = self.tile, []
+                for ty, tx in self._changed_tiles(canvas_prev, regions):
+                    patch = self.canvas[ty * tile: (ty + 1) * tile, tx * tile: (tx + 1) * tile]
+                    chunk_no, chunk, idx = self._slot("patches", (tile, tile, 3))
+                    chunk[idx, :patch.shape[0], :patch.shape[1]] = patch
+                    patches.append([int(ty), int(tx), chunk_no, idx])
+                record["patches"] = patches
+
+            self._write_index(record)
+            self.n_frames += 1
+
+    def write_event(self, event_type: str, **kwargs):
+        """
+        Args:
+            event_type: str
+                e.g. "click", "drag", "scene"
+            **kwargs:
+                JSON serializable fields of the event
+        """
+        with self.lock:
+            if self.closed:
+                return
+            self._write_index({"type": event_type, "t": time.time(), **kwargs})
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            for _, chunk in self.chunks.values():
+                chunk.flush()
+            self.chunks.clear()
+            self.index_file.close()
+
+    def __repr__(self):
+        return f"SessionRecorder[{self.path}, {self.n_frames} frame(s), delta: {self.delta}]"
+
+
+class SessionReader:
+    """
+    Random access to a session recorded by `SessionRecorder`, chunks are memory-mapped, and read only when frames
+    of them are asked for.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.meta = json.loads((self.path / "meta.json").read_text(encoding="utf-8"))
+        self.width, self.height = self.meta["size"]
+        self.tile = self.meta["tile"]
+
+        self.records, self.events = [], []
+        with open(self.path / "index.jsonl", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                (self.records if record["type"] == "frame" else self.events).append(record)
+        self.frame_ids = np.array([r["frame_id"] for r in self.records], dtype=np.int64)
+        self._indices = {frame_id: idx for idx, frame_id in enumerate(self.frame_ids.tolist())}
+        self.timestamps = np.array([r["t"] for r in self.records], dtype=np.float64)
+        self.keys = np.flatnonzero([r["key"] for r in self.records])
+        self._chunks = {}
+
+    def __len__(self):
+        return len(self.records)
+
+    def _chunk(self, kind, chunk_no) -> np.ndarray:
+        if (chunk := self._chunks.get(key := (kind, chunk_no))) is None:
+            chunk = self._chunks[key] = np.load(self.path / f"{kind}_{chunk_no:05d}.npy", mmap_mode="r")
+        return chunk
+
+    def __getitem__(self, index) -> np.ndarray:
+        """BGR image of the index-th frame"""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"frame index {index} out of range")
+
+        key = self.keys[np.searchsorted(self.keys, index, side="right") - 1]
+        chunk_no, idx = self.records[key]["slot"]
+        image = self._chunk("frames", chunk_no)[idx]
+        if key == index:
+            return image
+
+        image, tile = np.array(image), self.tile
+        for record in self.records[key + 1: index + 1]:
+            for ty, tx, chunk_no, idx in record["patches"]:
+                dst = image[ty * tile: (ty + 1) * tile, tx * tile: (tx + 1) * tile]
+                dst[:] = self._chunk("patches", chunk_no)[idx, :dst.shape[0], :dst.shape[1]]
+        return image
+
+    def index_of(self, frame_id: int) -> int:
+        if (idx := self._indices.get(frame_id)) is None:
+            raise KeyError(f"frame {frame_id} not recorded")
+        return idx
+
+    def index_at(self, timestamp: float) -> int:
+        """index of the latest frame captured at or before the time"""
+        if (idx := int(np.searchsorted(self.timestamps, timestamp, side="right")) - 1) < 0:
+            raise KeyError(f"no frame recorded before {timestamp}")
+        return idx
+
+    def by_frame_id(self, frame_id: int) -> np.ndarray:
+        return self[self.index_of(frame_id)]
+
+    def at(self, timestamp: float) -> np.ndarray:
+        return self[self.index_at(timestamp)]
+
+    def iter_events(self, start: float = None, end: float = None, types: Iterable[str] = None) -> Iterable[dict]:
+        """events within [start, end), of given types only if specified"""
+        types = None if types is None else set(types)
+        for event in self.events:
+            if (start is not None and event["t"] < start) or (end is not None and event["t"] >= end):
+                continue
+            if types is None or event["type"] in types:
+                yield event
+
+    def events_between(self, index_start: int, index_end: int, types: Iterable[str] = None) -> List[dict]:
+        """events happened between two frames, e.g. what was done after seeing the first one"""
+        return list(self.iter_events(self.timestamps[index_start], self.timestamps[index_end], types))
+
+    @property
+    def duration(self) -> Optional[float]:
+        return float(self.timestamps[-1] - self.timestamps[0]) if len(self) > 0 else None
+
+    def __repr__(self):
+        return f"SessionReader[{self.path}, {len(self)} frame(s), {len(self.events)} event(s)]"
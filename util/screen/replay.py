@@ -0,0 +1,129 @@
+import time
+from pathlib import Path
+from typing import Tuple, Union, List
+
+import cv2
+import numpy as np
+
+from util.datatypes import Rect
+from util.frame import Frame
+from util.screen.source import ScreenSource
+
+
+def load_image(file) -> np.ndarray:
+    """Load a BGR image from a .png or .npy file"""
+    if (file := Path(file)).suffix == ".npy":
+        return np.load(file, mmap_mode="r")
+    return cv2.imread(file.as_posix())
+
+
+class ReplayScreenSource(ScreenSource):
+    """
+    Serve frames from files instead of a real window, so that recognizers, parsers and tasks can run headless.
+
+    Frames can be
+        - a directory of .png/.npy files, which are replayed in order of file name;
+        - a .npy file of stacked frames in shape of (N, height, width, 3), e.g. a recorded session;
+        - a list of files or arrays;
+        - a sequence of arrays read lazily, e.g. `SessionReader` of a recorded session.
+
+    Frames are kept in BGR, the same as what `cv2.imread` reads, and what frames are made of.
+
+    Inputs are not sent anywhere, but kept in `inputs` for inspection.
+    """
+    ADVANCE_ON = (None, "capture", "input")
+
+    def __init__(self, frames: Union[str, Path, List], advance_on="capture", loop=True, preload=False):
+        """
+
+        Args:
+            frames: str, Path, or list
+            advance_on: str, optional {None, "capture", "input"}, default "capture"
+                when to move on to the next frame: every `capture` of a tick (the first capture serves the first
+                frame), every input, or only by calling `next_frame` manually.
+            loop: bool, default True
+                whether to restart from the first frame after the last one
+            preload: bool, default False
+                whether to decode all frames beforehand, so that replaying doesn't pay for decoding
+        """
+        if advance_on not in self.ADVANCE_ON:
+            raise ValueError(f"advance_on should be one of {self.ADVANCE_ON}")
+        self.advance_on = advance_on
+        self.loop = loop
+
+        self.frames = self._collect(frames)
+        if len(self.frames) == 0:
+            raise ValueError(f"no frame found in {frames}")
+        if preload:
+            self.frames = [self._decode(frame) for frame in self.frames]
+
+        self.index = 0
+        self.image = self._decode(self.frames[0])
+        self.rect = Rect(0, 0, self.image.shape[1], self.image.shape[0])
+        self.inputs = []
+        self._has_captured = False
+
+    @staticmethod
+    def _collect(frames) -> List:
+        if isinstance(frames, (str, Path)):
+            if (path := Path(frames)).is_dir():
+                return sorted((f for f in path.iterdir() if f.suffix in (".png", ".npy")), key=lambda f: f.name)
+            if (stacked := load_image(path)).ndim == 4:
+                return list(stacked)
+            return [stacked]
+        if hasattr(frames, "__getitem__") and hasattr(frames, "__len__"):
+            return frames
+        return list(frames)
+
+    @staticmethod
+    def _decode(frame) -> np.ndarray:
+        if isinstance(frame, np.ndarray):
+            return frame
+        return load_image(frame)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def seek(self, index):
+        self.index = index
+        self.image = self._decode(self.frames[index])
+        if self.image.shape[1::-1] != (self.rect.width, self.rect.height):  # e.g. the screen recorded was rotated
+            self.rect = Rect(0, 0, self.image.shape[1], self.image.shape[0])
+
+    def next_frame(self) -> bool:
+        """Move on to the next frame, return False if there is no more frame to replay."""
+        if (index := self.index + 1) >= len(self.frames):
+            if not self.loop:
+                return False
+            index = 0
+        self.seek(index)
+        return True
+
+    def capture(self, regions=None) -> Frame:
+        if self.advance_on == "capture" and self._has_captured:
+            self.next_frame()
+        self._has_captured = True
+        return super().capture(regions)
+
+    def grab(self, x, y, width, height) -> np.ndarray:
+        return self.image[y: y + height, x: x + width]
+
+    def screenshot(self, x, y, width, height) -> np.ndarray:
+        return cv2.cvtColor(np.ascontiguousarray(self.grab(x, y, width, height)), cv2.COLOR_BGR2RGB)
+
+    def pixel(self, x, y) -> Tuple[int, int, int]:
+        return tuple(self.image[y, x, 2::-1])
+
+    def _on_input(self, *event):
+        self.inputs.append((time.time(), *event))
+        if self.advance_on == "input":
+            self.next_frame()
+
+    def left_click(self, coordinate: Tuple[int, int]):
+        self._on_input("click", tuple(int(v) for v in coordinate))
+
+    def left_drag(self, start, end, duration, interval=.05):
+        self._on_input("drag", tuple(int(v) for v in start), tuple(int(v) for v in end), duration)
+
+    def __repr__(self):
+        return f"Replay[{self.index + 1}/{len(self)}, {self.rect.width:<4}*{self.rect.height:<4}]"
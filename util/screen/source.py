@@ -0,0 +1,70 @@
+from typing import Tuple
+
+import numpy as np
+
+from util.datatypes import Rect
+from util.frame import Frame
+from util.proto import TwoDimArrayLike
+
+
+class ScreenSource:
+    """
+    Backend of a window, where frames are captured from and inputs are sent to. Implementations can be swapped
+    without touching the recognition or task code, e.g. a real win32 window or frames replayed from files.
+    """
+    rect: Rect = None
+
+    def screenshot(self, x, y, width, height) -> np.ndarray:
+        """
+        Args:
+            x: int
+                left-top x coordinate
+            y: int
+                left-top y coordinate
+            width: int
+                width to capture
+            height: int
+                height to capture
+
+        Returns:
+            np.ndarray, RGB image in shape of (height, width, 3)
+        """
+        raise NotImplementedError
+
+    def grab(self, x, y, width, height) -> np.ndarray:
+        """
+        Same as `screenshot`, but in native layout of the source, i.e. BGRX or BGR, which frames are made of.
+
+        Returns:
+            np.ndarray, BGRX or BGR image in shape of (height, width, 4) or (height, width, 3)
+        """
+        return np.ascontiguousarray(self.screenshot(x, y, width, height)[:, :, ::-1])
+
+    def capture(self, regions: TwoDimArrayLike = None) -> Frame:
+        """
+        Capture the frame of a tick, it's where replaying sources move on to the next frame.
+
+        Args:
+            regions: 2-D array-like, optional
+                e.g. [[x1, y1, w1, h1], [x2, y2, w2, h2], ...], regions to capture, default the whole window
+
+        Returns:
+            Frame
+        """
+        size = (self.rect.width, self.rect.height)
+        if regions is None:
+            return Frame(self.grab(0, 0, *size), source=self)
+        return Frame.from_regions(size, regions, [self.grab(*region) for region in regions], source=self)
+
+    def pixel(self, x, y) -> Tuple[int, int, int]:
+        """RGB of a single point"""
+        raise NotImplementedError
+
+    def left_click(self, coordinate: Tuple[int, int]):
+        raise NotImplementedError
+
+    def left_drag(self, start, end, duration, interval=.05):
+        raise NotImplementedError
+
+    def close(self):
+        pass
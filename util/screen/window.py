@@ -0,0 +1,279 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, List, Tuple
+
+import numpy as np
+from PIL import Image
+
+from util.datatypes import Rect, parse_tuple_rgb2bgr
+from util.frame import Frame
+from util.screen.change import ChangeDetector
+from util.screen.planner import CapturePlanner
+from util.screen.producer import FrameProducer, ProducerScreenSource
+from util.screen.recorder import SessionRecorder
+from util.screen.source import ScreenSource
+
+
+def get_pixel_from_image(image: np.ndarray, x, y, as_int=False):
+    if as_int:
+        return parse_tuple_rgb2bgr(image[y, x])
+    return image[y, x]
+
+
+class ScreenUtilityMixin:
+    def __init__(self, source: ScreenSource):
+        self.source = source
+
+        self.capture_planner: CapturePlanner = None
+        self.producer: FrameProducer = None
+        self.change_detector: ChangeDetector = None
+        self.recorder: SessionRecorder = None
+        self.frame: Frame = None
+        self.frame_max_age = .5
+        self.frames_valid_since = 0.
+        self._frame_pinned = threading.local()
+        self.input_listeners: List[Callable[[], None]] = []
+
+    @property
+    def rect(self) -> Rect:
+        return self.source.rect
+
+    def close_session(self):
+        self.stop_producer()
+        self.stop_recording()
+        self.source.close()
+
+    def screenshot(self, x=0, y=0, width=None, height=None, form="array", save_path=None):
+        """
+
+        Args:
+            x: int
+            y: int
+            width: int, optional
+                default width of the window
+            height: int, optional
+                default height of the window
+            form: str, optional {"array", "image"}
+            save_path: str
+
+        Returns:
+            PIL.Image, or np.ndarray
+        """
+        image = self.source.screenshot(x, y, width or self.rect.width, height or self.rect.height)
+
+        if form == "image" or save_path:
+            image_pil = Image.fromarray(np.ascontiguousarray(image))
+            if save_path:
+                image_pil.save(save_path)
+            if form == "image":
+                return image_pil
+        return image
+
+    def grab_frame(self, full=False) -> Frame:
+        """
+        Capture a new frame, which becomes the latest snapshot.
+
+        Args:
+            full: bool, default False
+                capture the whole window even if there is a capture planner
+
+        Returns:
+            Frame
+        """
+        if self.producer is not None:
+            frame = self.producer.capture_now(full=full)
+        else:
+            frame = self._capture(full=full)
+        self.frame = frame
+        return frame
+
+    def _capture(self, full=False) -> Frame:
+        if full or self.capture_planner is None:
+            frame = self.source.capture()
+        else:
+            frame = self.capture_planner.capture(self.source)
+        if self.change_detector is not None:
+            self.change_detector.update(frame)
+        if (recorder := self.recorder) is not None:  # may be stopped by another thread meanwhile
+            recorder.write_frame(frame)
+        return frame
+
+    def start_recording(self, path, **kwargs) -> SessionRecorder:
+        """
+        Record every frame captured and every input sent from now on, see `SessionRecorder`.
+
+        Args:
+            path: str, or Path
+                directory to record into
+            **kwargs:
+                arguments of `SessionRecorder`
+
+        Returns:
+            SessionRecorder
+        """
+        self.stop_recording()
+        self.recorder = SessionRecorder(path, **kwargs)
+        return self.recorder
+
+    def stop_recording(self):
+        if (recorder := self.recorder) is None:
+            return
+        self.recorder = None
+        recorder.close()
+
+    def record_event(self, event_type: str, **kwargs):
+        if (recorder := self.recorder) is not None:
+            recorder.write_event(event_type, **kwargs)
+
+    def start_producer(self, interval=.5, capacity=4) -> FrameProducer:
+        """
+        Capture frames on a dedicated thread from now on, see `FrameProducer`. Capturing calls of `source` are routed to
+        the thread too, so that the backend is accessed by one thread only.
+
+        Args:
+            interval: float, default .5
+                seconds between two captures
+            capacity: int, default 4
+                number of latest frames kept
+
+        Returns:
+            FrameProducer
+        """
+        if self.producer is not None:
+            return self.producer
+
+        source = self.source
+
+        def capture(full=False):
+            frame = self._capture(full=full)
+            frame.source = self.source  # areas filled on demand are captured on the producer thread as well
+            return frame
+
+        self.producer = FrameProducer(capture, interval=interval, capacity=capacity)
+        self.source = ProducerScreenSource(source, self.producer)
+        self.producer.start()
+        return self.producer
+
+    def stop_producer(self):
+        if (producer := self.producer) is None:
+            return
+        self.producer = None
+        producer.stop()
+        self.source = self.source.source
+
+    def snapshot(self, max_age=None) -> Frame:
+        """
+        Get the frame of current tick. The frame pinned to current thread is used if there is one, otherwise the latest
+        frame (of the producer, if started) is reused unless it's older than `max_age`, or it was captured before the
+        last input.
+
+        Args:
+            max_age: float, optional
+                max age in seconds of the frame to reuse, default `frame_max_age`
+
+        Returns:
+            Frame
+        """
+        if (frame := getattr(self._frame_pinned, "frame", None)) is not None:
+            return frame
+
+        max_age = self.frame_max_age if max_age is None else max_age
+        frame = self.frame if self.producer is None else self.producer.latest()
+        if frame is None or frame.timestamp < self.frames_valid_since or frame.age > max_age:
+            frame = self.grab_frame()
+        return frame
+
+    @contextmanager
+    def pin_frame(self, frame: Frame = None):
+        """Make `snapshot` return the given frame (or a new one) within the context, for current thread only."""
+        frame_prev = getattr(self._frame_pinned, "frame", None)
+        self._frame_pinned.frame = frame = frame or self.grab_frame()
+        try:
+            yield frame
+        finally:
+            self._frame_pinned.frame = frame_prev
+
+    def invalidate_frames(self):
+        """Frames captured before now are outdated, e.g. after clicking on the window."""
+        self.frames_valid_since = time.time()
+
+    def notify_input(self):
+        """Tell listeners an input was just sent, e.g. to watch the screen closely for a while."""
+        for listener in list(self.input_listeners):
+            listener()
+
+    def pixel_from_window(self, x, y, as_int=False):
+        """
+
+        Args:
+            x: int
+            y: int
+            as_int: bool, default False
+                If true, return rgb as an integer, of which the binary is 24-bit.
+
+        Returns:
+
+        """
+        rgb = self.source.pixel(x, y)
+        if as_int:
+            return parse_tuple_rgb2bgr(rgb)
+        return rgb
+
+    @staticmethod
+    def pixel_from_image(image: np.ndarray, x, y, as_int=False):
+        return get_pixel_from_image(image, x, y, as_int=as_int)
+
+
+class MouseMixin:
+    def __init__(self, source: ScreenSource):
+        self.source = source
+
+    def left_click(self, coordinate: Tuple[int, int], sleep=0):
+        self.source.left_click(coordinate)
+
+        if sleep > 0:
+            time.sleep(sleep)
+
+    def left_drag(self, start, end, duration, interval=.05, sleep=0):
+        """
+
+        Args:
+            start: Tuple[int, int]
+                start position;
+            end: Tuple[int, int]
+                end position;
+            duration: Union[float, int]
+                total time to execute drag;
+            interval: Union[float, int]
+                interval to move mouse(should less than duration)
+            sleep: Union[float, int]
+
+        Returns:
+
+        """
+        self.source.left_drag(start, end, duration, interval=interval)
+
+        if sleep > 0:
+            time.sleep(sleep)
+
+
+class ScreenWindow(ScreenUtilityMixin, MouseMixin):
+    def __init__(self, source: ScreenSource):
+        ScreenUtilityMixin.__init__(self, source)
+        MouseMixin.__init__(self, source)
+
+    def left_click(self, coordinate: Tuple[int, int], sleep=0):
+        self.record_event("click", xy=[int(v) for v in coordinate])
+        super().left_click(coordinate, sleep=sleep)
+        self.invalidate_frames()
+        self.notify_input()
+
+    def left_drag(self, start, end, duration, interval=.05, sleep=0):
+        self.record_event("drag", start=[int(v) for v in start], end=[int(v) for v in end], duration=duration)
+        super().left_drag(start, end, duration, interval=interval, sleep=sleep)
+        self.invalidate_frames()
+        self.notify_input()
+
+    def __repr__(self):
+        return f"{self.source}"
@@ -1,21 +1,19 @@
+import ctypes
+import threading
 import time
-from typing import Optional, Tuple
+from collections import OrderedDict
+from typing import Tuple
 
 import cv2 as cv
 import numpy as np
 import pywintypes
 from PIL import Image
 
+from util.datatypes import Rect, parse_int_bgr2rgb, parse_tuple_rgb2bgr
+from util.frame import Frame, FramePool
+from util.screen.source import ScreenSource
+from util.screen.window import ScreenWindow, get_pixel_from_image
 from util.win32 import T_PyCDC, win32api, win32gui, win32con, win32ui
-from util.win32.datatypes import Rect
-
-
-def parse_int_bgr2rgb(bgr_int: int) -> Tuple[int, int, int]:
-    return bgr_int & 0xff, (bgr_int >> 8) & 0xff, (bgr_int >> 16) & 0xff
-
-
-def parse_tuple_rgb2bgr(rgb_tuple: Tuple[int, int, int]):
-    return rgb_tuple[0] | rgb_tuple[1] << 8 | rgb_tuple[2] << 16
 
 
 def get_pixel_from_hwnd(hwnd_dc: int, x, y, as_int=False):
@@ -25,12 +23,6 @@ def get_pixel_from_hwnd(hwnd_dc: int, x, y, as_int=False):
     return parse_int_bgr2rgb(bgr_int)
 
 
-def get_pixel_from_image(image: np.ndarray, x, y, as_int=False):
-    if as_int:
-        parse_tuple_rgb2bgr(image[y, x])
-    return image[y, x]
-
-
 def create_data_bitmap(x, y, width, height, dc: T_PyCDC, cdc: T_PyCDC = None):
     """
 
@@ -158,7 +150,7 @@ def screenshot_by_hwnd(hwnd, x, y, width, height, form="array", save_path=None)
     DC = win32ui.CreateDCFromHandle(hwDC)
     cDC = DC.CreateCompatibleDC()
 
-    img = screenshot(DC, cDC, width, height, x, y, form, save_path)
+    img = screenshot(DC, cDC, x, y, width, height, form, save_path)
 
     DC.DeleteDC()
     cDC.DeleteDC()
@@ -166,80 +158,223 @@ def screenshot_by_hwnd(hwnd, x, y, width, height, form="array", save_path=None)
     return img
 
 
-class ScreenUtilityMixin:
-    def __init__(self, hwnd):
+class CaptureSession:
+    """
+    Long-lived capture resources of a window, i.e. the window DC, a compatible DC, and compatible bitmaps to BitBlt
+    into. Bitmaps are cached by size, so capturing the whole window (or the same sub-rectangle) again skips the DC and
+    bitmap setup/teardown. Everything is rebuilt once the size of the window changes.
+
+    """
+
+    def __init__(self, hwnd, max_bitmaps=32):
         self.hwnd = hwnd
-        self.hw_dc: Optional[int] = None
+        self.max_bitmaps = max_bitmaps
+        self.size: Tuple[int, int] = None
+        self.hw_dc: int = None
         self.dc: T_PyCDC = None
         self.cdc: T_PyCDC = None
+        self.bitmaps = OrderedDict()
+        self.lock = threading.RLock()
+
+    @property
+    def is_open(self):
+        return self.dc is not None
 
-    def create_dc(self):
+    def open(self, width, height):
         self.hw_dc = win32gui.GetWindowDC(self.hwnd)  # use ReleaseDC after calling
         self.dc = win32ui.CreateDCFromHandle(self.hw_dc)  # use DeleteDC after calling
         self.cdc = self.dc.CreateCompatibleDC()  # use DeleteDC after calling
+        self.size = (width, height)
+
+    def close(self):
+        with self.lock:
+            if not self.is_open:
+                return
+            try:
+                self.cdc.DeleteDC()  # delete cdc first, so that no bitmap is selected when deleting them
+                for bitmap in self.bitmaps.values():
+                    win32gui.DeleteObject(bitmap.GetHandle())
+                self.dc.DeleteDC()
+                win32gui.ReleaseDC(self.hwnd, self.hw_dc)
+            except win32ui.error as e:
+                print(f"{e}: dc: {self.dc}, cdc: {self.cdc}")
+            self.bitmaps.clear()
+            self.hw_dc = self.dc = self.cdc = self.size = None
+
+    def ensure(self, width, height):
+        """
+        Open the session if it's not opened yet, or rebuild it if the window size has changed.
+
+        Args:
+            width: int
+                width of the window
+            height: int
+                height of the window
+
+        Returns:
 
-    def release_dc(self):
-        try:
-            self.dc.DeleteDC()
-            self.cdc.DeleteDC()
-            win32gui.ReleaseDC(self.hwnd, self.hw_dc)
-        except win32ui.error as e:
-            print(f"{e}: dc: {self.dc}, cdc: {self.cdc}")
-
-    def screenshot(self, x=0, y=0, width=None, height=None, form="array", save_path=None):
-        self.create_dc()
-        result = screenshot(self.dc, self.cdc, x, y, width, height, form, save_path)
-        self.release_dc()
-        return result
-
-    def pixel_from_window(self, x, y, as_int=False):
         """
+        with self.lock:
+            if self.size != (width, height):
+                self.close()
+                self.open(width, height)
+
+    def bitmap(self, width, height):
+        """
+        Get a compatible bitmap of given size, create and cache it if necessary.
+
+        Args:
+            width: int
+            height: int
+
+        Returns:
+            PyCBitmap
+        """
+        if (bitmap := self.bitmaps.get(key := (width, height))) is None:
+            bitmap = self.bitmaps[key] = win32ui.CreateBitmap()
+            bitmap.CreateCompatibleBitmap(self.dc, width, height)
+            if len(self.bitmaps) > self.max_bitmaps:  # the oldest one is never the one currently selected
+                _, bitmap_evicted = self.bitmaps.popitem(last=False)
+                win32gui.DeleteObject(bitmap_evicted.GetHandle())
+        else:
+            self.bitmaps.move_to_end(key)
+        return bitmap
+
+    def grab(self, x, y, width, height, form="array", save_path=None):
+        """
+
+        Args:
+            x: int
+                left-top x coordinate of source
+            y: int
+                left-top y coordinate of source
+            width: int
+                width to capture
+            height: int
+                height to capture
+            form: str, optional {"array", "image"}
+            save_path: str
+
+        Returns:
+            PIL.Image, or np.ndarray
+        """
+        with self.lock:
+            data_bitmap = self.bitmap(width, height)
+            self.cdc.SelectObject(data_bitmap)
+            self.cdc.BitBlt((0, 0), (width, height), self.dc, (x, y), win32con.SRCCOPY)
+
+            image = image_from_bitmap(data_bitmap, form=form)
+
+            if save_path:
+                data_bitmap.SaveBitmapFile(self.cdc, save_path)
+        return image
+
+    def grab_into(self, x, y, width, height, out: np.ndarray) -> np.ndarray:
+        """
+        Capture into a preallocated BGRX buffer, the bits are copied from the bitmap directly, without going through
+        bytes or converting colour.
 
         Args:
             x: int
             y: int
-            as_int: bool, default False
-                If true, return rgb as an integer, of which the binary is 24-bit.
+            width: int
+            height: int
+            out: np.ndarray
+                C-contiguous uint8 array in shape of (height, width, 4)
 
         Returns:
+            np.ndarray, `out`
+        """
+        with self.lock:
+            data_bitmap = self.bitmap(width, height)
+            self.cdc.SelectObject(data_bitmap)
+            self.cdc.BitBlt((0, 0), (width, height), self.dc, (x, y), win32con.SRCCOPY)
+            if not ctypes.windll.gdi32.GetBitmapBits(data_bitmap.GetHandle(), out.nbytes, out.ctypes.data):
+                raise win32ui.error("GetBitmapBits failed")
+        return out
+
 
+class Win32ScreenSource(ScreenSource):
+    """Capture from a win32 window with a persistent `CaptureSession`, and send inputs by `PostMessage`."""
+
+    def __init__(self, hwnd):
+        self.hwnd = hwnd
+        self.session = CaptureSession(hwnd)
+        self.pool = FramePool()
+        self.rect: Rect = None
+        self.get_window_rect()
+
+    @classmethod
+    def find(cls, **kwargs):
         """
+
+        Args:
+            **kwargs:
+                window_hwnd: int
+                window_name: str
+                window_pos: tuple[int, int]
+        """
+        if (window_handle := kwargs.get("window_hwnd")) is not None:
+            hwnd = window_handle
+        elif (window_name := kwargs.get("window_name")) is not None:
+            hwnd = win32gui.FindWindow(0, window_name)
+        elif (window_pos := kwargs.get("window_pos")) is not None:
+            hwnd = win32gui.WindowFromPoint(window_pos)
+        else:
+            raise ValueError("one of window_hwnd, window_name, window_pos should be given")
+        return cls(hwnd)
+
+    def get_window_rect(self):
+        self.rect = Rect(*win32gui.GetWindowRect(self.hwnd))
+        return self.rect
+
+    def close(self):
+        self.session.close()
+
+    def grab(self, x, y, width, height) -> np.ndarray:
+        out = self.pool.acquire(height, width)
+        self.session.ensure(self.rect.width, self.rect.height)
+        try:
+            return self.session.grab_into(x, y, width, height, out)
+        except win32ui.error:  # the window DC may turn invalid, e.g. the window is recreated; rebuild and retry once
+            self.session.close()
+            self.session.ensure(self.rect.width, self.rect.height)
+            return self.session.grab_into(x, y, width, height, out)
+
+    def screenshot(self, x, y, width, height) -> np.ndarray:
+        self.get_window_rect()
+        return cv.cvtColor(self.grab(x, y, width, height), cv.COLOR_BGRA2RGB)
+
+    def capture(self, regions=None) -> Frame:
+        # once per tick, so that frames are sized, and the session rebuilt, after the window is resized
+        self.get_window_rect()
+        return super().capture(regions)
+
+    def pixel(self, x, y) -> Tuple[int, int, int]:
         hw_dc = win32gui.GetWindowDC(self.hwnd)
         try:
-            rgb = get_pixel_from_hwnd(hw_dc, x, y, as_int)
+            rgb = get_pixel_from_hwnd(hw_dc, x, y)
         except pywintypes.error:  # this error occurs when using ALT + TAB, don't know how to fix.
             print("failed to get pixel, retrying...")
             win32gui.ReleaseDC(self.hwnd, hw_dc)
             time.sleep(.1)
-            rgb = self.pixel_from_window(x, y, as_int)
+            rgb = self.pixel(x, y)
         else:
             win32gui.ReleaseDC(self.hwnd, hw_dc)
         return rgb
 
-    @staticmethod
-    def pixel_from_image(image: np.ndarray, x, y, as_int=False):
-        return get_pixel_from_image(image, x, y, as_int=as_int)
-
-
-class MouseMixin:
-    def __init__(self, hwnd):
-        self.hwnd = hwnd
-
     def activate_window(self):
         # this is necessary on BlueStack 5.9
         win32gui.SendMessage(self.hwnd, win32con.WM_ACTIVATE, win32con.WA_CLICKACTIVE, 0)
 
-    def left_click(self, coordinate: Tuple[int, int], sleep=0):
+    def left_click(self, coordinate: Tuple[int, int]):
         pos = win32api.MAKELONG(*coordinate)
 
         self.activate_window()
         win32api.PostMessage(self.hwnd, win32con.WM_LBUTTONDOWN, win32con.MK_LBUTTON, pos)
         win32api.PostMessage(self.hwnd, win32con.WM_LBUTTONUP, 0, pos)
 
-        if sleep > 0:
-            time.sleep(sleep)
-
-    def left_drag(self, start, end, duration, interval=.05, sleep=0):
+    def left_drag(self, start, end, duration, interval=.05):
         """
 
         Args:
@@ -281,11 +416,15 @@ class MouseMixin:
             time.sleep(remain_interval)
         win32api.PostMessage(self.hwnd, win32con.WM_LBUTTONUP, 0, pos_end)
 
-        if sleep > 0:
-            time.sleep(sleep)
+    def get_window_text(self):
+        return win32gui.GetWindowText(self.hwnd)
+
+    def __repr__(self):
+        rect = self.get_window_rect()
+        return f"{self.get_window_text()}[{self.hwnd}, {rect.width:<4}*{rect.height:<4}]"
 
 
-class Window(ScreenUtilityMixin, MouseMixin):
+class Window(ScreenWindow):
     def __init__(self, **kwargs):
         """
 
@@ -295,24 +434,17 @@ class Window(ScreenUtilityMixin, MouseMixin):
                 window_name: str
                 window_pos: tuple[int, int]
         """
-        if (window_handle := kwargs.get("window_hwnd")) is not None:
-            self.hwnd = window_handle
-        elif (window_name := kwargs.get("window_name")) is not None:
-            self.hwnd = win32gui.FindWindow(0, window_name)
-        elif (window_pos := kwargs.get("window_pos")) is not None:
-            self.hwnd = win32gui.WindowFromPoint(window_pos)
-        self.rect = None
-        self.get_window_rect()
+        super().__init__(Win32ScreenSource.find(**kwargs))
 
-        ScreenUtilityMixin.__init__(self, self.hwnd)
-        MouseMixin.__init__(self, self.hwnd)
+    @property
+    def hwnd(self):
+        return self.source.hwnd
 
     def get_window_text(self):
-        return win32gui.GetWindowText(self.hwnd)
+        return self.source.get_window_text()
 
     def get_window_rect(self):
-        self.rect = Rect(*win32gui.GetWindowRect(self.hwnd))
-        return self.rect
+        return self.source.get_window_rect()
 
     def set_window_pos(self, insert_after, x, y, cx, cy, flags):
         """
@@ -337,15 +469,4 @@ class Window(ScreenUtilityMixin, MouseMixin):
         """
 
         win32gui.SetWindowPos(self.hwnd, insert_after, x, y, cx, cy, flags)
-        self.rect = self.get_window_rect()
-
-    def screenshot(self, x=0, y=0, width=None, height=None, form="array", save_path=None):
-        return super().screenshot(
-            x, y, width or self.rect.width, height or self.rect.height,
-            form,
-            save_path
-        )
-
-    def __repr__(self):
-        rect = self.get_window_rect()
-        return f"{self.get_window_text()}[{self.hwnd}, {rect.width:<4}*{rect.height:<4}]"
+        self.get_window_rect()
@@ -1,15 +1,132 @@
 import random
+import time
+from typing import Callable, List, NamedTuple, Optional
 
 import numpy as np
 
 from games.azur_lane.interface.scene import SceneUnknown
-from util.win32.window import Window
+from util.concurrent import AdaptiveInterval, VersionedState
+from util.screen import ScreenSource, ScreenWindow
 
 
-class GameWindow(Window):
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.scene_prev = self.scene_cur = SceneUnknown
+class Scenes(NamedTuple):
+    prev: type
+    cur: type
+
+
+class SceneState(VersionedState):
+    """
+    Previous and current scene of a window, switched atomically by the scene manager and by tasks, see
+    `VersionedState`.
+
+    Examples:
+        >>> window.scene_state.wait_for(SceneCampaign, SceneBattle, timeout=5.)
+        SceneBattle
+        >>> version, scenes = window.scene_state.get()
+        >>> window.scene_state.wait_for_change(version, timeout=5.)
+        (3, Scenes(prev=SceneBattle, cur=SceneCampaign))
+    """
+
+    def __init__(self):
+        super().__init__(Scenes(SceneUnknown, SceneUnknown))
+
+    def switch(self, scene_cur, scene_prev=None) -> Optional[int]:
+        """
+        Args:
+            scene_cur: Type[Scene]
+            scene_prev: Type[Scene], optional
+                default the current scene before switching
+
+        Returns:
+            int, the new version, or None if it's already at the scene
+        """
+        def _switch(scenes: Scenes) -> Scenes:
+            return scenes if scenes.cur is scene_cur else Scenes(scene_prev or scenes.cur, scene_cur)
+
+        return self.update(_switch)
+
+    def wait_for(self, *scenes, timeout: float = None) -> Optional[type]:
+        """
+        Wait until the current scene is any of the scenes, as recognized by others, e.g. the scene manager.
+
+        Returns:
+            Type[Scene], or None if timed out
+        """
+        res = self.wait_until(lambda s: s.cur in scenes, timeout)
+        return None if res is None else res[1].cur
+
+
+class GameWindow(ScreenWindow):
+    def __init__(self, source: ScreenSource = None, **kwargs):
+        """
+
+        Args:
+            source: ScreenSource, optional
+                backend to capture frames from and send inputs to, default the win32 window found by `kwargs`
+            **kwargs:
+                window_hwnd: int
+                window_name: str
+                window_pos: tuple[int, int]
+        """
+        if source is None:
+            from util.win32.window import Win32ScreenSource
+            source = Win32ScreenSource.find(**kwargs)
+        super().__init__(source)
+        self.scene_state = SceneState()
+        self.transition_listeners: List[Callable] = []  # called with (scene, expected, landed, elapsed)
+
+    @property
+    def scene_cur(self):
+        return self.scene_state.value.cur
+
+    @property
+    def scene_prev(self):
+        return self.scene_state.value.prev
+
+    def wait_until_scene(self, *scenes, timeout=5., schedule: AdaptiveInterval = None) -> Optional[type]:
+        """
+        Wait until any of the scenes is seen on a fresh frame, e.g. right after clicking to a scene.
+
+        Args:
+            *scenes: Type[Scene]
+            timeout: float, default 5.
+                seconds to wait at most
+            schedule: AdaptiveInterval, optional
+                intervals between polls, default from 50 ms backing off to 500 ms, as most transitions are fast
+
+        Returns:
+            Type[Scene], the first scene seen, or None if timed out
+        """
+        schedule = AdaptiveInterval(.05, .5, 1.5) if schedule is None else schedule
+        schedule.reset()
+        deadline = time.perf_counter() + timeout
+        while True:
+            frame = self.grab_frame()
+            for scene in scenes:
+                if scene.at_this_scene(self, frame):
+                    return scene
+            if (remaining := deadline - time.perf_counter()) <= 0:
+                return None
+            time.sleep(min(schedule.value, remaining))
+            schedule.backoff()
+
+    def observe_transition(self, scene, expected, landed, elapsed: float):
+        """
+        Tell listeners a transition was taken, e.g. to plan routes by measured time.
+
+        Args:
+            scene: Type[Scene]
+                scene the transition was taken from
+            expected: Type[Scene]
+                scene the transition was for
+            landed: Type[Scene]
+                scene actually landed at
+            elapsed: float
+                seconds from the input to landing
+        """
+        self.record_event("transition", prev=f"{scene}", expected=f"{expected}", cur=f"{landed}", elapsed=elapsed)
+        for listener in list(self.transition_listeners):
+            listener(scene, expected, landed, elapsed)
 
     @staticmethod
     def gen_random_xy(lt, rb):